@@ -0,0 +1,59 @@
+"""
+Micro-benchmark of OptimizedBloomFilter and CuckooFilter against
+pybloom_live.BloomFilter and a plain dict of str ids.
+
+Run with ``python benchmarks/bench_bloom_filter.py``. pybloom_live is a
+development dependency and is skipped if it is not installed.
+"""
+import os
+import timeit
+
+import sys
+
+from bitchat.utils import OptimizedBloomFilter, CuckooFilter
+
+try:
+    from pybloom_live import BloomFilter
+except ImportError:
+    BloomFilter = None
+
+CAPACITY = 100000
+ERROR_RATE = 0.01
+ITEMS = [os.urandom(16) for _ in range(CAPACITY // 2)]
+PROBES = [os.urandom(16) for _ in range(CAPACITY // 2)]
+
+def report(name: str, seconds: float, count: int) -> None:
+    print(f"{name:<40} {seconds / count * 1e9:10.1f} ns/op")
+
+def main() -> None:
+    bf = OptimizedBloomFilter(CAPACITY, ERROR_RATE)
+    report("OptimizedBloomFilter.insert", timeit.timeit(lambda: [bf.insert(i) for i in ITEMS], number=1), len(ITEMS))
+    report("OptimizedBloomFilter.contains", timeit.timeit(lambda: [bf.contains(p) for p in PROBES], number=1), len(PROBES))
+
+    bf = OptimizedBloomFilter(CAPACITY, ERROR_RATE)
+    report("OptimizedBloomFilter.insert_many", timeit.timeit(lambda: bf.insert_many(ITEMS), number=1), len(ITEMS))
+    report("OptimizedBloomFilter.contains_many", timeit.timeit(lambda: bf.contains_many(PROBES), number=1), len(PROBES))
+    print(f"{'OptimizedBloomFilter memory':<40} {bf.memory_size_bytes:10d} bytes")
+
+    cf = CuckooFilter(CAPACITY)
+    report("CuckooFilter.insert", timeit.timeit(lambda: [cf.insert(i) for i in ITEMS], number=1), len(ITEMS))
+    report("CuckooFilter.contains", timeit.timeit(lambda: [cf.contains(p) for p in PROBES], number=1), len(PROBES))
+    report("CuckooFilter.remove", timeit.timeit(lambda: [cf.remove(i) for i in ITEMS], number=1), len(ITEMS))
+    print(f"{'CuckooFilter memory':<40} {cf.memory_size_bytes:10d} bytes")
+
+    # The in-flight id sets a cuckoo filter replaces are dicts keyed by str ids
+    pending = {i.hex(): None for i in ITEMS}
+    report("dict lookup (str ids)", timeit.timeit(lambda: [p.hex() in pending for p in PROBES], number=1), len(PROBES))
+    print(f"{'dict memory (keys only)':<40} {sys.getsizeof(pending) + sum(map(sys.getsizeof, pending)):10d} bytes")
+
+    if BloomFilter is None:
+        print("pybloom_live not installed; skipping comparison")
+        return
+    # pybloom_live only accepts str keys, so the conversion is part of its cost
+    pb = BloomFilter(CAPACITY, ERROR_RATE)
+    report("pybloom_live.add", timeit.timeit(lambda: [pb.add(i.hex()) for i in ITEMS], number=1), len(ITEMS))
+    report("pybloom_live.__contains__", timeit.timeit(lambda: [p.hex() in pb for p in PROBES], number=1), len(PROBES))
+    print(f"{'pybloom_live memory':<40} {len(pb.bitarray.tobytes()):10d} bytes")
+
+if __name__ == "__main__":
+    main()
@@ -5,17 +5,22 @@ Python implementation of the bitchat mesh networking protocol for secure, decent
 __version__ = "1.0.0"
 
 from .protocol import encode_packet, decode_packet, encode_message, decode_message
-from .message import BitchatPacket, BitchatMessage, DeliveryAck, ReadReceipt
+from .message import BitchatPacket, BitchatMessage, DeliveryAck, CumulativeAck, ReadReceipt
 from .ble_service import start_advertising, send_message, send_encrypted_channel_message
 from .encryption import derive_channel_key
-from .utils import OptimizedBloomFilter, pad, unpad, optimal_block_size
+from .message import pad, unpad, optimal_block_size
+from .utils import OptimizedBloomFilter, RotatingBloomFilter, ScalableBloomFilter, CuckooFilter
 
 __all__ = [
     "BitchatPacket",
     "BitchatMessage",
     "DeliveryAck",
+    "CumulativeAck",
     "ReadReceipt",
     "OptimizedBloomFilter",
+    "RotatingBloomFilter",
+    "ScalableBloomFilter",
+    "CuckooFilter",
     "encode_packet",
     "decode_packet",
     "encode_message",
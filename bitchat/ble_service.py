@@ -1,13 +1,24 @@
 import asyncio
-from typing import List, Optional
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field, replace
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple, Union
 from uuid import uuid4
 from bleak import BleakScanner, BleakClient, BleakGATTCharacteristic
 from bleak.exc import BleakError
-from .message import BitchatPacket, BitchatMessage, DeliveryAck, ReadReceipt
-from .protocol import encode_packet, decode_packet, encode_message, decode_message
+from .message import BitchatPacket, BitchatMessage, CumulativeAck, DeliveryAck, ReadReceipt
+from .protocol import encode_packet, decode_packet, encode_message, decode_message, split_frames, FrameAssembler, \
+    CUMULATIVE_ACK_TYPE
 from .message import pad, unpad, optimal_block_size
 from .encryption import generate_signature, verify_signature
 from .keychain import retrieve_key
+from .utils import OptimizedBloomFilter
+from .discovery import PeerTable, PeerScanner
+from .pipeline import Pipeline, ReceivedFrame
+from .scheduler import OutboundScheduler, FrameBundler, AckAggregator, Priority
+from .transport import Transport, FrameHandler
+from .routing import RoutingTable
+from .store_forward import StoreAndForwardCache
 
 # BLE service and characteristic UUIDs (based on Bitchat protocol)
 SERVICE_UUID = "0000183f-0000-1000-8000-00805f9b34fb"
@@ -15,6 +26,340 @@ MESSAGE_CHAR_UUID = "00002a3f-0000-1000-8000-00805f9b34fb"
 ACK_CHAR_UUID = "00002b3f-0000-1000-8000-00805f9b34fb"
 RECEIPT_CHAR_UUID = "00002c3f-0000-1000-8000-00805f9b34fb"
 
+# Broadcast fan-out limits: parallel sends and seconds allowed per peer
+BROADCAST_CONCURRENCY = 4
+BROADCAST_PEER_TIMEOUT = 10.0
+
+# Longest an ack or read receipt waits to share a bundle with others for the same peer
+ACK_BUNDLE_DELAY = 0.02
+
+# Seconds delivery acks for the same peer are collected into one cumulative ack
+ACK_FLUSH_WINDOW = 0.1
+
+# Packet types held for later delivery when their recipient cannot be reached
+HOLDABLE_TYPES = {"private_message", "channel_message", "delivery_ack", CUMULATIVE_ACK_TYPE, "read_receipt"}
+
+# Largest attribute value one (long) write-with-response can carry
+MAX_ATTRIBUTE_SIZE = 512
+# Unconfirmed writes send one confirmed write per this many chunks so link buffers cannot overrun
+WRITE_WINDOW = 8
+# Traffic classes written without response
+UNCONFIRMED_PRIORITIES = {Priority.BULK}
+
+# Fingerprints of packets already received, so duplicates skip verification
+_seen_packets = OptimizedBloomFilter.adaptive(100, generations=3)
+
+@dataclass
+class BroadcastReport:
+    results: Dict[str, Optional[str]]  # peer_id -> None if sent, else the error
+    elapsed: float  # Seconds from the first send to the last completion
+    held: List[str] = field(default_factory=list)  # Failed peers the frame is held for
+
+    @property
+    def delivered(self) -> List[str]:
+        """
+        Peers the packet was written to.
+        """
+        return [peer_id for peer_id, error in self.results.items() if error is None]
+
+    @property
+    def failed(self) -> Dict[str, str]:
+        """
+        Peers the packet could not be written to, with the reason.
+        """
+        return {peer_id: error for peer_id, error in self.results.items() if error is not None}
+
+class ConnectionPool:
+    """Keep BLE connections to peers open and reuse them across sends."""
+
+    def __init__(self, max_connections: int = 7, idle_timeout: float = 30.0,
+                 client_factory: Callable[[str], BleakClient] = BleakClient,
+                 clock: Callable[[], float] = time.monotonic, sweep_interval: Optional[float] = None):
+        """
+        Initialize an empty connection pool.
+
+        acquire() marks a connection in use until the matching release().
+        Connections in use are never evicted, and while the pool is at
+        max_connections a new connection waits for one to become evictable.
+        Pinned connections do not count against the wait: when only pinned
+        ones remain, a new connection is opened beyond the cap.
+
+        While connections are open, a background task closes idle ones every
+        ``sweep_interval`` seconds, so they are released without further
+        acquire() calls. The task starts with the first connection, ends when
+        the pool is empty and is cancelled by close().
+
+        Args:
+            max_connections (int): Maximum number of simultaneously open connections.
+            idle_timeout (float): Seconds after which an unused connection is closed.
+            client_factory (Callable[[str], BleakClient]): Builds a client for a device address.
+            clock (Callable[[], float]): Time source, monotonic seconds.
+            sweep_interval (float, optional): Seconds between idle sweeps (default: idle_timeout / 2).
+
+        Raises:
+            ValueError: If max_connections, idle_timeout or sweep_interval is non-positive.
+        """
+        if max_connections <= 0:
+            raise ValueError("max_connections must be positive")
+        if idle_timeout <= 0:
+            raise ValueError("idle_timeout must be positive")
+        if sweep_interval is not None and sweep_interval <= 0:
+            raise ValueError("sweep_interval must be positive")
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval if sweep_interval is not None else idle_timeout / 2
+        self.client_factory = client_factory
+        self.clock = clock
+        self._clients: "OrderedDict[str, BleakClient]" = OrderedDict()  # peer_id -> client, least recently used first
+        self._last_used: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}  # Per peer, so concurrent acquires connect once
+        self._in_use: Dict[str, int] = {}  # peer_id -> acquires not yet released
+        self._connecting = 0  # Slots reserved by connects in progress
+        self._condition: Optional[asyncio.Condition] = None  # Guards the cap; notified when a slot may free up
+        self._condition_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.pinned = set()  # Peers whose connections are never evicted
+        self.hits = 0
+        self.misses = 0
+        self.connect_latencies = deque(maxlen=100)  # Seconds per recent connect
+        self._sweeper: Optional[asyncio.Task] = None
+        self._sweeper_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def acquire(self, peer_id: str, resolve_address: Callable[[], Awaitable[str]]) -> BleakClient:
+        """
+        Return a connected client for a peer, connecting only if needed.
+
+        The connection stays in use, and cannot be evicted, until release()
+        is called for the peer.
+
+        Args:
+            peer_id (str): Peer the connection is for.
+            resolve_address (Callable[[], Awaitable[str]]): Looks up the peer's
+                device address; only awaited when a new connection is made.
+
+        Returns:
+            BleakClient: A connected client.
+
+        Raises:
+            BleakError: If connecting fails.
+            ValueError: If the peer cannot be resolved.
+        """
+        client = self._clients.get(peer_id)
+        if client is not None and client.is_connected:
+            self.hits += 1
+            self._use(peer_id)
+            return client
+        lock = self._locks.setdefault(peer_id, asyncio.Lock())
+        try:
+            async with lock:
+                # Another task may have connected while we waited for the lock
+                client = self._clients.get(peer_id)
+                if client is not None and client.is_connected:
+                    self.hits += 1
+                    self._use(peer_id)
+                    return client
+                self.misses += 1
+                condition = self._get_condition()
+                async with condition:
+                    if client is not None:
+                        await self._drop(peer_id)
+                    await self._reserve_slot(condition)
+                try:
+                    address = await resolve_address()
+                    client = self.client_factory(address)
+                    started = self.clock()
+                    await client.connect()
+                    self.connect_latencies.append(self.clock() - started)
+                finally:
+                    async with condition:
+                        self._connecting -= 1
+                        condition.notify_all()
+                self._clients[peer_id] = client
+                self._use(peer_id)
+                self._start_sweeper()
+                return client
+        finally:
+            # Forget the lock of a peer left without a connection, e.g. after a failed connect
+            if peer_id not in self._clients and not lock.locked() and self._locks.get(peer_id) is lock:
+                del self._locks[peer_id]
+
+    async def _reserve_slot(self, condition: asyncio.Condition) -> None:
+        """
+        Wait until a new connection fits under the cap, evicting idle ones, then claim its slot.
+
+        Must be called with the condition held.
+        """
+        while True:
+            await self._evict_idle()
+            if len(self._clients) + self._connecting < self.max_connections:
+                break
+            victim = next((p for p in self._clients if p not in self.pinned and not self._in_use.get(p)), None)
+            if victim is not None:
+                await self._drop(victim)
+                continue
+            if not self._connecting and all(p in self.pinned for p in self._clients):
+                break  # Only pinned connections left; they do not hold back new ones
+            await condition.wait()
+        self._connecting += 1
+
+    def _get_condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._condition_loop is not loop:
+            self._condition = asyncio.Condition()
+            self._condition_loop = loop
+        return self._condition
+
+    def _use(self, peer_id: str) -> None:
+        self._in_use[peer_id] = self._in_use.get(peer_id, 0) + 1
+        self._touch(peer_id)
+
+    async def release(self, peer_id: str) -> None:
+        """
+        Mark one acquire() of a peer's connection as finished.
+
+        Args:
+            peer_id (str): Peer whose connection is no longer used by the caller.
+        """
+        count = self._in_use.get(peer_id, 0) - 1
+        if count > 0:
+            self._in_use[peer_id] = count
+            return
+        self._in_use.pop(peer_id, None)
+        if peer_id in self._clients:
+            self._touch(peer_id)
+        condition = self._get_condition()
+        async with condition:
+            condition.notify_all()
+
+    def _touch(self, peer_id: str) -> None:
+        """
+        Mark a peer's connection as most recently used.
+        """
+        self._clients.move_to_end(peer_id)
+        self._last_used[peer_id] = self.clock()
+
+    async def discard(self, peer_id: str) -> None:
+        """
+        Close and forget a peer's connection, e.g. after a failed write.
+
+        Args:
+            peer_id (str): Peer whose connection to drop.
+        """
+        condition = self._get_condition()
+        async with condition:
+            await self._drop(peer_id)
+            condition.notify_all()
+
+    async def _drop(self, peer_id: str) -> None:
+        client = self._clients.pop(peer_id, None)
+        self._last_used.pop(peer_id, None)
+        lock = self._locks.get(peer_id)
+        if lock is not None and not lock.locked():
+            del self._locks[peer_id]
+        if client is not None:
+            try:
+                await client.disconnect()
+            except BleakError:
+                pass
+
+    def pin(self, peer_id: str) -> None:
+        """
+        Keep a peer's connection open regardless of idle time and the connection cap.
+
+        Args:
+            peer_id (str): Peer to pin, e.g. while subscribed to its notifications.
+        """
+        self.pinned.add(peer_id)
+
+    def unpin(self, peer_id: str) -> None:
+        """
+        Make a pinned connection evictable again.
+
+        Args:
+            peer_id (str): Peer to unpin.
+        """
+        self.pinned.discard(peer_id)
+
+    async def evict_idle(self) -> None:
+        """
+        Close connections that have been unused for longer than idle_timeout.
+        """
+        condition = self._get_condition()
+        async with condition:
+            await self._evict_idle()
+            condition.notify_all()
+
+    async def _evict_idle(self) -> None:
+        deadline = self.clock() - self.idle_timeout
+        for peer_id in [p for p, used in self._last_used.items()
+                        if used < deadline and p not in self.pinned and not self._in_use.get(p)]:
+            await self._drop(peer_id)
+
+    def _start_sweeper(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._sweeper is not None and not self._sweeper.done() and self._sweeper_loop is loop:
+            return
+        self._sweeper = loop.create_task(self._sweep())
+        self._sweeper_loop = loop
+
+    async def _sweep(self) -> None:
+        while self._clients:
+            await asyncio.sleep(self.sweep_interval)
+            await self.evict_idle()
+
+    async def close(self) -> None:
+        """
+        Stop the idle sweep and close every pooled connection.
+        """
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        for peer_id in list(self._clients):
+            await self.discard(peer_id)
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        Fraction of acquisitions served by an already open connection.
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @property
+    def average_connect_latency(self) -> float:
+        """
+        Mean duration in seconds of recent connects.
+        """
+        return sum(self.connect_latencies) / len(self.connect_latencies) if self.connect_latencies else 0.0
+
+# Connections shared by all sends from this process
+connection_pool = ConnectionPool()
+
+# Nearby peers, kept current by peer_scanner once start_discovery() is called
+peer_table = PeerTable()
+peer_scanner = PeerScanner(peer_table, [SERVICE_UUID])
+
+# Every outbound write goes through this queue, so acks are never stuck behind bulk traffic
+outbound = OutboundScheduler(lambda frame, peer_id, priority: write_frame(
+                                 frame, peer_id, response=priority not in UNCONFIRMED_PRIORITIES),
+                             concurrency=BROADCAST_CONCURRENCY, write_timeout=BROADCAST_PEER_TIMEOUT)
+
+# Reverse-path routes learned from received traffic, used to reach peers out of radio range
+route_table = RoutingTable()
+
+# Acks and receipts headed to the same peer within ACK_BUNDLE_DELAY share one frame
+ack_bundler = FrameBundler(lambda frame, peer_id, priority: outbound.send(frame, peer_id, priority),
+                           max_delay=ACK_BUNDLE_DELAY)
+
+# Delivery acks for the same peer within ACK_FLUSH_WINDOW travel as one cumulative ack
+ack_aggregator = AckAggregator(lambda ack: _send_ack(ack), window=ACK_FLUSH_WINDOW)
+
+# Frames for peers that could not be reached, delivered when they reappear
+held_packets = StoreAndForwardCache()
+_held_watch: Optional[asyncio.Task] = None
+
 async def start_advertising(peer_id: str) -> None:
     """
     Advertise device presence using BLE.
@@ -37,28 +382,314 @@ async def start_advertising(peer_id: str) -> None:
     except Exception as e:
         raise RuntimeError(f"Failed to start advertising: {str(e)}")
 
+async def start_discovery() -> None:
+    """
+    Start the background scanner that keeps peer_table current.
+    
+    Held packets are delivered as their recipients come back into range.
+    
+    Raises:
+        RuntimeError: If the scanner cannot be started.
+    """
+    await peer_scanner.start()
+    start_store_and_forward()
+
+async def stop_discovery() -> None:
+    """
+    Stop the background scanner.
+    """
+    await peer_scanner.stop()
+    await stop_store_and_forward()
+
+def start_store_and_forward() -> None:
+    """
+    Deliver held packets whenever their recipient appears in the active transport's peer table.
+    
+    Must be called with an event loop running; calling it again is a no-op.
+    """
+    global _held_watch
+    if _held_watch is None or _held_watch.done():
+        _held_watch = asyncio.ensure_future(held_packets.watch(
+            transport.table, lambda frame, peer_id, priority: outbound.send(frame, peer_id, priority)))
+
+async def stop_store_and_forward() -> None:
+    """
+    Stop delivering held packets on peer table changes. Packets stay held.
+    """
+    global _held_watch
+    if _held_watch is not None:
+        _held_watch.cancel()
+        await asyncio.gather(_held_watch, return_exceptions=True)
+        _held_watch = None
+
 async def scan_peers() -> List[str]:
     """
     Discover nearby peers advertising the Bitchat service.
     
+    Runs a one-off scan and records the results in peer_table.
+    
     Returns:
         List[str]: List of peer IDs discovered.
     """
     try:
-        devices = await BleakScanner.discover(service_uuids=[SERVICE_UUID], timeout=5.0)
-        peer_ids = [device.name for device in devices if device.name and device.name.startswith("bitchat_")]
+        discovered = await BleakScanner.discover(service_uuids=[SERVICE_UUID], timeout=5.0, return_adv=True)
+        peer_ids = []
+        for device, advertisement_data in discovered.values():
+            name = advertisement_data.local_name or device.name
+            if name and name.startswith("bitchat_"):
+                peer_table.update(name, device.address, advertisement_data.rssi, list(advertisement_data.service_uuids))
+                peer_ids.append(name)
         return peer_ids
     except BleakError as e:
         print(f"Error scanning peers: {str(e)}")
         return []
 
-async def send_packet(packet: BitchatPacket, peer_id: str) -> None:
+async def resolve_peers() -> List[str]:
+    """
+    Return the peers to broadcast to from the active transport.
+    
+    Returns:
+        List[str]: Neighbour IDs; over BLE, from peer_table or a fresh scan if it is empty.
+    """
+    return await transport.discover()
+
+async def _resolve_address(peer_id: str) -> str:
+    """
+    Look up a peer's device address in peer_table, scanning once if needed.
+    """
+    info = peer_table.get(peer_id)
+    if info is None and not peer_scanner.running:
+        await scan_peers()
+        info = peer_table.get(peer_id)
+    if info is None:
+        raise ValueError(f"Peer {peer_id} not found")
+    return info.address
+
+def _accept_frame(data: bytes, seen: Optional[OptimizedBloomFilter] = None) -> Optional[BitchatPacket]:
+    """
+    Unpad, decode, deduplicate and verify a received frame.
+    
+    Returns the packet if it is new and correctly signed, None otherwise.
+    Duplicates are tracked in ``seen`` (default _seen_packets).
+    """
+    if seen is None:
+        seen = _seen_packets
+    unpadded_data = unpad(data)
+    if not unpadded_data:
+        return None
+    packet = decode_packet(unpadded_data)
+    if packet is None:
+        return None
+    # Drop duplicates before paying for signature verification
+    if seen.contains(packet.fingerprint):
+        return None
+    # Verify signature
+    key = retrieve_key(f"peer:{packet.sender_id.decode('utf-8', errors='ignore')}")
+    if key and verify_signature(packet.payload, packet.signature, key):
+        seen.insert(packet.fingerprint)
+        return packet
+    print(f"Invalid signature for packet from {packet.sender_id}")
+    return None
+
+def build_frame(packet: BitchatPacket) -> bytes:
+    """
+    Sign, encode and pad a packet into the bytes written to peers.
+    
+    The packet itself is left untouched; the signature only goes into the
+    returned frame, which can be written to any number of peers.
+    
+    Args:
+        packet (BitchatPacket): Packet to send.
+    
+    Returns:
+        bytes: Padded frame ready for write_frame.
+    
+    Raises:
+        ValueError: If no signing key is found or the packet cannot be encoded.
+    """
+    # Retrieve signing key (e.g., from keychain)
+    key = retrieve_key(f"peer:{packet.sender_id.decode('utf-8', errors='ignore')}")
+    if not key:
+        raise ValueError("No signing key found for sender")
+    
+    # Sign packet payload into a copy of the packet
+    signed = replace(packet, signature=generate_signature(packet.payload, key), fingerprint=None)
+    
+    # Encode packet
+    data = encode_packet(signed)
+    
+    # Pad data to optimal block size
+    block_size = optimal_block_size(len(data))
+    return pad(data, block_size)
+
+def _write_plan(client: BleakClient, response: bool) -> Tuple[bool, int]:
+    """
+    Choose the write mode and chunk size for the message characteristic on a connection.
+    
+    Unconfirmed writes must fit in one packet, so they are limited by the
+    negotiated MTU. Confirmed writes can be long writes of up to
+    MAX_ATTRIBUTE_SIZE. Falls back to confirmed writes if the characteristic
+    does not allow unconfirmed ones.
+    """
+    if not response:
+        try:
+            char = client.services.get_characteristic(MESSAGE_CHAR_UUID)
+            size = char.max_write_without_response_size
+            if "write-without-response" in char.properties and isinstance(size, int) and size > 0:
+                return False, size
+        except (AttributeError, BleakError):
+            pass
+    return True, MAX_ATTRIBUTE_SIZE
+
+class BleTransport(Transport):
+    """Transport over BLE GATT with bleak, sharing connections through a ConnectionPool."""
+
+    def __init__(self, pool: Optional[ConnectionPool] = None, table: Optional[PeerTable] = None):
+        """
+        Initialize a BLE transport.
+
+        Args:
+            pool (ConnectionPool, optional): Connections to use (default connection_pool).
+            table (PeerTable, optional): Neighbour table (default peer_table).
+        """
+        super().__init__(table if table is not None else peer_table)
+        self.pool = pool if pool is not None else connection_pool
+        self._clients: Dict[str, BleakClient] = {}
+
+    async def _resolve_address(self, peer_id: str) -> str:
+        """
+        Look up a peer's address in this transport's table before scanning.
+        """
+        info = self.table.get(peer_id)
+        if info is not None:
+            return info.address
+        return await _resolve_address(peer_id)
+
+    async def discover(self, timeout: float = 5.0) -> List[str]:
+        return self.table.peers() or await scan_peers()
+
+    async def connect(self, peer_id: str) -> None:
+        try:
+            await self.pool.acquire(peer_id, lambda: self._resolve_address(peer_id))
+        except (BleakError, ValueError) as e:
+            raise RuntimeError(f"Failed to connect to {peer_id}: {str(e)}")
+        await self.pool.release(peer_id)
+
+    async def write(self, peer_id: str, data: bytes, response: bool = True) -> None:
+        """
+        Write to a peer, split into chunks that fit one GATT write.
+        
+        Confirmed writes are long writes of up to MAX_ATTRIBUTE_SIZE bytes.
+        Unconfirmed ones are sized to the MTU and confirm one chunk every
+        WRITE_WINDOW for flow control. Receivers put frames back together with
+        FrameAssembler.
+        """
+        try:
+            client = await self.pool.acquire(peer_id, lambda: self._resolve_address(peer_id))
+            try:
+                response, size = _write_plan(client, response)
+                for i, offset in enumerate(range(0, len(data), size)):
+                    confirm = response or (i + 1) % WRITE_WINDOW == 0
+                    await client.write_gatt_char(MESSAGE_CHAR_UUID, data[offset:offset + size], response=confirm)
+            except BleakError:
+                await self.pool.discard(peer_id)
+                raise
+            finally:
+                await self.pool.release(peer_id)
+            print(f"Sent packet to {peer_id}")
+        except (BleakError, ValueError) as e:
+            raise RuntimeError(f"Failed to send packet to {peer_id}: {str(e)}")
+
+    async def subscribe(self, peer_id: str, handler: FrameHandler) -> None:
+        """
+        Open (or reuse) a pinned connection to a peer and start notifications.
+        """
+        try:
+            client = await self.pool.acquire(peer_id, lambda: self._resolve_address(peer_id))
+            self.pool.pin(peer_id)
+            await self.pool.release(peer_id)
+
+            def on_notify(characteristic: BleakGATTCharacteristic, data: bytearray) -> None:
+                handler(peer_id, bytes(data))
+
+            await client.start_notify(MESSAGE_CHAR_UUID, on_notify)
+            self._clients[peer_id] = client
+        except (BleakError, ValueError) as e:
+            self.pool.unpin(peer_id)
+            raise RuntimeError(f"Failed to subscribe to {peer_id}: {str(e)}")
+
+    async def unsubscribe(self, peer_id: str) -> None:
+        client = self._clients.pop(peer_id, None)
+        self.pool.unpin(peer_id)
+        if client is not None and client.is_connected:
+            try:
+                await client.stop_notify(MESSAGE_CHAR_UUID)
+            except BleakError:
+                pass
+
+    async def close(self) -> None:
+        for peer_id in list(self._clients):
+            await self.unsubscribe(peer_id)
+
+# Link layer used by write_frame, resolve_peers and packets(); BLE unless replaced with set_transport()
+transport: Transport = BleTransport()
+
+def get_transport() -> Transport:
+    """
+    Return the transport the module sends and receives on.
+    """
+    return transport
+
+def set_transport(new_transport: Transport) -> None:
+    """
+    Run the module over another transport, e.g. a LoopbackTransport in tests or simulations.
+    
+    Args:
+        new_transport (Transport): Transport to use from now on.
+    """
+    global transport
+    transport = new_transport
+
+async def write_frame(frame: bytes, peer_id: str, response: bool = True) -> None:
+    """
+    Write a frame built by build_frame to a specific peer over the active transport.
+    
+    Args:
+        frame (bytes): Signed, padded frame (or several, back to back).
+        peer_id (str): Target peer ID (must start with 'bitchat_').
+        response (bool): Require link-level confirmation. Over BLE, False
+            means write-without-response with periodic confirmed writes for
+            flow control.
+    
+    Raises:
+        RuntimeError: If peer_id is invalid, the peer is not found or writing fails.
+    """
+    if not peer_id.startswith("bitchat_"):
+        raise RuntimeError(f"Failed to send packet to {peer_id}: peer_id must start with 'bitchat_'")
+    await transport.write(peer_id, frame, response)
+
+async def send_packet(packet: BitchatPacket, peer_id: str, priority: Priority = Priority.CHAT,
+                      hold: bool = True) -> bool:
     """
     Send a packet to a specific peer over BLE.
     
+    The frame is queued on the outbound scheduler and may share a GATT
+    write with other small frames for the same peer. Ack-priority frames
+    are first bundled with other acks for that peer. If the peer is not a
+    neighbour but a route to it has been learned, the frame goes to the
+    route's next hop, and relays carry it the rest of the way.
+    
+    If the write fails for a private, channel, ack or receipt packet, the
+    frame is kept in held_packets and sent when the peer is next seen.
+    
     Args:
         packet (BitchatPacket): Packet to send.
         peer_id (str): Target peer ID (must start with 'bitchat_').
+        priority (Priority): Traffic class for the outbound scheduler.
+        hold (bool): Whether to hold the frame instead of failing when the peer cannot be reached.
+    
+    Returns:
+        bool: True if the frame was written, False if it is held for later delivery.
     
     Raises:
         ValueError: If peer_id is invalid or peer not found.
@@ -67,64 +698,98 @@ async def send_packet(packet: BitchatPacket, peer_id: str) -> None:
     try:
         if not peer_id.startswith("bitchat_"):
             raise ValueError("peer_id must start with 'bitchat_'")
-        
-        # Retrieve signing key (e.g., from keychain)
-        key = retrieve_key(f"peer:{packet.sender_id.decode('utf-8', errors='ignore')}")
-        if not key:
-            raise ValueError("No signing key found for sender")
-        
-        # Sign packet payload
-        packet.signature = generate_signature(packet.payload, key)
-        
-        # Encode packet
-        data = encode_packet(packet)
-        
-        # Pad data to optimal block size
-        block_size = optimal_block_size(len(data))
-        padded_data = pad(data, block_size)
-        
-        # Find device by peer_id
-        async with BleakScanner() as scanner:
-            devices = await scanner.discover(service_uuids=[SERVICE_UUID], timeout=5.0)
-            target_device = next((d for d in devices if d.name == peer_id), None)
-            if not target_device:
-                raise ValueError(f"Peer {peer_id} not found")
-            
-            # Connect and send
-            async with BleakClient(target_device.address) as client:
-                await client.write_gatt_char(MESSAGE_CHAR_UUID, padded_data)
-                print(f"Sent packet to {peer_id}")
-    except (BleakError, ValueError) as e:
+        frame = build_frame(packet)
+    except ValueError as e:
         raise RuntimeError(f"Failed to send packet to {peer_id}: {str(e)}")
+    recipient = peer_id
+    if peer_id not in transport.table:
+        peer_id = route_table.next_hop(peer_id, transport.table.peers()) or peer_id
+    try:
+        if priority == Priority.ACK:
+            await ack_bundler.send(frame, peer_id, priority)
+        else:
+            await outbound.send(frame, peer_id, priority)
+    except (RuntimeError, asyncio.TimeoutError):
+        if not hold or packet.type not in HOLDABLE_TYPES or not held_packets.hold(recipient, frame, priority):
+            raise
+        return False
+    return True
+
+async def broadcast_packet(packet: BitchatPacket, peers: List[str], concurrency: Optional[int] = None,
+                           timeout: Optional[float] = None, priority: Priority = Priority.CHAT,
+                           hold: bool = False) -> BroadcastReport:
+    """
+    Send a packet to several peers concurrently.
+    
+    The packet is signed, encoded and padded once and the same frame is
+    written to every peer. A slow or unreachable peer only affects its own
+    result, so the whole broadcast takes about as long as the slowest
+    single peer. The per-peer timeout covers the time a frame waits in the
+    outbound scheduler as well as the write itself.
+    
+    Args:
+        packet (BitchatPacket): Packet to send.
+        peers (List[str]): Target peer IDs.
+        concurrency (int, optional): Maximum sends in flight (default BROADCAST_CONCURRENCY).
+        timeout (float, optional): Seconds allowed per peer, queueing included (default BROADCAST_PEER_TIMEOUT).
+        priority (Priority): Traffic class for the outbound scheduler.
+        hold (bool): Keep the frame in held_packets for peers it could not be written to.
+    
+    Returns:
+        BroadcastReport: Per-peer outcome and total elapsed time.
+    
+    Raises:
+        ValueError: If the packet cannot be signed or encoded.
+    """
+    frame = build_frame(packet)
+    semaphore = asyncio.Semaphore(concurrency or BROADCAST_CONCURRENCY)
+    timeout = timeout or BROADCAST_PEER_TIMEOUT
+    
+    async def send_one(peer_id: str):
+        async with semaphore:
+            try:
+                await asyncio.wait_for(outbound.send(frame, peer_id, priority, timeout), timeout)
+                return peer_id, None
+            except asyncio.TimeoutError:
+                return peer_id, f"Timed out after {timeout} s"
+            except Exception as e:
+                return peer_id, str(e)
+    
+    started = time.monotonic()
+    results = dict(await asyncio.gather(*(send_one(peer_id) for peer_id in peers)))
+    report = BroadcastReport(results=results, elapsed=time.monotonic() - started)
+    if hold:
+        report.held = [peer_id for peer_id in report.failed if held_packets.hold(peer_id, frame, priority)]
+    return report
 
 async def receive_packet() -> Optional[BitchatPacket]:
     """
     Handle incoming packets over BLE from any available peer.
     
+    Polls each discovered device in turn and returns at most one packet;
+    use packets() to receive continuously from all connected peers.
+    
     Returns:
         Optional[BitchatPacket]: Received packet or None if no packet is available.
     """
     try:
         received_packet = None
+        assembler = FrameAssembler()
         
         async def notification_handler(characteristic: BleakGATTCharacteristic, data: bytes):
             nonlocal received_packet
-            unpadded_data = unpad(data)
-            packet = decode_packet(unpadded_data)
-            if packet:
-                # Verify signature
-                key = retrieve_key(f"peer:{packet.sender_id.decode('utf-8', errors='ignore')}")
-                if key and verify_signature(packet.payload, packet.signature, key):
+            for frame in (f for chunk in assembler.feed(bytes(data)) for f in split_frames(chunk)):
+                packet = _accept_frame(frame)
+                if packet:
                     print(f"Received valid packet: {packet}")
                     received_packet = packet
-                else:
-                    print(f"Invalid signature for packet from {packet.sender_id}")
 
         async with BleakScanner() as scanner:
             devices = await scanner.discover(service_uuids=[SERVICE_UUID], timeout=5.0)
             if not devices:
                 return None
             for device in devices:  # Try all discovered devices
+                assembler = FrameAssembler()
                 try:
                     async with BleakClient(device.address) as client:
                         await client.start_notify(MESSAGE_CHAR_UUID, notification_handler)
@@ -139,7 +804,203 @@ async def receive_packet() -> Optional[BitchatPacket]:
         print(f"Error receiving packet: {str(e)}")
         return None
 
-async def send_message(message: BitchatMessage, recipient: str = None) -> None:
+class PacketStream:
+    """Receive packets from all connected peers as one async stream."""
+
+    def __init__(self, maxsize: int = 256, pool: Optional[ConnectionPool] = None,
+                 table: Optional[PeerTable] = None, transport: Optional[Transport] = None,
+                 seen: Optional[OptimizedBloomFilter] = None, routes: Optional[RoutingTable] = None):
+        """
+        Initialize a packet stream.
+
+        Writes from every subscribed peer feed one bounded queue of raw
+        frames; frames are decoded and verified as the consumer reads them.
+        When the queue fills, subscriptions are paused on all peers until the
+        consumer has drained it to half full.
+
+        Args:
+            maxsize (int): Maximum number of frames buffered.
+            pool (ConnectionPool, optional): Connections for a BleTransport built for this stream.
+            table (PeerTable, optional): Peers for a BleTransport built for this stream.
+            transport (Transport, optional): Transport to receive on (default: the module's, or a
+                BleTransport over pool and table if either is given).
+            seen (OptimizedBloomFilter, optional): Duplicate filter (default _seen_packets); give each
+                node its own when running several in one process.
+            routes (RoutingTable, optional): Table that learns reverse routes from the packets
+                this stream yields (default: the module's ``route_table``).
+
+        Raises:
+            ValueError: If maxsize is non-positive.
+        """
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        if transport is None:
+            transport = BleTransport(pool, table) if pool is not None or table is not None else get_transport()
+        self.transport = transport
+        self.table = transport.table
+        self.seen = seen
+        self.routes = routes if routes is not None else route_table
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.paused = False
+        self.dropped = 0  # Frames lost because the queue was full
+        self._subscribed: Set[str] = set()
+        self._assemblers: Dict[str, FrameAssembler] = {}
+        self._watch_task: Optional[asyncio.Task] = None
+        self._started = False
+
+    def _on_frame(self, peer_id: str, data: bytes) -> None:
+        """
+        Queue the frames of a write, pausing subscriptions if the queue is full.
+        """
+        assembler = self._assemblers.setdefault(peer_id, FrameAssembler())
+        for frame in (f for chunk in assembler.feed(data) for f in split_frames(chunk)):
+            try:
+                self.queue.put_nowait((peer_id, frame))
+            except asyncio.QueueFull:
+                self.dropped += 1
+                if not self.paused:
+                    self.paused = True
+                    asyncio.ensure_future(self._set_notifications(False))
+
+    async def _set_notifications(self, enabled: bool) -> None:
+        """
+        Resume or pause the subscription to every subscribed peer.
+        """
+        for peer_id in list(self._subscribed):
+            try:
+                if enabled:
+                    await self.transport.subscribe(peer_id, self._on_frame)
+                else:
+                    await self.transport.unsubscribe(peer_id)
+            except RuntimeError:
+                await self.unsubscribe(peer_id)
+
+    async def subscribe(self, peer_id: str) -> None:
+        """
+        Start receiving a peer's packets.
+
+        Args:
+            peer_id (str): Peer to receive from.
+
+        Raises:
+            RuntimeError: If the peer cannot be reached.
+        """
+        if peer_id in self._subscribed:
+            return
+        if not self.paused:
+            await self.transport.subscribe(peer_id, self._on_frame)
+        self._subscribed.add(peer_id)
+
+    async def unsubscribe(self, peer_id: str) -> None:
+        """
+        Stop receiving from a peer.
+
+        Args:
+            peer_id (str): Peer to stop receiving from.
+        """
+        self._subscribed.discard(peer_id)
+        self._assemblers.pop(peer_id, None)
+        await self.transport.unsubscribe(peer_id)
+
+    async def _watch_peers(self) -> None:
+        """
+        Follow peer table changes, subscribing to new peers and dropping gone ones.
+        """
+        async for event in self.table.changes():
+            if event.kind == "removed":
+                await self.unsubscribe(event.peer.peer_id)
+            else:
+                try:
+                    await self.subscribe(event.peer.peer_id)
+                except RuntimeError as e:
+                    print(str(e))
+
+    async def start(self) -> None:
+        """
+        Subscribe to every known peer and keep following the peer table.
+        """
+        if self._started:
+            return
+        self._started = True
+        self._watch_task = asyncio.ensure_future(self._watch_peers())
+        for peer_id in self.table.peers():
+            try:
+                await self.subscribe(peer_id)
+            except RuntimeError as e:
+                print(str(e))
+
+    async def close(self) -> None:
+        """
+        Unsubscribe from all peers and stop following the peer table.
+        """
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            self._watch_task = None
+        for peer_id in list(self._subscribed):
+            await self.unsubscribe(peer_id)
+        self._started = False
+
+    def __aiter__(self) -> 'PacketStream':
+        return self
+
+    async def next_frame(self) -> Tuple[str, bytes]:
+        """
+        Wait for the next raw frame, resuming notifications once the queue has drained.
+
+        Returns:
+            Tuple[str, bytes]: The sending peer's ID and the undecoded frame.
+        """
+        await self.start()
+        frame = await self.queue.get()
+        if self.paused and self.queue.qsize() <= self.queue.maxsize // 2:
+            self.paused = False
+            asyncio.ensure_future(self._set_notifications(True))
+        return frame
+
+    async def feed(self, pipeline: Pipeline) -> None:
+        """
+        Push raw frames into a receive pipeline until cancelled.
+
+        The pipeline's bounded queues apply backpressure here, which in turn
+        pauses notifications once this stream's queue fills.
+
+        Args:
+            pipeline (Pipeline): A started pipeline taking ReceivedFrame items.
+        """
+        while True:
+            peer_id, data = await self.next_frame()
+            await pipeline.submit(ReceivedFrame(peer_id, data))
+
+    async def __anext__(self) -> BitchatPacket:
+        while True:
+            peer_id, data = await self.next_frame()
+            packet = _accept_frame(data, self.seen)
+            if packet is not None:
+                self.routes.observe(packet, peer_id)
+                return packet
+
+    async def __aenter__(self) -> 'PacketStream':
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+def packets(maxsize: int = 256) -> PacketStream:
+    """
+    Stream verified packets from all connected peers.
+    
+    Usage: ``async with packets() as stream: async for packet in stream: ...``
+    
+    Args:
+        maxsize (int): Maximum number of frames buffered before notifications pause.
+    
+    Returns:
+        PacketStream: Async iterator of new, correctly signed packets.
+    """
+    return PacketStream(maxsize)
+
+async def send_message(message: BitchatMessage, recipient: str = None) -> Optional[BroadcastReport]:
     """
     Send a message (private or broadcast).
     
@@ -147,6 +1008,9 @@ async def send_message(message: BitchatMessage, recipient: str = None) -> None:
         message (BitchatMessage): Message to send.
         recipient (str, optional): Target peer ID for private messages (must start with 'bitchat_').
     
+    Returns:
+        Optional[BroadcastReport]: Per-peer results for broadcasts, None for private messages.
+    
     Raises:
         ValueError: If recipient is invalid.
         RuntimeError: If sending fails.
@@ -164,7 +1028,7 @@ async def send_message(message: BitchatMessage, recipient: str = None) -> None:
             recipient_id=recipient.encode('utf-8').ljust(16)[:16] if recipient else b'\x00' * 16,
             timestamp=message.timestamp,
             payload=encode_message(message),
-            signature=b'\x00' * 64,  # Updated in send_packet
+            signature=b'\x00' * 64,  # Signed in build_frame
             ttl=100
         )
         
@@ -173,15 +1037,17 @@ async def send_message(message: BitchatMessage, recipient: str = None) -> None:
             await send_packet(packet, recipient)
         else:
             # Broadcast to all discovered peers
-            peers = await scan_peers()
+            peers = await resolve_peers()
             if not peers:
                 raise ValueError("No peers found for broadcast")
-            for peer_id in peers:
-                await send_packet(packet, peer_id)
+            report = await broadcast_packet(packet, peers)
+            if not report.delivered:
+                raise ValueError(f"Broadcast failed for all peers: {report.failed}")
+            return report
     except Exception as e:
         raise RuntimeError(f"Failed to send message: {str(e)}")
 
-async def send_encrypted_channel_message(message: BitchatMessage, channel: str) -> None:
+async def send_encrypted_channel_message(message: BitchatMessage, channel: str) -> BroadcastReport:
     """
     Send an encrypted message to a specific channel.
     
@@ -189,6 +1055,9 @@ async def send_encrypted_channel_message(message: BitchatMessage, channel: str)
         message (BitchatMessage): Encrypted message to send.
         channel (str): Target channel name.
     
+    Returns:
+        BroadcastReport: Per-peer results of the channel broadcast.
+    
     Raises:
         ValueError: If message is not encrypted or channel mismatches.
         RuntimeError: If sending fails.
@@ -207,25 +1076,52 @@ async def send_encrypted_channel_message(message: BitchatMessage, channel: str)
             recipient_id=channel.encode('utf-8').ljust(16)[:16],
             timestamp=message.timestamp,
             payload=encode_message(message),
-            signature=b'\x00' * 64,  # Updated in send_packet
+            signature=b'\x00' * 64,  # Signed in build_frame
             ttl=100
         )
         
         # Broadcast to all peers
-        peers = await scan_peers()
+        peers = await resolve_peers()
         if not peers:
             raise ValueError("No peers found for channel broadcast")
-        for peer_id in peers:
-            await send_packet(packet, peer_id)
+        report = await broadcast_packet(packet, peers, hold=True)
+        if not report.delivered and not report.held:
+            raise ValueError(f"Channel broadcast failed for all peers: {report.failed}")
+        return report
     except Exception as e:
         raise RuntimeError(f"Failed to send encrypted channel message: {str(e)}")
 
-async def send_delivery_ack(ack: DeliveryAck) -> None:
+async def _send_ack(ack: Union[DeliveryAck, CumulativeAck]) -> None:
+    """
+    Build and send a delivery_ack or cumulative_ack packet to ack.recipient_id.
+    """
+    cumulative = isinstance(ack, CumulativeAck)
+    message_id = ack.message_ids[0] if cumulative else ack.message_id
+    packet = BitchatPacket(
+        version=1,
+        type=CUMULATIVE_ACK_TYPE if cumulative else "delivery_ack",
+        sender_id=ack.recipient_id.encode('utf-8').ljust(16)[:16],
+        recipient_id=message_id.encode('utf-8').ljust(16)[:16],
+        timestamp=asyncio.get_event_loop().time(),
+        payload=ack.encode(),
+        signature=b'\x00' * 64,  # Signed in build_frame
+        ttl=10
+    )
+    
+    # Send to the original sender
+    await send_packet(packet, ack.recipient_id, Priority.ACK)
+
+async def send_delivery_ack(ack: DeliveryAck, aggregate: bool = True) -> None:
     """
     Send a delivery acknowledgment to the sender.
     
+    By default the ack waits up to ACK_FLUSH_WINDOW for other acks to the
+    same peer and goes out with them as one cumulative_ack packet, so ack
+    traffic grows with the number of flush windows rather than messages.
+    
     Args:
         ack (DeliveryAck): Acknowledgment to send.
+        aggregate (bool): Whether to batch the ack with others for the same peer.
     
     Raises:
         ValueError: If recipient_id is invalid.
@@ -234,21 +1130,10 @@ async def send_delivery_ack(ack: DeliveryAck) -> None:
     try:
         if not ack.recipient_id.startswith("bitchat_"):
             raise ValueError("recipient_id must start with 'bitchat_'")
-        
-        # Create packet
-        packet = BitchatPacket(
-            version=1,
-            type="delivery_ack",
-            sender_id=ack.recipient_id.encode('utf-8').ljust(16)[:16],
-            recipient_id=ack.message_id.encode('utf-8').ljust(16)[:16],
-            timestamp=asyncio.get_event_loop().time(),
-            payload=ack.encode(),
-            signature=b'\x00' * 64,  # Updated in send_packet
-            ttl=10
-        )
-        
-        # Send to the original sender
-        await send_packet(packet, ack.recipient_id)
+        if aggregate:
+            await ack_aggregator.send(ack)
+        else:
+            await _send_ack(ack)
     except Exception as e:
         raise RuntimeError(f"Failed to send delivery acknowledgment: {str(e)}")
 
@@ -275,58 +1160,58 @@ async def send_read_receipt(receipt: ReadReceipt) -> None:
             recipient_id=receipt.message_id.encode('utf-8').ljust(16)[:16],
             timestamp=receipt.timestamp,
             payload=receipt.encode(),
-            signature=b'\x00' * 64,  # Updated in send_packet
+            signature=b'\x00' * 64,  # Signed in build_frame
             ttl=10
         )
         
         # Send to the original sender
-        await send_packet(packet, receipt.recipient_id)
+        await send_packet(packet, receipt.recipient_id, Priority.ACK)
     except Exception as e:
         raise RuntimeError(f"Failed to send read receipt: {str(e)}")
 
-def start_advertising(peer_id: str) -> None:
+def start_advertising_sync(peer_id: str) -> None:
     """
     Synchronous wrapper for start_advertising.
     """
     asyncio.run(start_advertising(peer_id))
 
-def scan_peers() -> List[str]:
+def scan_peers_sync() -> List[str]:
     """
     Synchronous wrapper for scan_peers.
     """
     return asyncio.run(scan_peers())
 
-def send_packet(packet: BitchatPacket, peer_id: str) -> None:
+def send_packet_sync(packet: BitchatPacket, peer_id: str) -> None:
     """
     Synchronous wrapper for send_packet.
     """
     asyncio.run(send_packet(packet, peer_id))
 
-def receive_packet() -> Optional[BitchatPacket]:
+def receive_packet_sync() -> Optional[BitchatPacket]:
     """
     Synchronous wrapper for receive_packet.
     """
     return asyncio.run(receive_packet())
 
-def send_message(message: BitchatMessage, recipient: str = None) -> None:
+def send_message_sync(message: BitchatMessage, recipient: str = None) -> Optional[BroadcastReport]:
     """
     Synchronous wrapper for send_message.
     """
-    asyncio.run(send_message(message, recipient))
+    return asyncio.run(send_message(message, recipient))
 
-def send_encrypted_channel_message(message: BitchatMessage, channel: str) -> None:
+def send_encrypted_channel_message_sync(message: BitchatMessage, channel: str) -> BroadcastReport:
     """
     Synchronous wrapper for send_encrypted_channel_message.
     """
-    asyncio.run(send_encrypted_channel_message(message, channel))
+    return asyncio.run(send_encrypted_channel_message(message, channel))
 
-def send_delivery_ack(ack: DeliveryAck) -> None:
+def send_delivery_ack_sync(ack: DeliveryAck) -> None:
     """
     Synchronous wrapper for send_delivery_ack.
     """
     asyncio.run(send_delivery_ack(ack))
 
-def send_read_receipt(receipt: ReadReceipt) -> None:
+def send_read_receipt_sync(receipt: ReadReceipt) -> None:
     """
     Synchronous wrapper for send_read_receipt.
     """
@@ -1,14 +1,30 @@
+import asyncio
+import heapq
+import inspect
+import random
+import re
+from collections import Counter, OrderedDict
 from enum import Enum
-from typing import Dict, List
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple, Union
 from dataclasses import dataclass
 from uuid import uuid4
-from .message import DeliveryAck
+from . import message
+from .message import CumulativeAck
 
 class DeliveryStatus(Enum):
     PENDING = "pending"
     DELIVERED = "delivered"
     FAILED = "failed"
 
+# Statuses a message does not leave on its own; wait() returns once one is reached
+FINAL_STATUSES = {DeliveryStatus.DELIVERED, DeliveryStatus.FAILED}
+
+@dataclass
+class StatusChange:
+    message_id: str
+    status: DeliveryStatus
+    previous: Optional[DeliveryStatus]
+
 @dataclass
 class DeliveryAck:
     ack_id: str
@@ -17,12 +33,271 @@ class DeliveryAck:
     nickname: str
     hop_count: int
 
+# ACKs process_ack takes: the tracker's own, as received on the wire, or cumulative
+AnyAck = Union[DeliveryAck, message.DeliveryAck, CumulativeAck]
+
+# Re-sends a message: (message_id, attempt number), sync or async
+ResendCallback = Callable[[str, int], Any]
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 3  # Sends in total, the first included
+    base_delay: float = 2.0  # Seconds to wait for an ACK after the first send
+    max_delay: float = 30.0  # Longest wait between sends
+    multiplier: float = 2.0  # Wait growth per attempt
+    jitter: float = 0.2  # Random spread of each wait, as a fraction of it
+
+    def delay(self, attempt: int, rng: random.Random) -> float:
+        """
+        Return the seconds to wait for an ACK after the given send (1-based), with jitter.
+        """
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        return delay * (1 + rng.uniform(-self.jitter, self.jitter))
+
+# Retry policies by packet type; other types use RetryPolicy()
+DEFAULT_RETRY_POLICIES = {
+    "private_message": RetryPolicy(max_attempts=5, base_delay=2.0, max_delay=30.0),
+    "channel_message": RetryPolicy(max_attempts=3, base_delay=5.0, max_delay=30.0),
+    "read_receipt": RetryPolicy(max_attempts=2, base_delay=5.0, max_delay=10.0),
+}
+
+@dataclass
+class _Outstanding:
+    message_id: str
+    policy: RetryPolicy
+    resend: Optional[ResendCallback]
+    attempts: int = 1
+    deadline: float = 0.0
+
+class RetryScheduler:
+    """Deadlines for unacknowledged messages: re-send with exponential backoff, then give up."""
+
+    def __init__(self, on_exhausted: Callable[[str], None], rng: Optional[random.Random] = None):
+        """
+        Initialize a retry scheduler.
+
+        Deadlines live in a min-heap and a single event loop timer is armed
+        for the earliest one, so scheduling, expiring and re-sending cost
+        O(log n) however many messages are outstanding. Cancelled entries
+        are dropped lazily when they reach the top of the heap.
+
+        Args:
+            on_exhausted (Callable[[str], None]): Called with the message ID when its
+                last attempt times out.
+            rng (random.Random, optional): Randomness for backoff jitter.
+        """
+        self.on_exhausted = on_exhausted
+        self.rng = rng or random.Random()
+        self.resends = 0  # Re-sends made
+        self.exhausted = 0  # Messages that ran out of attempts
+        self._outstanding: Dict[str, _Outstanding] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._seq = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_at = float("inf")
+
+    def schedule(self, message_id: str, policy: RetryPolicy, resend: Optional[ResendCallback]) -> None:
+        """
+        Start waiting for an ACK to a message that was just sent.
+
+        Must be called from a running event loop. Scheduling a message again
+        restarts its attempts.
+
+        Args:
+            message_id (str): Message awaiting an ACK.
+            policy (RetryPolicy): Attempts and backoff to use.
+            resend (ResendCallback, optional): Re-sends the message; without it the
+                message just fails after the first wait.
+        """
+        entry = _Outstanding(message_id, policy, resend if policy.max_attempts > 1 else None)
+        self._outstanding[message_id] = entry
+        self._push(entry, asyncio.get_running_loop().time() + policy.delay(1, self.rng))
+
+    def cancel(self, message_id: str) -> bool:
+        """
+        Stop retrying a message, e.g. because its ACK arrived.
+
+        Returns:
+            bool: True if the message was outstanding.
+        """
+        if self._outstanding.pop(message_id, None) is None:
+            return False
+        if len(self._heap) > 2 * len(self._outstanding) + 64:
+            # Mostly cancelled entries: rebuild so the heap stays proportional to live ones
+            self._heap = [item for item in self._heap
+                          if item[2] in self._outstanding and self._outstanding[item[2]].deadline == item[0]]
+            heapq.heapify(self._heap)
+        return True
+
+    def _push(self, entry: _Outstanding, deadline: float) -> None:
+        entry.deadline = deadline
+        self._seq += 1
+        heapq.heappush(self._heap, (deadline, self._seq, entry.message_id))
+        if deadline < self._timer_at:
+            self._arm()
+
+    def _arm(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+            self._timer_at = float("inf")
+        if self._heap:
+            self._timer_at = self._heap[0][0]
+            self._timer = asyncio.get_running_loop().call_at(self._timer_at, self._fire)
+
+    def _fire(self) -> None:
+        """
+        Timer callback: handle every deadline that has passed, then re-arm for the next.
+        """
+        self._timer = None
+        self._timer_at = float("inf")
+        now = asyncio.get_running_loop().time()
+        while self._heap and self._heap[0][0] <= now:
+            deadline, _, message_id = heapq.heappop(self._heap)
+            entry = self._outstanding.get(message_id)
+            if entry is None or entry.deadline != deadline:
+                continue  # Cancelled or rescheduled
+            if entry.resend is None or entry.attempts >= entry.policy.max_attempts:
+                del self._outstanding[message_id]
+                self.exhausted += 1
+                self.on_exhausted(message_id)
+                continue
+            entry.attempts += 1
+            self.resends += 1
+            self._resend(entry)
+            self._push(entry, now + entry.policy.delay(entry.attempts, self.rng))
+        self._arm()
+
+    def _resend(self, entry: _Outstanding) -> None:
+        try:
+            result = entry.resend(entry.message_id, entry.attempts)
+        except Exception as e:
+            print(f"Failed to resend message {entry.message_id}: {str(e)}")
+            return
+        if inspect.isawaitable(result):
+            def report(future: asyncio.Future) -> None:
+                if not future.cancelled() and future.exception() is not None:
+                    print(f"Failed to resend message {entry.message_id}: {str(future.exception())}")
+            asyncio.ensure_future(result).add_done_callback(report)
+
+    def attempts(self, message_id: str) -> int:
+        """
+        Return how many times an outstanding message has been sent, or 0 if it is not outstanding.
+        """
+        entry = self._outstanding.get(message_id)
+        return entry.attempts if entry else 0
+
+    def __contains__(self, message_id: str) -> bool:
+        return message_id in self._outstanding
+
+    def __len__(self) -> int:
+        return len(self._outstanding)
+
+    def close(self) -> None:
+        """
+        Drop every outstanding message without failing it.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = None
+        self._timer_at = float("inf")
+        self._outstanding.clear()
+        self._heap.clear()
+
+# Canonical or bare-hex UUID, checked without building a UUID object
+_UUID_PATTERN = re.compile(r'[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}')
+
+class AckSummary:
+    """ACKs received for one message, reduced to a count and the shortest path."""
+
+    __slots__ = ("count", "min_hops")
+
+    def __init__(self, count: int, min_hops: int):
+        self.count = count
+        self.min_hops = min_hops
+
 class DeliveryTracker:
     """Manage delivery status and acknowledgments for messages in the bitchat protocol."""
     
-    def __init__(self):
+    def __init__(self, resend: Optional[ResendCallback] = None,
+                 policies: Optional[Dict[str, RetryPolicy]] = None, rng: Optional[random.Random] = None,
+                 max_messages: int = 10000, ack_detail: bool = False):
+        """
+        Initialize a delivery tracker.
+
+        Memory is bounded by ``max_messages``. Past it, the least recently
+        updated DELIVERED or FAILED messages are forgotten. PENDING messages
+        are kept until they settle; with track_outgoing they always do.
+        By default each message's ACKs are reduced to an AckSummary.
+
+        Args:
+            resend (ResendCallback, optional): Default re-send for messages tracked with
+                track_outgoing, called with the message ID and attempt number.
+            policies (Dict[str, RetryPolicy], optional): Retry policy by packet type
+                (default DEFAULT_RETRY_POLICIES).
+            rng (random.Random, optional): Randomness for backoff jitter.
+            max_messages (int): Messages tracked before settled ones are evicted.
+            ack_detail (bool): Keep every DeliveryAck object for get_acks, not just the summary.
+
+        Raises:
+            ValueError: If max_messages is non-positive.
+        """
+        if max_messages <= 0:
+            raise ValueError("max_messages must be positive")
         self.statuses: Dict[str, DeliveryStatus] = {}  # Map message_id to status
-        self.acks: Dict[str, List[DeliveryAck]] = {}  # Map message_id to list of ACKs
+        self.acks: Dict[str, List[AnyAck]] = {}  # Map message_id to list of ACKs (with ack_detail)
+        self.ack_summaries: Dict[str, AckSummary] = {}  # Map message_id to ACK count and minimum hops
+        self.max_messages = max_messages
+        self.ack_detail = ack_detail
+        self.evicted = 0  # Settled messages forgotten to stay within max_messages
+        self._counts: Counter = Counter()  # Messages per status
+        self._settled: 'OrderedDict[str, None]' = OrderedDict()  # Settled message ids, least recently updated first
+        self.resend = resend
+        self.policies = dict(DEFAULT_RETRY_POLICIES if policies is None else policies)
+        self.retries = RetryScheduler(self._on_exhausted, rng)
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    def _set_status(self, message_id: str, status: DeliveryStatus) -> None:
+        """
+        Record a status, publish the change and wake waiters once it is final.
+        """
+        previous = self.statuses.get(message_id)
+        self.statuses[message_id] = status
+        if status in FINAL_STATUSES:
+            self._settled[message_id] = None
+            self._settled.move_to_end(message_id)
+        elif previous in FINAL_STATUSES:
+            del self._settled[message_id]
+        if status == previous:
+            return
+        if previous is not None:
+            self._counts[previous] -= 1
+        self._counts[status] += 1
+        while len(self.statuses) > self.max_messages and self._settled:
+            self._forget(self._settled.popitem(last=False)[0])
+        change = StatusChange(message_id, status, previous)
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait(change)
+            except asyncio.QueueFull:
+                pass
+        if status in FINAL_STATUSES:
+            for future in self._waiters.pop(message_id, ()):
+                if not future.done():
+                    future.set_result(status)
+
+    def _forget(self, message_id: str) -> None:
+        self._counts[self.statuses.pop(message_id)] -= 1
+        self.acks.pop(message_id, None)
+        self.ack_summaries.pop(message_id, None)
+        self.evicted += 1
+
+    def count(self, status: DeliveryStatus) -> int:
+        """
+        Return the number of tracked messages with a status, in O(1).
+        """
+        return self._counts[status]
 
     def track_message(self, message_id: str, status: DeliveryStatus) -> None:
         """
@@ -39,7 +314,33 @@ class DeliveryTracker:
             raise ValueError("message_id cannot be empty")
         if not isinstance(status, DeliveryStatus):
             raise ValueError("status must be a DeliveryStatus enum")
-        self.statuses[message_id] = status
+        self._set_status(message_id, status)
+        if status != DeliveryStatus.PENDING:
+            self.retries.cancel(message_id)
+
+    def track_outgoing(self, message_id: str, packet_type: str = "private_message",
+                       resend: Optional[ResendCallback] = None) -> None:
+        """
+        Mark a message just sent as PENDING and retry it until an ACK arrives.
+
+        If no ACK arrives in time, the message is re-sent with exponential
+        backoff per the packet type's RetryPolicy. When the last attempt also
+        times out, its status becomes FAILED. Must be called from a running event loop.
+
+        Args:
+            message_id (str): Unique identifier of the message.
+            packet_type (str): Packet type, selecting the retry policy.
+            resend (ResendCallback, optional): Re-sends this message (default: the tracker's resend).
+
+        Raises:
+            ValueError: If message_id is empty.
+        """
+        self.track_message(message_id, DeliveryStatus.PENDING)
+        self.retries.schedule(message_id, self.policies.get(packet_type, RetryPolicy()), resend or self.resend)
+
+    def _on_exhausted(self, message_id: str) -> None:
+        if self.statuses.get(message_id) == DeliveryStatus.PENDING:
+            self._set_status(message_id, DeliveryStatus.FAILED)
 
     def generate_ack(self, message_id: str, recipient_id: str, nickname: str, hop_count: int) -> DeliveryAck:
         """
@@ -64,14 +365,10 @@ class DeliveryTracker:
         if hop_count < 0:
             raise ValueError("hop_count cannot be negative")
         
-        # Validate or generate UUIDs
-        try:
-            uuid4(hex=message_id)
-        except ValueError:
+        # Validate UUIDs
+        if not _UUID_PATTERN.fullmatch(message_id):
             raise ValueError("message_id must be a valid UUID")
-        try:
-            uuid4(hex=recipient_id)
-        except ValueError:
+        if not _UUID_PATTERN.fullmatch(recipient_id):
             raise ValueError("recipient_id must be a valid UUID")
         
         return DeliveryAck(
@@ -82,28 +379,100 @@ class DeliveryTracker:
             hop_count=hop_count
         )
 
-    def process_ack(self, ack: DeliveryAck) -> None:
+    def process_ack(self, ack: AnyAck) -> None:
         """
-        Process a received DeliveryAck and update message status.
+        Process a received DeliveryAck or CumulativeAck and update message status.
+
+        Both the tracker's DeliveryAck and the wire-format message.DeliveryAck
+        are accepted. A CumulativeAck marks every message it lists as
+        delivered in one call.
 
         Args:
-            ack (DeliveryAck): Acknowledgment object to process.
+            ack (AnyAck): Acknowledgment object to process.
 
         Raises:
             ValueError: If ack or its fields are invalid.
         """
-        if not isinstance(ack, DeliveryAck):
+        if isinstance(ack, CumulativeAck):
+            if not ack.message_ids or not all(ack.message_ids):
+                raise ValueError("ack.message_ids cannot be empty")
+            for message_id in ack.message_ids:
+                self._record_ack(message_id, ack)
+            return
+        if not isinstance(ack, (DeliveryAck, message.DeliveryAck)):
             raise ValueError("ack must be a DeliveryAck object")
         if not ack.message_id:
             raise ValueError("ack.message_id cannot be empty")
-        
+        self._record_ack(ack.message_id, ack)
+
+    def _record_ack(self, message_id: str, ack: AnyAck) -> None:
         # Update status to DELIVERED
-        self.statuses[ack.message_id] = DeliveryStatus.DELIVERED
+        self._set_status(message_id, DeliveryStatus.DELIVERED)
+        self.retries.cancel(message_id)
         
         # Store ACK
-        if ack.message_id not in self.acks:
-            self.acks[ack.message_id] = []
-        self.acks[ack.message_id].append(ack)
+        summary = self.ack_summaries.get(message_id)
+        if summary is None:
+            self.ack_summaries[message_id] = AckSummary(1, ack.hop_count)
+        else:
+            summary.count += 1
+            summary.min_hops = min(summary.min_hops, ack.hop_count)
+        if self.ack_detail:
+            self.acks.setdefault(message_id, []).append(ack)
+
+    async def wait(self, message_id: str, timeout: Optional[float] = None) -> Optional[DeliveryStatus]:
+        """
+        Wait until a message is DELIVERED or FAILED.
+
+        Returns at once if it already is. No polling is involved: the waiter
+        is woken by the ACK or failure that settles the message.
+
+        Args:
+            message_id (str): Unique identifier of the message.
+            timeout (float, optional): Seconds to wait at most.
+
+        Returns:
+            Optional[DeliveryStatus]: The final status, or the status at the timeout
+            (None if the message is unknown).
+
+        Raises:
+            ValueError: If message_id is empty.
+        """
+        if not message_id:
+            raise ValueError("message_id cannot be empty")
+        status = self.statuses.get(message_id)
+        if status in FINAL_STATUSES:
+            return status
+        future = asyncio.get_running_loop().create_future()
+        waiters = self._waiters.setdefault(message_id, [])
+        waiters.append(future)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return self.statuses.get(message_id)
+        finally:
+            if future in waiters:
+                waiters.remove(future)
+            if not waiters and self._waiters.get(message_id) is waiters:
+                del self._waiters[message_id]
+
+    async def changes(self, maxsize: int = 100) -> AsyncIterator[StatusChange]:
+        """
+        Yield status changes of all messages as they happen.
+
+        Args:
+            maxsize (int): Changes buffered for this subscriber before new ones are dropped.
+
+        Yields:
+            StatusChange: Message ID with its new and previous status.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self._subscribers.add(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers.discard(queue)
 
     def get_status(self, message_id: str) -> DeliveryStatus:
         """
@@ -119,19 +488,38 @@ class DeliveryTracker:
             raise ValueError("message_id cannot be empty")
         return self.statuses.get(message_id)
 
-    def get_acks(self, message_id: str) -> List[DeliveryAck]:
+    def get_acks(self, message_id: str) -> List[AnyAck]:
         """
         Retrieve all ACKs for a message.
 
+        Only kept with ``ack_detail``; otherwise use get_ack_summary.
+
+        Args:
+            message_id (str): Unique identifier of the message.
+
+        Returns:
+            List[AnyAck]: ACKs covering the message, or empty list if none.
+
+        Raises:
+            ValueError: If message_id is empty.
+        """
+        if not message_id:
+            raise ValueError("message_id cannot be empty")
+        return self.acks.get(message_id, [])
+
+    def get_ack_summary(self, message_id: str) -> Optional[AckSummary]:
+        """
+        Retrieve the ACK count and minimum hop count for a message.
+
         Args:
             message_id (str): Unique identifier of the message.
 
         Returns:
-            List[DeliveryAck]: List of ACKs for the message, or empty list if none.
+            Optional[AckSummary]: The summary, or None if no ACK was received.
 
         Raises:
             ValueError: If message_id is empty.
         """
         if not message_id:
             raise ValueError("message_id cannot be empty")
-        return self.acks.get(message_id, [])
\ No newline at end of file
+        return self.ack_summaries.get(message_id)
@@ -0,0 +1,237 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set
+from bleak import BleakScanner
+from bleak.exc import BleakError
+
+@dataclass
+class PeerInfo:
+    peer_id: str
+    address: str
+    rssi: Optional[int]
+    last_seen: float
+    services: List[str] = field(default_factory=list)
+
+@dataclass
+class PeerEvent:
+    kind: str  # "added", "updated" or "removed"
+    peer: PeerInfo
+
+class PeerTable:
+    """Track nearby peers by peer id with their address, signal strength and last sighting."""
+
+    def __init__(self, expiry: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize an empty peer table.
+
+        Args:
+            expiry (float): Seconds without a sighting after which a peer is dropped.
+            clock (Callable[[], float]): Time source, monotonic seconds.
+
+        Raises:
+            ValueError: If expiry is non-positive.
+        """
+        if expiry <= 0:
+            raise ValueError("expiry must be positive")
+        self.expiry = expiry
+        self.clock = clock
+        self._peers: Dict[str, PeerInfo] = {}
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    def update(self, peer_id: str, address: str, rssi: Optional[int] = None,
+               services: Optional[List[str]] = None) -> PeerInfo:
+        """
+        Record a sighting of a peer.
+
+        Emits an "added" event for new peers, and for peers seen again after
+        their entry expired but before expire() swept it. An "updated" event
+        is emitted when the address or advertised services change; RSSI and
+        last_seen refresh silently.
+
+        Args:
+            peer_id (str): Peer identifier (advertised name).
+            address (str): Device address to connect to.
+            rssi (int, optional): Received signal strength in dBm.
+            services (List[str], optional): Advertised service UUIDs.
+
+        Returns:
+            PeerInfo: The peer's table entry.
+        """
+        services = services or []
+        now = self.clock()
+        info = self._peers.get(peer_id)
+        if info is None or now - info.last_seen > self.expiry:
+            info = PeerInfo(peer_id=peer_id, address=address, rssi=rssi, last_seen=now, services=services)
+            self._peers[peer_id] = info
+            self._publish(PeerEvent("added", info))
+            return info
+        changed = info.address != address or (services and info.services != services)
+        info.address = address
+        info.rssi = rssi
+        info.last_seen = now
+        if services:
+            info.services = services
+        if changed:
+            self._publish(PeerEvent("updated", info))
+        return info
+
+    def get(self, peer_id: str) -> Optional[PeerInfo]:
+        """
+        Look up a live peer.
+
+        Args:
+            peer_id (str): Peer identifier.
+
+        Returns:
+            Optional[PeerInfo]: The entry, or None if unknown or expired.
+        """
+        info = self._peers.get(peer_id)
+        if info is None or self.clock() - info.last_seen > self.expiry:
+            return None
+        return info
+
+    def remove(self, peer_id: str) -> None:
+        """
+        Drop a peer from the table.
+
+        Args:
+            peer_id (str): Peer identifier.
+        """
+        info = self._peers.pop(peer_id, None)
+        if info is not None:
+            self._publish(PeerEvent("removed", info))
+
+    def expire(self) -> List[str]:
+        """
+        Drop peers not seen within the expiry window.
+
+        Returns:
+            List[str]: Peer IDs that were removed.
+        """
+        deadline = self.clock() - self.expiry
+        stale = [peer_id for peer_id, info in self._peers.items() if info.last_seen < deadline]
+        for peer_id in stale:
+            self.remove(peer_id)
+        return stale
+
+    def peers(self) -> List[str]:
+        """
+        Return the IDs of all live peers, strongest signal first.
+        """
+        now = self.clock()
+        live = [info for info in self._peers.values() if now - info.last_seen <= self.expiry]
+        live.sort(key=lambda info: info.rssi if info.rssi is not None else -1000, reverse=True)
+        return [info.peer_id for info in live]
+
+    def __contains__(self, peer_id: str) -> bool:
+        return self.get(peer_id) is not None
+
+    def __len__(self) -> int:
+        return len(self._peers)
+
+    def _publish(self, event: PeerEvent) -> None:
+        """
+        Deliver an event to every subscriber, dropping it for full queues.
+        """
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                pass
+
+    async def changes(self, maxsize: int = 100) -> AsyncIterator[PeerEvent]:
+        """
+        Yield peer table changes as they happen.
+
+        Args:
+            maxsize (int): Events buffered for this subscriber before new ones are dropped.
+
+        Yields:
+            PeerEvent: Added, updated or removed peers.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self._subscribers.add(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers.discard(queue)
+
+class PeerScanner:
+    """Keep a PeerTable current from a long-running background BLE scan."""
+
+    def __init__(self, table: PeerTable, service_uuids: List[str], prefix: str = "bitchat_",
+                 expire_interval: float = 5.0):
+        """
+        Initialize a scanner feeding a peer table.
+
+        Args:
+            table (PeerTable): Table to update with sightings.
+            service_uuids (List[str]): Service UUIDs to filter advertisements by.
+            prefix (str): Required prefix of advertised peer names.
+            expire_interval (float): Seconds between sweeps for stale peers.
+        """
+        self.table = table
+        self.service_uuids = service_uuids
+        self.prefix = prefix
+        self.expire_interval = expire_interval
+        self._scanner: Optional[BleakScanner] = None
+        self._expire_task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        """
+        Whether the background scan is active.
+        """
+        return self._scanner is not None
+
+    def _on_detection(self, device, advertisement_data) -> None:
+        """
+        Bleak detection callback: record bitchat peers in the table.
+        """
+        name = getattr(advertisement_data, "local_name", None) or device.name
+        if not name or not name.startswith(self.prefix):
+            return
+        self.table.update(
+            name,
+            device.address,
+            getattr(advertisement_data, "rssi", None),
+            list(getattr(advertisement_data, "service_uuids", None) or [])
+        )
+
+    async def _expire_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.expire_interval)
+            self.table.expire()
+
+    async def start(self) -> None:
+        """
+        Start scanning in the background.
+
+        Raises:
+            RuntimeError: If the scanner cannot be started.
+        """
+        if self.running:
+            return
+        try:
+            scanner = BleakScanner(detection_callback=self._on_detection, service_uuids=self.service_uuids)
+            await scanner.start()
+        except BleakError as e:
+            raise RuntimeError(f"Failed to start peer scanner: {str(e)}")
+        self._scanner = scanner
+        self._expire_task = asyncio.create_task(self._expire_loop())
+
+    async def stop(self) -> None:
+        """
+        Stop the background scan.
+        """
+        if self._expire_task is not None:
+            self._expire_task.cancel()
+            self._expire_task = None
+        if self._scanner is not None:
+            scanner, self._scanner = self._scanner, None
+            try:
+                await scanner.stop()
+            except BleakError:
+                pass
@@ -1,6 +1,7 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import List, Optional
 import struct
+from uuid import UUID
 
 @dataclass
 class BitchatPacket:
@@ -12,6 +13,8 @@ class BitchatPacket:
     payload: bytes
     signature: bytes
     ttl: int
+    # 8-byte identity of the packet, see bitchat.protocol.packet_fingerprint
+    fingerprint: Optional[bytes] = field(default=None, compare=False, repr=False)
 
 @dataclass
 class BitchatMessage:
@@ -130,6 +133,140 @@ class DeliveryAck:
         except (struct.error, UnicodeDecodeError, ValueError):
             return None
 
+# Most message ids one CumulativeAck may carry
+MAX_CUMULATIVE_IDS = 65535
+
+@dataclass
+class CumulativeAck:
+    message_ids: List[str]
+    recipient_id: str
+    nickname: str
+    hop_count: int
+
+    def encode(self) -> bytes:
+        """
+        Encode CumulativeAck into bytes.
+        
+        Format:
+        - recipient_id: uint8 (length) + string
+        - nickname: uint8 (length) + string
+        - hop_count: uint32 (4 bytes)
+        - count: uint16 (2 bytes)
+        - message_ids: per id, uint8 (length) + string, or a zero length
+          followed by 16 bytes for an id in canonical UUID form
+        """
+        try:
+            recipient_id_bytes = self.recipient_id.encode('utf-8')
+            nickname_bytes = self.nickname.encode('utf-8')
+            
+            # Validate lengths
+            for length in (len(recipient_id_bytes), len(nickname_bytes)):
+                if length > 255:
+                    raise ValueError(f"Field length exceeds 255 bytes: {length}")
+            if not self.message_ids:
+                raise ValueError("message_ids cannot be empty")
+            if len(self.message_ids) > MAX_CUMULATIVE_IDS:
+                raise ValueError(f"Too many message ids: {len(self.message_ids)}")
+            
+            # Pack fields
+            parts = [
+                struct.pack('!B', len(recipient_id_bytes)) + recipient_id_bytes,
+                struct.pack('!B', len(nickname_bytes)) + nickname_bytes,
+                struct.pack('!IH', self.hop_count, len(self.message_ids))
+            ]
+            for message_id in self.message_ids:
+                compact = _uuid_bytes(message_id)
+                if compact is not None:
+                    parts.append(b'\x00' + compact)
+                    continue
+                message_id_bytes = message_id.encode('utf-8')
+                if not 0 < len(message_id_bytes) <= 255:
+                    raise ValueError(f"Invalid message id length: {len(message_id_bytes)}")
+                parts.append(struct.pack('!B', len(message_id_bytes)) + message_id_bytes)
+            return b''.join(parts)
+        except (struct.error, UnicodeEncodeError, ValueError) as e:
+            raise ValueError(f"Failed to encode CumulativeAck: {str(e)}")
+
+    @staticmethod
+    def id_size(message_id: str) -> int:
+        """
+        Return the bytes one message id takes in the encoded form.
+        """
+        if _uuid_bytes(message_id) is not None:
+            return 17
+        return 1 + len(message_id.encode('utf-8'))
+
+    @classmethod
+    def decode(cls, data: bytes) -> Optional['CumulativeAck']:
+        """
+        Decode bytes into a CumulativeAck.
+        
+        Returns None if the data is invalid.
+        """
+        try:
+            offset = 0
+            
+            # recipient_id, nickname: uint8 (length) + string
+            fields = []
+            for _ in range(2):
+                if offset + 1 > len(data):
+                    return None
+                length = data[offset]
+                offset += 1
+                if offset + length > len(data):
+                    return None
+                fields.append(data[offset:offset+length].decode('utf-8'))
+                offset += length
+            
+            # hop_count: uint32, count: uint16
+            if offset + 6 > len(data):
+                return None
+            hop_count, count = struct.unpack('!IH', data[offset:offset+6])
+            offset += 6
+            if count == 0:
+                return None
+            
+            # message_ids
+            message_ids = []
+            for _ in range(count):
+                if offset + 1 > len(data):
+                    return None
+                length = data[offset]
+                offset += 1
+                if length == 0:
+                    if offset + 16 > len(data):
+                        return None
+                    message_ids.append(str(UUID(bytes=data[offset:offset+16])))
+                    offset += 16
+                else:
+                    if offset + length > len(data):
+                        return None
+                    message_ids.append(data[offset:offset+length].decode('utf-8'))
+                    offset += length
+            
+            # Ensure no extra data
+            if offset != len(data):
+                return None
+                
+            return cls(
+                message_ids=message_ids,
+                recipient_id=fields[0],
+                nickname=fields[1],
+                hop_count=hop_count
+            )
+        except (struct.error, UnicodeDecodeError, ValueError):
+            return None
+
+def _uuid_bytes(message_id: str) -> Optional[bytes]:
+    # 16-byte form of an id that decodes back to the same string, else None
+    if len(message_id) != 36:
+        return None
+    try:
+        value = UUID(message_id)
+    except ValueError:
+        return None
+    return value.bytes if str(value) == message_id else None
+
 @dataclass
 class ReadReceipt:
     message_id: str
@@ -0,0 +1,265 @@
+import asyncio
+import inspect
+import time
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+from .message import BitchatPacket, BitchatMessage, unpad
+from .protocol import decode_packet, decode_message
+from .encryption import verify_signature
+from .keychain import retrieve_key
+from .utils import OptimizedBloomFilter
+
+@dataclass
+class ReceivedFrame:
+    peer_id: Optional[str]  # Neighbour the frame arrived from
+    data: bytes
+    packet: Optional[BitchatPacket] = None
+    message: Optional[BitchatMessage] = None
+
+class Stage:
+    """One step of a Pipeline: a function applied to items by one or more workers."""
+
+    def __init__(self, name: str, func: Callable[[Any], Any], workers: int = 1, maxsize: int = 64,
+                 executor: Optional[Executor] = None):
+        """
+        Initialize a pipeline stage.
+
+        Args:
+            name (str): Stage name used in stats.
+            func (Callable[[Any], Any]): Sync or async function returning the item for the
+                next stage, or None to drop it.
+            workers (int): Number of concurrent worker tasks.
+            maxsize (int): Capacity of the stage's input queue.
+            executor (Executor, optional): Run a sync ``func`` in this executor instead of
+                on the event loop.
+
+        Raises:
+            ValueError: If workers or maxsize is non-positive.
+        """
+        if workers <= 0:
+            raise ValueError("workers must be positive")
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.maxsize = maxsize
+        self.executor = executor
+        self.queue: Optional[asyncio.Queue] = None
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.busy_time = 0.0  # Seconds spent inside func, summed over workers
+        self.started_at: Optional[float] = None
+
+    async def run(self, item: Any) -> Any:
+        """
+        Apply the stage function to one item.
+        """
+        if inspect.iscoroutinefunction(self.func):
+            return await self.func(item)
+        if self.executor is not None:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, self.func, item)
+        return self.func(item)
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Items waiting in the stage's input queue.
+        """
+        return self.queue.qsize() if self.queue is not None else 0
+
+    @property
+    def throughput(self) -> float:
+        """
+        Items processed per second since the pipeline started.
+        """
+        if self.started_at is None:
+            return 0.0
+        elapsed = time.monotonic() - self.started_at
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def average_latency(self) -> float:
+        """
+        Mean seconds spent processing one item.
+        """
+        return self.busy_time / self.processed if self.processed else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Return the stage's counters and gauges.
+        """
+        return {
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "queue_depth": self.queue_depth,
+            "throughput": self.throughput,
+            "average_latency": self.average_latency,
+        }
+
+class Pipeline:
+    """Chain of stages connected by bounded queues, each served by its own workers."""
+
+    def __init__(self, stages: List[Stage]):
+        """
+        Initialize a pipeline.
+
+        A full queue blocks the workers of the stage feeding it, so a slow stage
+        pushes back all the way to submit().
+
+        Args:
+            stages (List[Stage]): Stages in processing order.
+
+        Raises:
+            ValueError: If stages is empty or names repeat.
+        """
+        if not stages:
+            raise ValueError("Pipeline needs at least one stage")
+        if len({stage.name for stage in stages}) != len(stages):
+            raise ValueError("Stage names must be unique")
+        self.stages = stages
+        self._tasks: List[asyncio.Task] = []
+
+    def __getitem__(self, name: str) -> Stage:
+        return next(stage for stage in self.stages if stage.name == name)
+
+    async def start(self) -> None:
+        """
+        Create the stage queues and start their workers.
+        """
+        if self._tasks:
+            return
+        now = time.monotonic()
+        for stage in self.stages:
+            stage.queue = asyncio.Queue(stage.maxsize)
+            stage.started_at = now
+        for i, stage in enumerate(self.stages):
+            downstream = self.stages[i + 1] if i + 1 < len(self.stages) else None
+            for _ in range(stage.workers):
+                self._tasks.append(asyncio.ensure_future(self._work(stage, downstream)))
+
+    async def _work(self, stage: Stage, downstream: Optional[Stage]) -> None:
+        while True:
+            item = await stage.queue.get()
+            try:
+                started = time.monotonic()
+                try:
+                    result = await stage.run(item)
+                except Exception as e:
+                    stage.errors += 1
+                    print(f"Pipeline stage {stage.name} failed: {str(e)}")
+                    continue
+                finally:
+                    stage.busy_time += time.monotonic() - started
+                stage.processed += 1
+                if downstream is None:
+                    continue  # The last stage consumes its items; None is not a drop
+                if result is None:
+                    stage.dropped += 1
+                else:
+                    await downstream.queue.put(result)
+            finally:
+                stage.queue.task_done()
+
+    async def submit(self, item: Any) -> None:
+        """
+        Feed an item into the first stage, waiting while it is full.
+
+        Args:
+            item: Input for the first stage.
+        """
+        await self.stages[0].queue.put(item)
+
+    async def join(self) -> None:
+        """
+        Wait until every submitted item has left the pipeline.
+        """
+        for stage in self.stages:
+            await stage.queue.join()
+
+    async def close(self) -> None:
+        """
+        Stop all workers; items still queued are discarded.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Return per-stage stats keyed by stage name.
+        """
+        return {stage.name: stage.stats() for stage in self.stages}
+
+def receive_pipeline(dispatch: Callable[[ReceivedFrame], Any], seen: Optional[OptimizedBloomFilter] = None,
+                     verify_workers: int = 2, executor: Optional[Executor] = None,
+                     maxsize: int = 64) -> Pipeline:
+    """
+    Build the standard receive pipeline for ReceivedFrame items.
+
+    Stages: unpad -> decode_header -> dedup -> verify -> decode_message -> dispatch.
+
+    Args:
+        dispatch (Callable[[ReceivedFrame], Any]): Sync or async handler for verified frames.
+        seen (OptimizedBloomFilter, optional): Fingerprints already accepted (default: a new rotating filter).
+        verify_workers (int): Worker tasks for signature verification.
+        executor (Executor, optional): Executor for HMAC verification, keeping it off the event loop.
+        maxsize (int): Capacity of each stage's queue.
+
+    Returns:
+        Pipeline: A pipeline ready to start().
+    """
+    if seen is None:
+        seen = OptimizedBloomFilter.adaptive(100, generations=3)
+
+    def unpad_stage(frame: ReceivedFrame) -> Optional[ReceivedFrame]:
+        frame.data = unpad(frame.data)
+        return frame if frame.data else None
+
+    def decode_header_stage(frame: ReceivedFrame) -> Optional[ReceivedFrame]:
+        frame.packet = decode_packet(frame.data)
+        return frame if frame.packet is not None else None
+
+    def dedup_stage(frame: ReceivedFrame) -> Optional[ReceivedFrame]:
+        return None if seen.contains(frame.packet.fingerprint) else frame
+
+    async def verify_stage(frame: ReceivedFrame) -> Optional[ReceivedFrame]:
+        packet = frame.packet
+        key = retrieve_key(f"peer:{packet.sender_id.decode('utf-8', errors='ignore')}")
+        if not key:
+            return None
+        if executor is not None:
+            valid = await asyncio.get_running_loop().run_in_executor(
+                executor, verify_signature, packet.payload, packet.signature, key)
+        else:
+            valid = verify_signature(packet.payload, packet.signature, key)
+        # Re-check after verifying: another worker may have accepted a copy meanwhile
+        if not valid or seen.contains(packet.fingerprint):
+            return None
+        seen.insert(packet.fingerprint)
+        return frame
+
+    def decode_message_stage(frame: ReceivedFrame) -> Optional[ReceivedFrame]:
+        if frame.packet.type.endswith("_message"):
+            frame.message = decode_message(frame.packet.payload)
+            if frame.message is None:
+                return None
+        return frame
+
+    async def dispatch_stage(frame: ReceivedFrame) -> None:
+        result = dispatch(frame)
+        if inspect.isawaitable(result):
+            await result
+
+    return Pipeline([
+        Stage("unpad", unpad_stage, maxsize=maxsize),
+        Stage("decode_header", decode_header_stage, maxsize=maxsize),
+        Stage("dedup", dedup_stage, maxsize=maxsize),
+        Stage("verify", verify_stage, workers=verify_workers, maxsize=maxsize),
+        Stage("decode_message", decode_message_stage, maxsize=maxsize),
+        Stage("dispatch", dispatch_stage, maxsize=maxsize),
+    ])
@@ -1,6 +1,45 @@
 import struct
-from typing import Optional
-from .message import BitchatPacket, BitchatMessage
+import time
+from hashlib import blake2b
+from typing import Callable, List, Optional
+from .message import BitchatPacket, BitchatMessage, pad, unpad, optimal_block_size
+
+# Size in bytes of the packet fingerprint used by dedup filters and caches
+FINGERPRINT_SIZE = 8
+
+# Packet type carrying several encoded packets for one neighbour
+BUNDLE_TYPE = "bundle"
+# Bytes a bundle adds on top of its packets: packet header, type string and signature,
+# plus a 2-byte length prefix per packet
+BUNDLE_OVERHEAD = 51 + len(BUNDLE_TYPE) + 64
+
+# Packet type acknowledging several messages at once (payload: message.CumulativeAck)
+CUMULATIVE_ACK_TYPE = "cumulative_ack"
+
+# Largest frame FrameAssembler waits for; longer headers are treated as garbage
+MAX_FRAME_SIZE = 65536
+
+# Offset of the uint32 TTL in an encoded frame: version (2), type length (1), sender_id (16),
+# recipient_id (16), timestamp (8)
+TTL_OFFSET = 43
+
+def packet_fingerprint(packet: BitchatPacket) -> bytes:
+    """
+    Return the 8-byte fingerprint identifying a packet on the mesh.
+
+    The fingerprint is a truncated BLAKE2b over sender_id, the packed
+    timestamp and the signature, so it is stable across relays (which only
+    change the TTL). Decoded packets carry it already; for locally built
+    packets it is computed on first use and cached, so call this only after
+    the packet is signed.
+    """
+    if packet.fingerprint is None:
+        h = blake2b(digest_size=FINGERPRINT_SIZE)
+        h.update(packet.sender_id)
+        h.update(struct.pack('!d', packet.timestamp))
+        h.update(packet.signature)
+        packet.fingerprint = h.digest()
+    return packet.fingerprint
 
 def encode_packet(packet: BitchatPacket) -> bytes:
     """
@@ -80,7 +119,7 @@ def decode_packet(data: bytes) -> Optional[BitchatPacket]:
         # Ensure no extra data
         if payload_end + 64 != len(data):
             return None
-            
+        
         return BitchatPacket(
             version=version,
             type=type_str,
@@ -89,11 +128,222 @@ def decode_packet(data: bytes) -> Optional[BitchatPacket]:
             timestamp=timestamp,
             payload=payload,
             signature=signature,
-            ttl=ttl
+            ttl=ttl,
+            fingerprint=_raw_fingerprint(data, payload_end)
         )
     except (struct.error, UnicodeDecodeError, ValueError):
         return None
 
+def _raw_fingerprint(data: bytes, signature_offset: int) -> bytes:
+    # Fingerprint straight from the raw frame: sender_id, timestamp, signature
+    h = blake2b(digest_size=FINGERPRINT_SIZE)
+    h.update(data[3:19])
+    h.update(data[35:43])
+    h.update(data[signature_offset:signature_offset + 64])
+    return h.digest()
+
+def frame_fingerprint(frame: bytes) -> Optional[bytes]:
+    """
+    Return the fingerprint of an encoded or padded frame from its header alone.
+
+    Equal to packet_fingerprint(decode_packet(unpad(frame))) for valid
+    frames, but nothing past the header is parsed, so duplicates can be
+    dropped without decoding them.
+
+    Returns None if the frame is too short for the lengths in its header.
+    """
+    if len(frame) < 51:
+        return None
+    payload_end = 51 + frame[2] + struct.unpack_from('!I', frame, 47)[0]
+    if payload_end + 64 > len(frame):
+        return None
+    return _raw_fingerprint(frame, payload_end)
+
+def decrement_ttl(frame: bytearray) -> int:
+    """
+    Lower the TTL of an encoded or padded frame by one, in place.
+
+    The signature only covers the payload, so a relay may forward the
+    received bytes with just this field changed: no decoding, re-encoding
+    or re-padding.
+
+    Args:
+        frame (bytearray): Frame to patch.
+
+    Returns:
+        int: The new TTL.
+
+    Raises:
+        ValueError: If the frame is too short or its TTL is already 0.
+    """
+    if len(frame) < 51:
+        raise ValueError("Frame is too short to carry a TTL")
+    ttl = struct.unpack_from('!I', frame, TTL_OFFSET)[0]
+    if ttl == 0:
+        raise ValueError("TTL is already 0")
+    struct.pack_into('!I', frame, TTL_OFFSET, ttl - 1)
+    return ttl - 1
+
+def split_frames(data: bytes) -> List[bytes]:
+    """
+    Split one write holding several padded frames back to back into the individual frames.
+
+    Each frame's length comes from its header. After it, a run of N bytes
+    that all have the value N is PKCS#7 padding. A frame always starts with a
+    zero byte (the high byte of version 1), so padding cannot be mistaken for
+    the next frame. Bundles are opened and their packets returned as padded
+    frames, the same as if each had arrived on its own. Data that does not
+    parse as frames is returned whole, for the caller to reject as usual.
+    """
+    frames = []
+    offset = 0
+    while len(data) - offset >= 51:
+        type_length = data[offset + 2]
+        payload_length = struct.unpack_from('!I', data, offset + 47)[0]
+        end = offset + 51 + type_length + payload_length + 64
+        if end > len(data):
+            break
+        padding_length = data[end] if end < len(data) else 0
+        if padding_length and data[end:end + padding_length] == bytes([padding_length]) * padding_length:
+            end += padding_length
+        frames.append(data[offset:end])
+        offset = end
+    if not frames or offset != len(data):
+        frames = [data]
+    opened = []
+    for frame in frames:
+        packets = None
+        if frame[2:3] == bytes([len(BUNDLE_TYPE)]) and frame[51:51 + len(BUNDLE_TYPE)] == BUNDLE_TYPE.encode():
+            packets = decode_bundle(unpad(frame) or b"")
+        if packets is None:
+            opened.append(frame)
+        else:
+            opened.extend(pad(p, optimal_block_size(len(p))) for p in packets)
+    return opened
+
+def framed_length(encoded_length: int) -> int:
+    """
+    Return the on-air length of a frame once build_frame has padded it.
+    """
+    return encoded_length + min(optimal_block_size(encoded_length) - encoded_length, 255)
+
+class FrameAssembler:
+    """Rebuild frames from a peer's writes when large frames arrive split into MTU-sized chunks."""
+
+    def __init__(self, timeout: float = 5.0, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize an empty assembler.
+
+        Args:
+            timeout (float): Seconds after which an incomplete frame is discarded.
+            clock (Callable[[], float]): Time source, monotonic seconds.
+        """
+        self.timeout = timeout
+        self.clock = clock
+        self._buffer = bytearray()
+        self._last = 0.0
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        """
+        Add received bytes and return the frames they complete.
+
+        The expected frame length comes from the header and the padding rule.
+        Bytes that cannot start a version 1 frame, or that announce one longer
+        than MAX_FRAME_SIZE, are returned as they are. The caller then
+        rejects them as usual instead of stalling on them.
+
+        Args:
+            chunk (bytes): Data from one write or notification.
+
+        Returns:
+            List[bytes]: Complete frames, possibly concatenated ones or bundles (see split_frames).
+        """
+        now = self.clock()
+        if self._buffer and now - self._last > self.timeout:
+            self._buffer.clear()
+        self._last = now
+        self._buffer += chunk
+        frames = []
+        while self._buffer:
+            length = None
+            if len(self._buffer) >= 51:
+                encoded_length = 51 + self._buffer[2] + struct.unpack_from('!I', self._buffer, 47)[0] + 64
+                length = framed_length(encoded_length)
+            if not b"\x00\x01".startswith(bytes(self._buffer[:2])) or (length or 0) > MAX_FRAME_SIZE:
+                frames.append(bytes(self._buffer))
+                self._buffer.clear()
+                break
+            if length is None or len(self._buffer) < length:
+                break
+            frames.append(bytes(self._buffer[:length]))
+            del self._buffer[:length]
+        return frames
+
+    @property
+    def pending(self) -> int:
+        """
+        Bytes held for an incomplete frame.
+        """
+        return len(self._buffer)
+
+def encode_bundle(packets: List[bytes], timestamp: float = 0.0) -> bytes:
+    """
+    Pack several encoded packets into one encoded bundle packet.
+
+    The bundle is unsigned and never relayed (TTL 0). Each packet inside is
+    verified on its own after unbundling.
+
+    Args:
+        packets (List[bytes]): Encoded, unpadded packets.
+        timestamp (float): Bundle timestamp (informational).
+
+    Returns:
+        bytes: The encoded bundle, ready to pad.
+
+    Raises:
+        ValueError: If a packet is longer than 65535 bytes.
+    """
+    if any(len(p) > 0xFFFF for p in packets):
+        raise ValueError("Bundled packet exceeds 65535 bytes")
+    payload = b"".join(struct.pack('!H', len(p)) + p for p in packets)
+    return encode_packet(BitchatPacket(
+        version=1,
+        type=BUNDLE_TYPE,
+        sender_id=b"\x00" * 16,
+        recipient_id=b"\x00" * 16,
+        timestamp=timestamp,
+        payload=payload,
+        signature=b"\x00" * 64,
+        ttl=0
+    ))
+
+def decode_bundle(data: bytes) -> Optional[List[bytes]]:
+    """
+    Unpack an encoded bundle packet.
+
+    Returns None if the data is not a well-formed bundle, so callers can
+    treat it as an ordinary packet.
+    """
+    type_end = 51 + len(BUNDLE_TYPE)
+    if len(data) < type_end or data[2] != len(BUNDLE_TYPE) or data[51:type_end] != BUNDLE_TYPE.encode():
+        return None
+    packet = decode_packet(data)
+    if packet is None:
+        return None
+    payload = packet.payload
+    packets = []
+    offset = 0
+    while offset < len(payload):
+        if offset + 2 > len(payload):
+            return None
+        length = struct.unpack_from('!H', payload, offset)[0]
+        offset += 2
+        if offset + length > len(payload):
+            return None
+        packets.append(payload[offset:offset + length])
+        offset += length
+    return packets
+
 def encode_message(message: BitchatMessage) -> bytes:
     """
     Serialize a BitchatMessage into bytes.
@@ -0,0 +1,249 @@
+import asyncio
+import functools
+import inspect
+import random
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+from .message import BitchatPacket, unpad
+from .protocol import decode_packet, frame_fingerprint, decrement_ttl
+from .encryption import verify_signature
+from .keychain import retrieve_key
+from .utils import OptimizedBloomFilter
+from .transport import Transport
+from .scheduler import OutboundScheduler, Priority
+from .routing import RoutingTable, unicast_destination
+from .ble_service import PacketStream
+
+@dataclass
+class RelayStats:
+    received: int = 0  # Frames handed to the engine
+    invalid: int = 0  # Undecodable or badly signed
+    duplicates: int = 0  # Copies of packets already seen
+    delivered: int = 0  # New packets passed to the local handler
+    expired: int = 0  # New packets whose TTL ran out here
+    suppressed: int = 0  # Forwards skipped by flood suppression
+    forwarded: int = 0  # Packets re-broadcast
+    frames_sent: int = 0  # Writes queued for forwarding (one per neighbour)
+    send_errors: int = 0  # Forwarding writes that failed
+    routed: int = 0  # Unicast packets sent to one learned next hop instead of flooded
+
+@dataclass
+class _PendingForward:
+    packet: BitchatPacket
+    frame: bytes  # As received, padding included
+    heard_from: Set[str]
+    destination: Optional[str] = None
+    copies: int = 1
+    handle: Optional[asyncio.TimerHandle] = field(default=None, repr=False)
+
+class RelayEngine:
+    """Re-broadcast received packets to the rest of the mesh, with TTL, jitter and flood suppression."""
+
+    def __init__(self, transport: Transport, local_id: Optional[str] = None,
+                 deliver: Optional[Callable[[BitchatPacket, str], Any]] = None,
+                 seen: Optional[OptimizedBloomFilter] = None, jitter: Tuple[float, float] = (0.01, 0.1),
+                 suppression: Optional[str] = "counter", suppress_after: int = 3,
+                 forward_probability: float = 0.65, rng: Optional[random.Random] = None,
+                 scheduler: Optional[OutboundScheduler] = None, routes: Optional[RoutingTable] = None):
+        """
+        Initialize a relay engine.
+
+        New, correctly signed packets are delivered locally. Then, after a
+        random delay within ``jitter``, they are sent on with TTL - 1 to every
+        neighbour the packet has not already been heard from. Duplicates are
+        recognised from the frame header alone, and a forward is the received
+        frame with its TTL patched in place, never a re-encoded packet.
+
+        With ``routes``, every new packet teaches the route back to its origin.
+        Unicast packets (private messages, delivery acks, read receipts) then
+        go only to the learned next hop towards their destination. They are
+        flooded only when no route is known.
+
+        Suppression modes:
+            "counter": skip the forward if ``suppress_after`` copies (including
+                the first) were heard before the delay ran out.
+            "probabilistic": forward with ``forward_probability``, decided on first receipt.
+            None: always forward (plain flooding).
+
+        Args:
+            transport (Transport): Link to the neighbours.
+            local_id (str, optional): This node's peer ID; private packets addressed to it are not forwarded.
+            deliver (Callable[[BitchatPacket, str], Any], optional): Sync or async handler for new
+                packets, called with the packet and the neighbour it came from.
+            seen (OptimizedBloomFilter, optional): Fingerprints already handled (default: a new rotating filter).
+            jitter (Tuple[float, float]): Range in seconds of the random delay before forwarding.
+            suppression (str, optional): "counter", "probabilistic" or None.
+            suppress_after (int): Copies that cancel a pending forward in counter mode.
+            forward_probability (float): Chance of forwarding in probabilistic mode.
+            rng (random.Random, optional): Randomness for jitter and gossip decisions.
+            scheduler (OutboundScheduler, optional): Queue for forwarded frames (default: one
+                writing to ``transport`` without response, at bulk priority).
+            routes (RoutingTable, optional): Reverse-path routes to learn and forward unicast packets by.
+
+        Raises:
+            ValueError: If an argument is out of range.
+        """
+        if suppression not in ("counter", "probabilistic", None):
+            raise ValueError("suppression must be 'counter', 'probabilistic' or None")
+        if jitter[0] < 0 or jitter[1] < jitter[0]:
+            raise ValueError("jitter must be a non-negative (min, max) range")
+        if suppress_after < 1:
+            raise ValueError("suppress_after must be at least 1")
+        if not 0 <= forward_probability <= 1:
+            raise ValueError("forward_probability must be between 0 and 1")
+        self.transport = transport
+        self.local_id = local_id
+        self.deliver = deliver
+        self.seen = seen if seen is not None else OptimizedBloomFilter.adaptive(100, generations=3)
+        self.jitter = jitter
+        self.suppression = suppression
+        self.suppress_after = suppress_after
+        self.forward_probability = forward_probability
+        self.rng = rng or random.Random()
+        self.scheduler = scheduler or OutboundScheduler(
+            lambda frame, peer_id, priority: transport.write(peer_id, frame, response=False))
+        self.routes = routes
+        self.stats = RelayStats()
+        self._pending: Dict[bytes, _PendingForward] = {}
+        self._stream: Optional[PacketStream] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def receive(self, peer_id: str, frame: bytes) -> Optional[BitchatPacket]:
+        """
+        Handle one frame received from a neighbour.
+
+        Args:
+            peer_id (str): Neighbour the frame came from.
+            frame (bytes): Padded frame.
+
+        Returns:
+            Optional[BitchatPacket]: The packet if it is new and correctly signed, None otherwise.
+        """
+        self.stats.received += 1
+        fingerprint = frame_fingerprint(frame)
+        if fingerprint is None:
+            self.stats.invalid += 1
+            return None
+        pending = self._pending.get(fingerprint)
+        if pending is not None:
+            pending.copies += 1
+            pending.heard_from.add(peer_id)
+            self.stats.duplicates += 1
+            return None
+        if self.seen.contains(fingerprint):
+            self.stats.duplicates += 1
+            return None
+        data = unpad(frame)
+        packet = decode_packet(data) if data else None
+        if packet is None:
+            self.stats.invalid += 1
+            return None
+        key = retrieve_key(f"peer:{packet.sender_id.decode('utf-8', errors='ignore')}")
+        if not key or not verify_signature(packet.payload, packet.signature, key):
+            self.stats.invalid += 1
+            return None
+        self.seen.insert(fingerprint)
+        if self.routes is not None:
+            self.routes.observe(packet, peer_id)
+        self.stats.delivered += 1
+        if self.deliver is not None:
+            result = self.deliver(packet, peer_id)
+            if inspect.isawaitable(result):
+                asyncio.ensure_future(result)
+        self._schedule(packet, frame, peer_id)
+        return packet
+
+    def _schedule(self, packet: BitchatPacket, frame: bytes, peer_id: str) -> None:
+        """
+        Decide whether a new packet is forwarded and arm its jitter timer.
+        """
+        if packet.ttl <= 1:
+            self.stats.expired += 1
+            return
+        destination = unicast_destination(packet)
+        if destination is not None and destination == self.local_id:
+            return  # Unicast packet that has reached its recipient
+        routed = destination is not None and self.routes is not None and destination in self.routes
+        if not routed and self.suppression == "probabilistic" and self.rng.random() >= self.forward_probability:
+            self.stats.suppressed += 1
+            return
+        pending = _PendingForward(packet, bytes(frame), {peer_id}, destination)
+        delay = self.rng.uniform(*self.jitter)
+        pending.handle = asyncio.get_running_loop().call_later(delay, self._forward, packet.fingerprint)
+        self._pending[packet.fingerprint] = pending
+
+    def _forward(self, fingerprint: bytes) -> None:
+        """
+        Jitter timer callback: send the packet on unless enough copies were heard meanwhile.
+        """
+        pending = self._pending.pop(fingerprint, None)
+        if pending is None:
+            return
+        origin = pending.packet.sender_id.decode('utf-8', errors='ignore').rstrip("\x00 ")
+        targets = [p for p in self.transport.table.peers() if p not in pending.heard_from and p != origin]
+        next_hop = None
+        if pending.destination is not None and self.routes is not None:
+            next_hop = self.routes.next_hop(pending.destination, targets)
+        if next_hop is not None:
+            targets = [next_hop]
+            self.stats.routed += 1
+        elif self.suppression == "counter" and pending.copies >= self.suppress_after:
+            self.stats.suppressed += 1
+            return
+        if not targets:
+            return
+        frame = bytearray(pending.frame)
+        decrement_ttl(frame)
+        frame = bytes(frame)
+        self.stats.forwarded += 1
+        for target in targets:
+            self.stats.frames_sent += 1
+            future = self.scheduler.enqueue(frame, target, Priority.BULK)
+            future.add_done_callback(functools.partial(self._on_sent, pending.destination if next_hop else None))
+
+    def _on_sent(self, routed_to: Optional[str], future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            self.stats.send_errors += 1
+            if routed_to is not None:
+                self.routes.forget(routed_to)  # The next hop failed; flood until a new route is learned
+
+    @property
+    def pending(self) -> int:
+        """
+        Packets waiting out their jitter before being forwarded.
+        """
+        return len(self._pending)
+
+    async def _run(self) -> None:
+        while True:
+            peer_id, frame = await self._stream.next_frame()
+            self.receive(peer_id, frame)
+
+    async def start(self, maxsize: int = 256) -> None:
+        """
+        Subscribe to all neighbours on the transport and start relaying.
+
+        Args:
+            maxsize (int): Frames buffered before subscriptions pause.
+        """
+        if self._task is not None:
+            return
+        self._stream = PacketStream(maxsize, transport=self.transport, seen=self.seen)
+        await self._stream.start()
+        self._task = asyncio.ensure_future(self._run())
+
+    async def close(self) -> None:
+        """
+        Stop relaying and drop pending forwards.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._stream is not None:
+            await self._stream.close()
+            self._stream = None
+        for pending in self._pending.values():
+            pending.handle.cancel()
+        self._pending.clear()
+        await self.scheduler.close()
@@ -0,0 +1,188 @@
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional
+from .message import BitchatPacket, CumulativeAck, DeliveryAck, ReadReceipt
+from .protocol import CUMULATIVE_ACK_TYPE
+
+# TTL senders give new packets; hop counts are measured against it
+DEFAULT_TTL = 100
+
+# Types whose sender_id is not the originating peer, so they teach no route back to it
+_UNLEARNABLE_TYPES = {"delivery_ack", CUMULATIVE_ACK_TYPE, "read_receipt", "bundle"}
+
+def _peer_id(field: bytes) -> str:
+    return field.decode('utf-8', errors='ignore').rstrip("\x00 ")
+
+def unicast_destination(packet: BitchatPacket) -> Optional[str]:
+    """
+    Return the peer a packet is addressed to, or None for broadcasts.
+
+    Private messages name their recipient in recipient_id. Delivery acks,
+    cumulative acks and read receipts use recipient_id for a message id, so
+    their destination is read from the payload.
+    """
+    if packet.type == "private_message":
+        return _peer_id(packet.recipient_id) or None
+    if packet.type == "delivery_ack":
+        ack = DeliveryAck.decode(packet.payload)
+        return ack.recipient_id if ack else None
+    if packet.type == CUMULATIVE_ACK_TYPE:
+        ack = CumulativeAck.decode(packet.payload)
+        return ack.recipient_id if ack else None
+    if packet.type == "read_receipt":
+        receipt = ReadReceipt.decode(packet.payload)
+        return receipt.recipient_id if receipt else None
+    return None
+
+@dataclass
+class Route:
+    next_hop: str
+    hops: int
+    updated: float
+
+class RoutingTable:
+    """Reverse-path routes: for each originating peer, the neighbour its traffic arrives through."""
+
+    def __init__(self, max_age: float = 60.0, max_routes: int = 1024, initial_ttl: int = DEFAULT_TTL,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize an empty routing table.
+
+        A route to a peer is learned from packets it originates. The next hop is
+        the neighbour the packet arrived from, and the hop count is how much TTL
+        it used up. A route is replaced by one with fewer hops, refreshed by
+        traffic through the same neighbour, and dropped ``max_age`` seconds after
+        its last refresh.
+
+        Args:
+            max_age (float): Seconds a route stays valid without fresh traffic.
+            max_routes (int): Routes kept; the stalest is dropped first when full.
+            initial_ttl (int): TTL origins give their packets.
+            clock (Callable[[], float]): Time source, monotonic seconds.
+
+        Raises:
+            ValueError: If max_age or max_routes is non-positive.
+        """
+        if max_age <= 0:
+            raise ValueError("max_age must be positive")
+        if max_routes <= 0:
+            raise ValueError("max_routes must be positive")
+        self.max_age = max_age
+        self.max_routes = max_routes
+        self.initial_ttl = initial_ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._routes: Dict[str, Route] = {}
+
+    def learn(self, origin: str, neighbour: str, hops: int) -> bool:
+        """
+        Record that traffic from origin arrived through neighbour after hops hops.
+
+        Args:
+            origin (str): Originating peer ID.
+            neighbour (str): Neighbour the traffic arrived from.
+            hops (int): Hops travelled.
+
+        Returns:
+            bool: True if the route to origin now goes through neighbour.
+        """
+        if not origin:
+            return False
+        now = self.clock()
+        route = self._routes.get(origin)
+        if route is not None and now - route.updated <= self.max_age \
+                and route.next_hop != neighbour and route.hops <= hops:
+            return False
+        if route is None and len(self._routes) >= self.max_routes:
+            self.prune()
+            if len(self._routes) >= self.max_routes:
+                del self._routes[min(self._routes, key=lambda k: self._routes[k].updated)]
+        self._routes[origin] = Route(neighbour, hops, now)
+        return True
+
+    def observe(self, packet: BitchatPacket, neighbour: str) -> bool:
+        """
+        Learn the reverse route from a received packet.
+
+        Args:
+            packet (BitchatPacket): Packet as received, before any TTL decrement.
+            neighbour (str): Neighbour it arrived from.
+
+        Returns:
+            bool: True if a route was added or changed.
+        """
+        if packet.type in _UNLEARNABLE_TYPES:
+            return False
+        return self.learn(_peer_id(packet.sender_id), neighbour, max(self.initial_ttl - packet.ttl, 0))
+
+    def route(self, destination: str) -> Optional[Route]:
+        """
+        Return the live route to a peer, dropping it if it has aged out.
+        """
+        route = self._routes.get(destination)
+        if route is not None and self.clock() - route.updated > self.max_age:
+            del self._routes[destination]
+            route = None
+        return route
+
+    def next_hop(self, destination: str, neighbours: Optional[Iterable[str]] = None) -> Optional[str]:
+        """
+        Return the neighbour to send a unicast packet through.
+
+        Args:
+            destination (str): Peer the packet is addressed to.
+            neighbours (Iterable[str], optional): Current neighbours. A direct neighbour
+                is its own next hop, and routes through a neighbour that is gone are ignored.
+
+        Returns:
+            Optional[str]: The next hop, or None to fall back to flooding.
+        """
+        if neighbours is not None:
+            neighbours = set(neighbours)
+            if destination in neighbours:
+                self.hits += 1
+                return destination
+        route = self.route(destination)
+        if route is None or (neighbours is not None and route.next_hop not in neighbours):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return route.next_hop
+
+    def forget(self, destination: str) -> None:
+        """
+        Drop the route to a peer, e.g. after its next hop failed.
+        """
+        self._routes.pop(destination, None)
+
+    def forget_neighbour(self, neighbour: str) -> int:
+        """
+        Drop every route through a neighbour that went out of range.
+
+        Returns:
+            int: Number of routes dropped.
+        """
+        gone = [origin for origin, route in self._routes.items() if route.next_hop == neighbour]
+        for origin in gone:
+            del self._routes[origin]
+        return len(gone)
+
+    def prune(self) -> int:
+        """
+        Drop all aged-out routes.
+
+        Returns:
+            int: Number of routes dropped.
+        """
+        now = self.clock()
+        stale = [origin for origin, route in self._routes.items() if now - route.updated > self.max_age]
+        for origin in stale:
+            del self._routes[origin]
+        return len(stale)
+
+    def __contains__(self, destination: str) -> bool:
+        return self.route(destination) is not None
+
+    def __len__(self) -> int:
+        return len(self._routes)
@@ -0,0 +1,546 @@
+import asyncio
+import bisect
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple, Union
+from .message import CumulativeAck, DeliveryAck, pad, unpad, optimal_block_size
+from .protocol import encode_bundle, BUNDLE_OVERHEAD, CUMULATIVE_ACK_TYPE
+
+class Priority(IntEnum):
+    CONTROL = 0
+    ACK = 1  # Delivery acks and read receipts
+    CHAT = 2
+    BULK = 3  # Bulk transfers and relayed traffic
+
+class Histogram:
+    """Fixed-bucket histogram: counts[i] holds observations <= bounds[i], the last bucket the rest."""
+
+    def __init__(self, bounds: List[float]):
+        """
+        Initialize an empty histogram.
+
+        Args:
+            bounds (List[float]): Increasing upper bounds of the buckets.
+        """
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+        Record one observation.
+        """
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    @property
+    def mean(self) -> float:
+        """
+        Mean of all observations.
+        """
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """
+        Upper bound of the bucket holding the q-th percentile (inf for the overflow bucket).
+
+        Args:
+            q (float): Percentile between 0 and 100.
+        """
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return self.bounds[i] if i < len(self.bounds) else float("inf")
+        return float("inf")
+
+WAIT_BUCKETS = [0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0]
+DEPTH_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024]
+
+@dataclass
+class _Pending:
+    frame: bytes
+    priority: Priority
+    timeout: Optional[float]
+    enqueued_at: float
+    future: asyncio.Future = field(repr=False)
+
+class OutboundScheduler:
+    """Order outbound frames by priority class with deficit round robin across peers."""
+
+    def __init__(self, write: Callable[[bytes, str, Priority], Awaitable[None]], concurrency: int = 4,
+                 quantum: int = 512, max_write: int = 512, write_timeout: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize an outbound scheduler.
+
+        Each priority class keeps a FIFO per peer. The highest class with
+        frames for an idle peer is always served first. Within a class,
+        peers take turns and each turn may send up to ``quantum`` bytes, so a
+        peer with large frames cannot crowd out the others. The frames taken
+        for a peer in one turn are joined into a single write of at most
+        ``max_write`` bytes.
+
+        Args:
+            write (Callable[[bytes, str, Priority], Awaitable[None]]): Coroutine writing bytes to a
+                peer, given the class of the frames so it can pick the write mode.
+            concurrency (int): Writes in flight at once, never more than one per peer.
+            quantum (int): Bytes added to a peer's allowance each round.
+            max_write (int): Largest coalesced write in bytes; bigger frames go out alone.
+            write_timeout (float, optional): Seconds allowed per write when the sender gives none.
+            clock (Callable[[], float]): Time source, monotonic seconds.
+
+        Raises:
+            ValueError: If concurrency, quantum or max_write is non-positive.
+        """
+        if concurrency <= 0:
+            raise ValueError("concurrency must be positive")
+        if quantum <= 0 or max_write <= 0:
+            raise ValueError("quantum and max_write must be positive")
+        self.write = write
+        self.concurrency = concurrency
+        self.quantum = quantum
+        self.max_write = max_write
+        self.write_timeout = write_timeout
+        self.clock = clock
+        self.wait_times: Dict[Priority, Histogram] = {p: Histogram(WAIT_BUCKETS) for p in Priority}
+        self.queue_depths = Histogram(DEPTH_BUCKETS)
+        self.writes = 0
+        self.frames_written = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._queues: Dict[Priority, Dict[str, Deque[_Pending]]] = {p: {} for p in Priority}
+        self._active: Dict[Priority, Deque[str]] = {p: deque() for p in Priority}
+        self._deficits: Dict[Tuple[Priority, str], int] = {}
+        self._busy: Set[str] = set()
+        self._workers: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def _ensure_started(self) -> None:
+        """
+        Start workers on the running loop, discarding state left on a previous loop.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._reset()
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.ensure_future(self._worker()) for _ in range(self.concurrency)]
+
+    def enqueue(self, frame: bytes, peer_id: str, priority: Priority = Priority.CHAT,
+                timeout: Optional[float] = None) -> asyncio.Future:
+        """
+        Queue a frame for a peer.
+
+        Args:
+            frame (bytes): Encoded, padded frame.
+            peer_id (str): Target peer ID.
+            priority (Priority): Traffic class.
+            timeout (float, optional): Seconds allowed for the write itself.
+
+        Returns:
+            asyncio.Future: Resolves once the frame is written, or carries the write error.
+        """
+        self._ensure_started()
+        pending = _Pending(frame, Priority(priority), timeout, self.clock(), self._loop.create_future())
+        queues = self._queues[pending.priority]
+        if peer_id not in queues:
+            queues[peer_id] = deque()
+            self._active[pending.priority].append(peer_id)
+        queues[peer_id].append(pending)
+        self.queue_depths.observe(self.depth())
+        self._wakeup.set()
+        return pending.future
+
+    async def send(self, frame: bytes, peer_id: str, priority: Priority = Priority.CHAT,
+                   timeout: Optional[float] = None) -> None:
+        """
+        Queue a frame and wait until it has been written.
+
+        Args:
+            frame (bytes): Encoded, padded frame.
+            peer_id (str): Target peer ID.
+            priority (Priority): Traffic class.
+            timeout (float, optional): Seconds allowed for the write itself.
+
+        Raises:
+            Exception: Whatever the write raised, including asyncio.TimeoutError.
+        """
+        await self.enqueue(frame, peer_id, priority, timeout)
+
+    def depth(self, priority: Optional[Priority] = None) -> int:
+        """
+        Count queued frames, in one class or in total.
+        """
+        classes = [priority] if priority is not None else list(Priority)
+        return sum(len(q) for p in classes for q in self._queues[p].values())
+
+    def depths(self) -> Dict[str, int]:
+        """
+        Return queued frames per class, keyed by lower-case class name.
+        """
+        return {p.name.lower(): self.depth(p) for p in Priority}
+
+    def _take(self, priority: Priority, peer_id: str) -> List[_Pending]:
+        """
+        Give a peer its turn: add a quantum and take what the allowance and max_write permit.
+        """
+        queue = self._queues[priority][peer_id]
+        key = (priority, peer_id)
+        deficit = self._deficits.get(key, 0) + self.quantum
+        batch: List[_Pending] = []
+        size = 0
+        while queue and len(queue[0].frame) <= deficit:
+            length = len(queue[0].frame)
+            if batch and size + length > self.max_write:
+                break
+            batch.append(queue.popleft())
+            deficit -= length
+            size += length
+        if queue:
+            self._deficits[key] = deficit
+        else:
+            # An emptied queue gives up its leftover allowance, as in standard DRR
+            self._deficits.pop(key, None)
+            del self._queues[priority][peer_id]
+        return batch
+
+    def _pick(self) -> Optional[Tuple[str, List[_Pending]]]:
+        """
+        Choose the next peer and frames to write, or None if nothing can go out now.
+        """
+        for priority in Priority:
+            active = self._active[priority]
+            while any(peer_id not in self._busy for peer_id in active):
+                peer_id = active.popleft()
+                if peer_id in self._busy:
+                    active.append(peer_id)
+                    continue
+                batch = self._take(priority, peer_id)
+                if peer_id in self._queues[priority]:
+                    active.append(peer_id)
+                if batch:
+                    return peer_id, batch
+        return None
+
+    async def _worker(self) -> None:
+        while True:
+            picked = self._pick()
+            if picked is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            peer_id, batch = picked
+            batch = [p for p in batch if not p.future.done()]  # Drop frames whose sender gave up
+            if not batch:
+                continue
+            self._busy.add(peer_id)
+            now = self.clock()
+            for pending in batch:
+                self.wait_times[pending.priority].observe(now - pending.enqueued_at)
+            timeouts = [p.timeout for p in batch if p.timeout is not None]
+            timeout = max(timeouts) if timeouts else self.write_timeout
+            try:
+                data = b"".join(p.frame for p in batch)
+                write = self.write(data, peer_id, batch[0].priority)
+                if timeout is not None:
+                    await asyncio.wait_for(write, timeout)
+                else:
+                    await write
+                self.writes += 1
+                self.frames_written += len(batch)
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_result(None)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+            finally:
+                self._busy.discard(peer_id)
+                self._wakeup.set()
+
+    async def close(self) -> None:
+        """
+        Stop the workers and fail every queued frame.
+        """
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        for queues in self._queues.values():
+            for queue in queues.values():
+                for pending in queue:
+                    if not pending.future.done():
+                        pending.future.set_exception(RuntimeError("Outbound scheduler closed"))
+        self._loop = None
+        self._reset()
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Return queue depths, write counters and wait-time summaries per class.
+        """
+        return {
+            "depths": self.depths(),
+            "writes": self.writes,
+            "frames_written": self.frames_written,
+            "wait_p50": {p.name.lower(): self.wait_times[p].percentile(50) for p in Priority},
+            "wait_p99": {p.name.lower(): self.wait_times[p].percentile(99) for p in Priority},
+        }
+
+@dataclass
+class _Bundle:
+    frames: List[bytes]
+    packets: List[bytes]  # Unpadded, for the bundle payload
+    futures: List[asyncio.Future]
+    size: int  # Encoded bundle size so far
+    timer: asyncio.TimerHandle
+
+class FrameBundler:
+    """Hold small frames briefly and send the ones for the same peer as a single bundle."""
+
+    def __init__(self, send: Callable[[bytes, str, Priority], Awaitable[None]], max_delay: float = 0.02,
+                 max_size: int = 1024):
+        """
+        Initialize a frame bundler.
+
+        The first small frame for a (peer, priority) pair starts a timer.
+        Frames arriving before it fires, or before the bundle reaches
+        ``max_size``, join the same bundle. The bundle is then padded to one
+        block and handed to ``send``. A lone frame is sent as it is, and
+        frames too big to bundle are passed straight through.
+
+        Args:
+            send (Callable[[bytes, str, Priority], Awaitable[None]]): Coroutine sending a frame to a peer.
+            max_delay (float): Seconds a frame may wait for company.
+            max_size (int): Largest encoded bundle in bytes.
+
+        Raises:
+            ValueError: If max_delay is negative or max_size cannot hold a bundle.
+        """
+        if max_delay < 0:
+            raise ValueError("max_delay must be non-negative")
+        if max_size <= BUNDLE_OVERHEAD + 2:
+            raise ValueError(f"max_size must exceed {BUNDLE_OVERHEAD + 2} bytes")
+        self.send_frame = send
+        self.max_delay = max_delay
+        self.max_size = max_size
+        self.bundles_sent = 0
+        self.frames_bundled = 0
+        self._buffers: Dict[Tuple[str, Priority], _Bundle] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def enqueue(self, frame: bytes, peer_id: str, priority: Priority = Priority.ACK) -> asyncio.Future:
+        """
+        Add a frame to the pending bundle for its peer and priority.
+
+        Args:
+            frame (bytes): Encoded, padded frame.
+            peer_id (str): Target peer ID.
+            priority (Priority): Traffic class passed on to ``send``.
+
+        Returns:
+            asyncio.Future: Resolves once the bundle carrying the frame is sent.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._buffers = {}
+            self._loop = loop
+        packet = unpad(frame)
+        if not packet or BUNDLE_OVERHEAD + 2 + len(packet) > self.max_size:
+            return asyncio.ensure_future(self.send_frame(frame, peer_id, priority))
+        key = (peer_id, priority)
+        bundle = self._buffers.get(key)
+        if bundle is not None and bundle.size + 2 + len(packet) > self.max_size:
+            self._flush(key)
+            bundle = None
+        if bundle is None:
+            bundle = _Bundle([], [], [], BUNDLE_OVERHEAD, loop.call_later(self.max_delay, self._flush, key))
+            self._buffers[key] = bundle
+        future = loop.create_future()
+        bundle.frames.append(frame)
+        bundle.packets.append(packet)
+        bundle.futures.append(future)
+        bundle.size += 2 + len(packet)
+        return future
+
+    async def send(self, frame: bytes, peer_id: str, priority: Priority = Priority.ACK) -> None:
+        """
+        Add a frame to a bundle and wait until it has been sent.
+
+        Raises:
+            Exception: Whatever ``send`` raised for the bundle.
+        """
+        await self.enqueue(frame, peer_id, priority)
+
+    def _flush(self, key: Tuple[str, Priority]) -> None:
+        bundle = self._buffers.pop(key, None)
+        if bundle is None:
+            return
+        bundle.timer.cancel()
+        if len(bundle.frames) == 1:
+            data = bundle.frames[0]
+        else:
+            data = pad(encode_bundle(bundle.packets, time.time()), optimal_block_size(bundle.size))
+            self.bundles_sent += 1
+            self.frames_bundled += len(bundle.frames)
+        asyncio.ensure_future(self._deliver(data, key, bundle.futures))
+
+    async def _deliver(self, data: bytes, key: Tuple[str, Priority], futures: List[asyncio.Future]) -> None:
+        peer_id, priority = key
+        try:
+            await self.send_frame(data, peer_id, priority)
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for future in futures:
+                if not future.done():
+                    future.set_result(None)
+
+    async def flush(self) -> None:
+        """
+        Send every pending bundle now and wait for the sends to finish.
+        """
+        futures = [f for bundle in self._buffers.values() for f in bundle.futures]
+        for key in list(self._buffers):
+            self._flush(key)
+        await asyncio.gather(*futures, return_exceptions=True)
+
+# Sends one ack: a DeliveryAck when it stands alone, else a CumulativeAck
+AckSender = Callable[[Union[DeliveryAck, CumulativeAck]], Awaitable[None]]
+
+@dataclass
+class _AckBatch:
+    message_ids: List[str]
+    hop_count: int
+    futures: List[asyncio.Future]
+    size: int  # Encoded packet size so far
+    timer: asyncio.TimerHandle
+
+class AckAggregator:
+    """Collect delivery acks for the same peer and send them as one CumulativeAck."""
+
+    def __init__(self, send: AckSender, window: float = 0.1, max_size: int = 1024):
+        """
+        Initialize an ack aggregator.
+
+        The first ack for a peer opens a flush window. Acks for that peer
+        arriving within it join the same CumulativeAck, which lists every
+        acknowledged message id and the smallest hop count. The batch is sent
+        when the window closes or its packet would grow past ``max_size``. A
+        lone ack is sent as a plain DeliveryAck, so peers that only know the
+        single format still understand it.
+
+        Args:
+            send (AckSender): Coroutine sending an ack to ``ack.recipient_id``.
+            window (float): Seconds an ack may wait for others.
+            max_size (int): Largest encoded cumulative ack packet in bytes.
+
+        Raises:
+            ValueError: If window is negative or max_size cannot hold one id.
+        """
+        if window < 0:
+            raise ValueError("window must be non-negative")
+        if max_size < self._overhead("", "") + 256:
+            raise ValueError(f"max_size must be at least {self._overhead('', '') + 256} bytes")
+        self.send_ack = send
+        self.window = window
+        self.max_size = max_size
+        self.acks_sent = 0  # Ack packets sent, single or cumulative
+        self.acks_aggregated = 0  # Message ids covered by cumulative acks
+        self._batches: Dict[Tuple[str, str], _AckBatch] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @staticmethod
+    def _overhead(recipient_id: str, nickname: str) -> int:
+        # Packet header, type, signature and the CumulativeAck fields before the ids
+        return (51 + len(CUMULATIVE_ACK_TYPE) + 64 + 2 + len(recipient_id.encode('utf-8')) +
+                len(nickname.encode('utf-8')) + 6)
+
+    def enqueue(self, ack: DeliveryAck) -> asyncio.Future:
+        """
+        Add an ack to the pending batch for its peer.
+
+        Args:
+            ack (DeliveryAck): Acknowledgment to send to ``ack.recipient_id``.
+
+        Returns:
+            asyncio.Future: Resolves once the packet carrying the ack is sent.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._batches = {}
+            self._loop = loop
+        key = (ack.recipient_id, ack.nickname)
+        size = CumulativeAck.id_size(ack.message_id)
+        batch = self._batches.get(key)
+        if batch is not None and batch.size + size > self.max_size:
+            self._flush(key)
+            batch = None
+        if batch is None:
+            batch = _AckBatch([], ack.hop_count, [], self._overhead(*key),
+                              loop.call_later(self.window, self._flush, key))
+            self._batches[key] = batch
+        future = loop.create_future()
+        batch.message_ids.append(ack.message_id)
+        batch.hop_count = min(batch.hop_count, ack.hop_count)
+        batch.futures.append(future)
+        batch.size += size
+        return future
+
+    async def send(self, ack: DeliveryAck) -> None:
+        """
+        Add an ack to a batch and wait until it has been sent.
+
+        Raises:
+            Exception: Whatever ``send`` raised for the batch.
+        """
+        await self.enqueue(ack)
+
+    def _flush(self, key: Tuple[str, str]) -> None:
+        batch = self._batches.pop(key, None)
+        if batch is None:
+            return
+        batch.timer.cancel()
+        recipient_id, nickname = key
+        if len(batch.message_ids) == 1:
+            ack = DeliveryAck(batch.message_ids[0], recipient_id, nickname, batch.hop_count)
+        else:
+            ack = CumulativeAck(batch.message_ids, recipient_id, nickname, batch.hop_count)
+            self.acks_aggregated += len(batch.message_ids)
+        self.acks_sent += 1
+        asyncio.ensure_future(self._deliver(ack, batch.futures))
+
+    async def _deliver(self, ack: Union[DeliveryAck, CumulativeAck], futures: List[asyncio.Future]) -> None:
+        try:
+            await self.send_ack(ack)
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for future in futures:
+                if not future.done():
+                    future.set_result(None)
+
+    async def flush(self) -> None:
+        """
+        Send every pending batch now and wait for the sends to finish.
+        """
+        futures = [f for batch in self._batches.values() for f in batch.futures]
+        for key in list(self._batches):
+            self._flush(key)
+        await asyncio.gather(*futures, return_exceptions=True)
@@ -0,0 +1,329 @@
+import asyncio
+import math
+import os
+import random
+import selectors
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+from .ble_service import build_frame
+from .keychain import store_key
+from .message import BitchatPacket
+from .protocol import frame_fingerprint
+from .relay import RelayEngine
+from .scheduler import OutboundScheduler
+from .transport import LoopbackHub, LoopbackTransport
+from .utils import OptimizedBloomFilter
+
+Edge = Tuple[str, str]
+
+class _VirtualSelector(selectors.BaseSelector):
+    """Selector that polls real file objects without blocking and advances virtual time instead of waiting."""
+
+    def __init__(self, loop: 'VirtualTimeEventLoop'):
+        self._selector = selectors.DefaultSelector()
+        self._loop = loop
+
+    def register(self, fileobj, events, data=None):
+        return self._selector.register(fileobj, events, data)
+
+    def unregister(self, fileobj):
+        return self._selector.unregister(fileobj)
+
+    def modify(self, fileobj, events, data=None):
+        return self._selector.modify(fileobj, events, data)
+
+    def select(self, timeout=None):
+        ready = self._selector.select(0)
+        if not ready:
+            if timeout is None:
+                raise RuntimeError("Simulation stalled: nothing is scheduled")
+            self._loop.now += timeout
+        return ready
+
+    def get_map(self):
+        return self._selector.get_map()
+
+    def close(self):
+        self._selector.close()
+
+class VirtualTimeEventLoop(asyncio.SelectorEventLoop):
+    """Event loop whose clock jumps straight to the next timer, so sleeps and timeouts take no real time."""
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+        super().__init__(_VirtualSelector(self))
+
+    def time(self) -> float:
+        return self.now
+
+@dataclass
+class LinkModel:
+    latency: float = 0.005  # Seconds from the end of a write to delivery
+    jitter: float = 0.0  # Extra random latency, up to this many seconds
+    loss: float = 0.0  # Probability a write is lost
+    bandwidth: Optional[float] = 100_000.0  # Bytes per second each direction carries; None for unlimited
+
+@dataclass
+class ChurnModel:
+    interval: float = 1.0  # Seconds between links going down
+    downtime: float = 2.0  # Seconds a link stays down
+
+class SimulatedHub(LoopbackHub):
+    """LoopbackHub whose links have latency, loss and bandwidth, measured against the running loop's clock."""
+
+    def __init__(self, link: Optional[LinkModel] = None, rng: Optional[random.Random] = None):
+        super().__init__()
+        self.link_model = link or LinkModel()
+        self.rng = rng or random.Random()
+        self.frames_lost = 0
+        self._busy_until: Dict[Edge, float] = {}
+
+    def transport(self, peer_id: str) -> 'SimulatedTransport':
+        if peer_id not in self.nodes:
+            self.nodes[peer_id] = SimulatedTransport(self, peer_id)
+            self.links[peer_id] = set()
+        return self.nodes[peer_id]
+
+    def _schedule(self, source: str, target: str, data: bytes) -> None:
+        """
+        Put a write on the air: queue it behind earlier writes on the link, then deliver or lose it.
+        """
+        loop = asyncio.get_running_loop()
+        model = self.link_model
+        now = loop.time()
+        start = max(now, self._busy_until.get((source, target), now))
+        done = start + (len(data) / model.bandwidth if model.bandwidth else 0.0)
+        self._busy_until[(source, target)] = done
+        if model.loss and self.rng.random() < model.loss:
+            self.frames_lost += 1
+            return
+        delay = done - now + model.latency + (self.rng.uniform(0, model.jitter) if model.jitter else 0.0)
+        loop.call_later(delay, self.nodes[target]._deliver, source, data)
+
+class SimulatedTransport(LoopbackTransport):
+    """Node transport on a SimulatedHub."""
+
+    async def write(self, peer_id: str, data: bytes, response: bool = True) -> None:
+        await self.connect(peer_id)
+        self.bytes_sent += len(data)
+        self.writes += 1
+        self.hub._schedule(self.peer_id, peer_id, bytes(data))
+
+def node_ids(n: int) -> List[str]:
+    """
+    Return n peer IDs, zero-padded so they sort in order.
+    """
+    return [f"bitchat_n{i:04d}" for i in range(n)]
+
+def line(n: int) -> List[Edge]:
+    """
+    Return the edges of n nodes in a chain.
+    """
+    nodes = node_ids(n)
+    return list(zip(nodes, nodes[1:]))
+
+def grid(rows: int, cols: int) -> List[Edge]:
+    """
+    Return the edges of a rows x cols grid, each node linked to its 4 neighbours.
+    """
+    nodes = node_ids(rows * cols)
+    edges = []
+    for r in range(rows):
+        for c in range(cols):
+            i = r * cols + c
+            if c + 1 < cols:
+                edges.append((nodes[i], nodes[i + 1]))
+            if r + 1 < rows:
+                edges.append((nodes[i], nodes[i + cols]))
+    return edges
+
+def random_geometric(n: int, radius: float, rng: Optional[random.Random] = None) -> List[Edge]:
+    """
+    Return the edges of n nodes placed at random in the unit square, linked when closer than radius.
+
+    The graph is not guaranteed to be connected; isolated nodes count against the delivery ratio.
+    """
+    rng = rng or random.Random()
+    nodes = node_ids(n)
+    points = [(rng.random(), rng.random()) for _ in nodes]
+    return [(nodes[i], nodes[j]) for i in range(n) for j in range(i + 1, n)
+            if math.hypot(points[i][0] - points[j][0], points[i][1] - points[j][1]) < radius]
+
+def _percentile(values: Sequence[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+@dataclass
+class SimulationReport:
+    nodes: int
+    messages: int
+    deliveries: int  # New packets delivered, over all receiving nodes
+    expected: int  # messages * (nodes - 1)
+    duplicates: int  # Copies received after the first, over all nodes
+    bytes_on_air: int  # Bytes written by all nodes, including lost frames
+    frames_lost: int
+    simulated_time: float  # Seconds of virtual time
+    wall_time: float  # Seconds the simulation took to run
+    latencies: List[float] = field(default_factory=list, repr=False)
+
+    @property
+    def delivery_ratio(self) -> float:
+        return self.deliveries / self.expected if self.expected else 0.0
+
+    @property
+    def duplicates_per_delivery(self) -> float:
+        return self.duplicates / self.deliveries if self.deliveries else 0.0
+
+    @property
+    def bytes_per_delivery(self) -> float:
+        return self.bytes_on_air / self.deliveries if self.deliveries else 0.0
+
+    def latency(self, q: float) -> float:
+        """
+        Return the q-th percentile of end-to-end latency in seconds.
+        """
+        return _percentile(self.latencies, q)
+
+    def summary(self) -> str:
+        """
+        Return the headline numbers on one line.
+        """
+        return (f"nodes={self.nodes} delivery={self.delivery_ratio:.1%} "
+                f"p50={self.latency(50) * 1000:.1f}ms p90={self.latency(90) * 1000:.1f}ms "
+                f"p99={self.latency(99) * 1000:.1f}ms dup/delivery={self.duplicates_per_delivery:.2f} "
+                f"bytes/delivery={self.bytes_per_delivery:.0f} "
+                f"speedup={self.simulated_time / self.wall_time if self.wall_time else 0:.0f}x")
+
+class MeshSimulator:
+    """Run virtual bitchat nodes in one process on a virtual clock and measure flooding performance."""
+
+    def __init__(self, edges: Sequence[Edge], nodes: Optional[Sequence[str]] = None,
+                 link: Optional[LinkModel] = None, churn: Optional[ChurnModel] = None,
+                 seed: int = 0, **relay_options):
+        """
+        Initialize a simulation.
+
+        Every node runs a RelayEngine with its own OptimizedBloomFilter over a
+        SimulatedHub. Messages are real signed, encoded and padded frames, so
+        the protocol, encryption and duplicate-filter code all run as they
+        would on a device. Time is virtual: jitter, latency and bandwidth
+        delays advance the clock instantly.
+
+        Args:
+            edges (Sequence[Edge]): Links between nodes (see line, grid, random_geometric).
+            nodes (Sequence[str], optional): All node IDs, to include nodes without links.
+            link (LinkModel, optional): Latency, loss and bandwidth of every link.
+            churn (ChurnModel, optional): Take random links down and back up while running.
+            seed (int): Seed for every random choice, so runs are repeatable.
+            **relay_options: Passed to each RelayEngine (e.g. suppression, jitter).
+        """
+        self.edges = list(edges)
+        self.nodes = sorted(set(nodes or ()) | {peer_id for edge in self.edges for peer_id in edge})
+        self.link = link or LinkModel()
+        self.churn = churn
+        self.seed = seed
+        self.relay_options = relay_options
+
+    def run(self, messages: int = 50, interval: float = 0.1, ttl: int = 7, settle: float = 5.0) -> SimulationReport:
+        """
+        Send messages from random nodes and report how they spread.
+
+        Args:
+            messages (int): Broadcasts to send.
+            interval (float): Virtual seconds between broadcasts.
+            ttl (int): TTL the broadcasts start with.
+            settle (float): Virtual seconds to keep running after the last broadcast.
+
+        Returns:
+            SimulationReport: Delivery, latency, duplicate and airtime figures.
+        """
+        loop = VirtualTimeEventLoop()
+        started = time.perf_counter()
+        try:
+            report = loop.run_until_complete(self._run(messages, interval, ttl, settle))
+        finally:
+            loop.close()
+        report.wall_time = time.perf_counter() - started
+        return report
+
+    async def _run(self, messages: int, interval: float, ttl: int, settle: float) -> SimulationReport:
+        loop = asyncio.get_running_loop()
+        rng = random.Random(self.seed)
+        hub = SimulatedHub(self.link, random.Random(rng.random()))
+        for peer_id in self.nodes:
+            hub.transport(peer_id)
+        for a, b in self.edges:
+            hub.link(a, b)
+        sent_at: Dict[bytes, float] = {}
+        latencies: List[float] = []
+
+        def deliver(packet: BitchatPacket, peer_id: str) -> None:
+            latencies.append(loop.time() - sent_at[packet.fingerprint])
+
+        engines = {}
+        for peer_id in self.nodes:
+            store_key(os.urandom(32), f"peer:{peer_id.ljust(16)}")
+            transport = hub.transport(peer_id)
+            scheduler = OutboundScheduler(
+                lambda frame, target, priority, transport=transport: transport.write(target, frame, response=False),
+                clock=loop.time)
+            engine = RelayEngine(transport, local_id=peer_id, deliver=deliver,
+                                 seen=OptimizedBloomFilter(max(messages, 1) * 2, 0.001),
+                                 rng=random.Random(rng.random()), scheduler=scheduler, **self.relay_options)
+            await engine.start()
+            engines[peer_id] = engine
+        churn_task = asyncio.ensure_future(self._churn(hub, rng)) if self.churn else None
+
+        for n in range(messages):
+            origin = rng.choice(self.nodes)
+            frame = build_frame(BitchatPacket(
+                version=1,
+                type="broadcast_message",
+                sender_id=origin.encode('utf-8').ljust(16)[:16],
+                recipient_id=b'\x00' * 16,
+                timestamp=loop.time() + n,  # Unique per message even at the same virtual instant
+                payload=f"message {n} from {origin}".encode('utf-8'),
+                signature=b'\x00' * 64,
+                ttl=ttl
+            ))
+            fingerprint = frame_fingerprint(frame)
+            engines[origin].seen.insert(fingerprint)  # Echoes are duplicates, not deliveries
+            sent_at[fingerprint] = loop.time()
+            for target in hub.transport(origin).table.peers():
+                await hub.transport(origin).write(target, frame, response=False)
+            await asyncio.sleep(interval)
+        await asyncio.sleep(settle)
+
+        if churn_task is not None:
+            churn_task.cancel()
+            await asyncio.gather(churn_task, return_exceptions=True)
+        for engine in engines.values():
+            await engine.close()
+        return SimulationReport(
+            nodes=len(self.nodes),
+            messages=messages,
+            deliveries=len(latencies),
+            expected=messages * (len(self.nodes) - 1),
+            duplicates=sum(engine.stats.duplicates for engine in engines.values()),
+            bytes_on_air=sum(hub.transport(peer_id).bytes_sent for peer_id in self.nodes),
+            frames_lost=hub.frames_lost,
+            simulated_time=loop.time(),
+            wall_time=0.0,
+            latencies=latencies
+        )
+
+    async def _churn(self, hub: SimulatedHub, rng: random.Random) -> None:
+        """
+        Take a random link down every churn interval and bring it back after the downtime.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.churn.interval)
+            up = [edge for edge in self.edges if hub.linked(*edge)]
+            if up:
+                edge = rng.choice(up)
+                hub.unlink(*edge)
+                loop.call_later(self.churn.downtime, hub.link, *edge)
@@ -0,0 +1,251 @@
+import asyncio
+import os
+import struct
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from .discovery import PeerTable
+from .scheduler import Priority
+
+# Writes a held frame: (frame, peer_id, priority)
+HeldSender = Callable[[bytes, str, Priority], Awaitable[None]]
+
+# Spill file header: priority, expiry time
+_SPILL_HEADER = struct.Struct('!Bd')
+
+@dataclass
+class HeldFrame:
+    recipient: str
+    frame: Optional[bytes]  # None while spilled to disk
+    priority: Priority
+    stored: float
+    expires: float
+    seq: int
+    path: Optional[str] = None  # Spill file, if on disk
+
+class StoreAndForwardCache:
+    """Hold frames for peers that are out of reach and hand them over when the peer is seen again."""
+
+    def __init__(self, max_packets: int = 256, max_per_peer: int = 64, ttl: float = 3600.0,
+                 spill_dir: Optional[str] = None, max_spilled: int = 4096,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize an empty store-and-forward cache.
+
+        The cache is bounded. When it is full, the least important frame is
+        given up first: the lowest priority class, and within that the oldest.
+        With ``spill_dir``, frames pushed out of memory are written there
+        instead, up to ``max_spilled`` files. Frames are dropped ``ttl``
+        seconds after they were held.
+
+        Args:
+            max_packets (int): Frames kept in memory.
+            max_per_peer (int): Frames kept per recipient, in memory and on disk.
+            ttl (float): Default seconds a frame is held.
+            spill_dir (str, optional): Directory for frames that do not fit in memory.
+            max_spilled (int): Frames kept on disk.
+            clock (Callable[[], float]): Time source, monotonic seconds.
+
+        Raises:
+            ValueError: If a limit or ttl is non-positive.
+        """
+        if max_packets <= 0 or max_per_peer <= 0 or max_spilled <= 0:
+            raise ValueError("Cache limits must be positive")
+        if ttl <= 0:
+            raise ValueError("ttl must be positive")
+        self.max_packets = max_packets
+        self.max_per_peer = max_per_peer
+        self.ttl = ttl
+        self.spill_dir = spill_dir
+        self.max_spilled = max_spilled
+        self.clock = clock
+        self.held = 0  # Frames accepted
+        self.delivered = 0  # Frames handed over after the recipient reappeared
+        self.expired = 0  # Frames dropped on reaching their TTL
+        self.evicted = 0  # Frames dropped to make room
+        self.spilled = 0  # Frames written to disk
+        self._frames: Dict[str, List[HeldFrame]] = {}
+        self._seq = 0
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def hold(self, recipient: str, frame: bytes, priority: Priority = Priority.CHAT,
+             ttl: Optional[float] = None) -> bool:
+        """
+        Keep a frame until its recipient can be reached.
+
+        Args:
+            recipient (str): Peer the frame is for.
+            frame (bytes): Padded frame, ready to write.
+            priority (Priority): Traffic class; lower classes are given up first when full.
+            ttl (float, optional): Seconds to hold it (default: the cache's ttl).
+
+        Returns:
+            bool: True if the frame is held, False if it was the one given up to stay within limits.
+        """
+        self.held += 1
+        return self._add(recipient, frame, priority, ttl or self.ttl)
+
+    def _add(self, recipient: str, frame: bytes, priority: Priority, ttl: float) -> bool:
+        now = self.clock()
+        self._seq += 1
+        entry = HeldFrame(recipient, bytes(frame), Priority(priority), now, now + ttl, self._seq)
+        self._frames.setdefault(recipient, []).append(entry)
+        self._enforce_limits(recipient)
+        return any(e is entry for e in self._frames.get(recipient, ()))
+
+    def _victim(self, entries) -> Optional[HeldFrame]:
+        return max(entries, key=lambda e: (e.priority, -e.seq), default=None)
+
+    def _enforce_limits(self, recipient: str) -> None:
+        """
+        Spill or drop frames until every limit holds again.
+        """
+        while len(self._frames.get(recipient, ())) > self.max_per_peer:
+            self._drop(self._victim(self._frames[recipient]))
+        in_memory = [e for entries in self._frames.values() for e in entries if e.path is None]
+        while len(in_memory) > self.max_packets:
+            victim = self._victim(in_memory)
+            in_memory.remove(victim)
+            if self.spill_dir is not None:
+                self._spill(victim)
+            else:
+                self._drop(victim)
+        if self.spill_dir is not None:
+            on_disk = [e for entries in self._frames.values() for e in entries if e.path is not None]
+            while len(on_disk) > self.max_spilled:
+                victim = self._victim(on_disk)
+                on_disk.remove(victim)
+                self._drop(victim)
+
+    def _spill(self, entry: HeldFrame) -> None:
+        path = os.path.join(self.spill_dir, f"{entry.seq:016d}.frame")
+        try:
+            with open(path, "wb") as f:
+                f.write(_SPILL_HEADER.pack(entry.priority, entry.expires) + entry.frame)
+        except OSError as e:
+            print(f"Failed to spill held frame for {entry.recipient}: {str(e)}")
+            self._drop(entry)
+            return
+        entry.path = path
+        entry.frame = None
+        self.spilled += 1
+
+    def _load(self, entry: HeldFrame) -> Optional[bytes]:
+        if entry.path is None:
+            return entry.frame
+        try:
+            with open(entry.path, "rb") as f:
+                return f.read()[_SPILL_HEADER.size:]
+        except OSError as e:
+            print(f"Failed to load held frame for {entry.recipient}: {str(e)}")
+            return None
+        finally:
+            self._unlink(entry)
+
+    def _unlink(self, entry: HeldFrame) -> None:
+        if entry.path is not None:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+            entry.path = None
+
+    def _drop(self, entry: HeldFrame, expired: bool = False) -> None:
+        entries = self._frames.get(entry.recipient, [])
+        entries.remove(entry)
+        if not entries:
+            self._frames.pop(entry.recipient, None)
+        self._unlink(entry)
+        if expired:
+            self.expired += 1
+        else:
+            self.evicted += 1
+
+    def expire(self) -> int:
+        """
+        Drop every frame past its TTL.
+
+        Returns:
+            int: Number of frames dropped.
+        """
+        now = self.clock()
+        stale = [e for entries in self._frames.values() for e in entries if e.expires <= now]
+        for entry in stale:
+            self._drop(entry, expired=True)
+        return len(stale)
+
+    def take(self, recipient: str) -> List[Tuple[bytes, Priority, float]]:
+        """
+        Remove and return the live frames held for a peer, most important first.
+
+        Args:
+            recipient (str): Peer whose frames to take.
+
+        Returns:
+            List[Tuple[bytes, Priority, float]]: Frame, priority and remaining seconds to live,
+            by priority class and then in the order they were held.
+        """
+        self.expire()
+        entries = sorted(self._frames.pop(recipient, []), key=lambda e: (e.priority, e.seq))
+        now = self.clock()
+        taken = []
+        for entry in entries:
+            frame = self._load(entry)
+            if frame is not None:
+                taken.append((frame, entry.priority, entry.expires - now))
+        return taken
+
+    async def deliver(self, recipient: str, send: HeldSender) -> int:
+        """
+        Send everything held for a peer in one burst.
+
+        Frames whose send fails are held again for the rest of their TTL.
+
+        Args:
+            recipient (str): Peer that can be reached again.
+            send (HeldSender): Coroutine writing one frame.
+
+        Returns:
+            int: Number of frames sent.
+        """
+        taken = self.take(recipient)
+        results = await asyncio.gather(*(send(frame, recipient, priority) for frame, priority, _ in taken),
+                                       return_exceptions=True)
+        sent = 0
+        for (frame, priority, remaining), result in zip(taken, results):
+            if isinstance(result, BaseException):
+                self._add(recipient, frame, priority, remaining)
+            else:
+                sent += 1
+        self.delivered += sent
+        return sent
+
+    async def watch(self, table: PeerTable, send: HeldSender) -> None:
+        """
+        Deliver held frames whenever their recipient (re)appears in a peer table, until cancelled.
+
+        Args:
+            table (PeerTable): Neighbour table to follow.
+            send (HeldSender): Coroutine writing one frame.
+        """
+        async for event in table.changes():
+            if event.kind == "added" and self.pending(event.peer.peer_id):
+                asyncio.ensure_future(self.deliver(event.peer.peer_id, send))
+
+    def pending(self, recipient: Optional[str] = None) -> int:
+        """
+        Return the number of frames held for a peer, or in total.
+        """
+        if recipient is not None:
+            return len(self._frames.get(recipient, ()))
+        return sum(len(entries) for entries in self._frames.values())
+
+    def recipients(self) -> List[str]:
+        """
+        Return the peers with frames waiting.
+        """
+        return list(self._frames)
+
+    def __len__(self) -> int:
+        return self.pending()
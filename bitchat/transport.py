@@ -0,0 +1,303 @@
+import asyncio
+import socket
+import struct
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Set
+from .discovery import PeerTable
+
+# Receives (peer_id, data) for every write arriving from a subscribed peer
+FrameHandler = Callable[[str, bytes], None]
+
+class Transport(ABC):
+    """Link layer the protocol stack runs on: find neighbours, write to them, receive from them."""
+
+    def __init__(self, table: Optional[PeerTable] = None):
+        """
+        Initialize a transport.
+
+        Args:
+            table (PeerTable, optional): Neighbour table to keep current (default: a new one).
+        """
+        self.table = table if table is not None else PeerTable()
+
+    @abstractmethod
+    async def discover(self, timeout: float = 5.0) -> List[str]:
+        """
+        Return the IDs of reachable neighbours.
+
+        Args:
+            timeout (float): Seconds to spend looking if none are known yet.
+        """
+
+    @abstractmethod
+    async def connect(self, peer_id: str) -> None:
+        """
+        Make sure a link to a neighbour is open.
+
+        Raises:
+            RuntimeError: If the neighbour cannot be reached.
+        """
+
+    @abstractmethod
+    async def write(self, peer_id: str, data: bytes, response: bool = True) -> None:
+        """
+        Write bytes to a neighbour.
+
+        Args:
+            peer_id (str): Target neighbour.
+            data (bytes): One or more padded frames.
+            response (bool): Whether the link layer must confirm the write.
+
+        Raises:
+            RuntimeError: If writing fails.
+        """
+
+    @abstractmethod
+    async def subscribe(self, peer_id: str, handler: FrameHandler) -> None:
+        """
+        Deliver everything a neighbour writes to us to handler.
+
+        Raises:
+            RuntimeError: If the neighbour cannot be reached.
+        """
+
+    @abstractmethod
+    async def unsubscribe(self, peer_id: str) -> None:
+        """
+        Stop delivering a neighbour's writes.
+        """
+
+    async def close(self) -> None:
+        """
+        Release all links.
+        """
+
+class LoopbackHub:
+    """In-memory medium connecting LoopbackTransports in one process."""
+
+    def __init__(self):
+        self.nodes: Dict[str, 'LoopbackTransport'] = {}
+        self.links: Dict[str, Set[str]] = {}
+
+    def transport(self, peer_id: str) -> 'LoopbackTransport':
+        """
+        Return the transport of a node, creating the node if needed.
+        """
+        if peer_id not in self.nodes:
+            self.nodes[peer_id] = LoopbackTransport(self, peer_id)
+            self.links[peer_id] = set()
+        return self.nodes[peer_id]
+
+    def link(self, a: str, b: str) -> None:
+        """
+        Put two nodes in range of each other.
+        """
+        self.transport(a)
+        self.transport(b)
+        self.links[a].add(b)
+        self.links[b].add(a)
+        self.nodes[a].table.update(b, b)
+        self.nodes[b].table.update(a, a)
+
+    def unlink(self, a: str, b: str) -> None:
+        """
+        Take two nodes out of range of each other.
+        """
+        self.links.get(a, set()).discard(b)
+        self.links.get(b, set()).discard(a)
+        if a in self.nodes:
+            self.nodes[a].table.remove(b)
+        if b in self.nodes:
+            self.nodes[b].table.remove(a)
+
+    def linked(self, a: str, b: str) -> bool:
+        return b in self.links.get(a, ())
+
+class LoopbackTransport(Transport):
+    """Transport delivering writes through a LoopbackHub on the event loop, with no radio."""
+
+    def __init__(self, hub: LoopbackHub, peer_id: str):
+        """
+        Initialize a node's transport; use LoopbackHub.transport() instead of calling this directly.
+
+        Neighbour entries never expire on their own; links come and go through
+        LoopbackHub.link() and unlink().
+        """
+        super().__init__(PeerTable(expiry=float("inf")))
+        self.hub = hub
+        self.peer_id = peer_id
+        self.bytes_sent = 0
+        self.writes = 0
+        self._handlers: Dict[str, FrameHandler] = {}
+
+    async def discover(self, timeout: float = 5.0) -> List[str]:
+        return self.table.peers()
+
+    async def connect(self, peer_id: str) -> None:
+        if not self.hub.linked(self.peer_id, peer_id):
+            raise RuntimeError(f"Peer {peer_id} not reachable from {self.peer_id}")
+
+    async def write(self, peer_id: str, data: bytes, response: bool = True) -> None:
+        await self.connect(peer_id)
+        self.bytes_sent += len(data)
+        self.writes += 1
+        # Deliver on a later loop iteration, like a radio would
+        asyncio.get_running_loop().call_soon(self.hub.nodes[peer_id]._deliver, self.peer_id, bytes(data))
+
+    async def subscribe(self, peer_id: str, handler: FrameHandler) -> None:
+        await self.connect(peer_id)
+        self._handlers[peer_id] = handler
+
+    async def unsubscribe(self, peer_id: str) -> None:
+        self._handlers.pop(peer_id, None)
+
+    async def close(self) -> None:
+        self._handlers.clear()
+
+    def _deliver(self, source: str, data: bytes) -> None:
+        handler = self._handlers.get(source)
+        if handler is not None and self.hub.linked(self.peer_id, source):
+            handler(source, data)
+
+# Datagram layout: magic, kind, sender and target ids (length-prefixed), then the data
+_UDP_MAGIC = b"BC"
+_UDP_HELLO = 0
+_UDP_DATA = 1
+_UDP_MAX_DATAGRAM = 65507
+
+class UdpMulticastTransport(Transport):
+    """Transport for nodes on one host or LAN, using UDP multicast as the shared medium."""
+
+    def __init__(self, peer_id: str, group: str = "239.255.42.99", port: int = 47474,
+                 beacon_interval: float = 1.0, expiry: float = 5.0, interface: str = "127.0.0.1"):
+        """
+        Initialize a UDP multicast transport.
+
+        Every node binds the same group and port. Nodes announce themselves
+        with a hello datagram every ``beacon_interval`` seconds; a neighbour
+        is dropped after ``expiry`` seconds without one. Stale neighbours are
+        swept on every beacon, so the table reports "removed" (and "added"
+        when they return) as it does for BLE. Writes are multicast
+        with the target's ID, and other nodes ignore them.
+
+        Args:
+            peer_id (str): This node's ID.
+            group (str): Multicast group address.
+            port (int): UDP port shared by all nodes.
+            beacon_interval (float): Seconds between hello datagrams.
+            expiry (float): Seconds without a hello before a neighbour is dropped.
+            interface (str): Local interface address to send and join on.
+        """
+        super().__init__(PeerTable(expiry=expiry))
+        self.peer_id = peer_id
+        self.group = group
+        self.port = port
+        self.beacon_interval = beacon_interval
+        self.interface = interface
+        self.bytes_sent = 0
+        self._handlers: Dict[str, FrameHandler] = {}
+        self._transport: Optional[asyncio.DatagramTransport] = None
+        self._beacon_task: Optional[asyncio.Task] = None
+
+    def _datagram(self, kind: int, target: str, data: bytes = b"") -> bytes:
+        source = self.peer_id.encode('utf-8')
+        target = target.encode('utf-8')
+        return _UDP_MAGIC + struct.pack('!BB', kind, len(source)) + source + struct.pack('!B', len(target)) + target + data
+
+    async def start(self) -> None:
+        """
+        Join the multicast group and start sending hellos.
+
+        Raises:
+            RuntimeError: If the socket cannot be set up.
+        """
+        if self._transport is not None:
+            return
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if hasattr(socket, "SO_REUSEPORT"):
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            sock.bind(("", self.port))
+            membership = socket.inet_aton(self.group) + socket.inet_aton(self.interface)
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(self.interface))
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+            sock.setblocking(False)
+        except OSError as e:
+            raise RuntimeError(f"Failed to join multicast group {self.group}:{self.port}: {str(e)}")
+        loop = asyncio.get_running_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(lambda: _UdpProtocol(self), sock=sock)
+        self._beacon_task = asyncio.ensure_future(self._beacon())
+
+    async def _beacon(self) -> None:
+        while True:
+            self._send(self._datagram(_UDP_HELLO, ""))
+            self.table.expire()
+            await asyncio.sleep(self.beacon_interval)
+
+    def _send(self, datagram: bytes) -> None:
+        self._transport.sendto(datagram, (self.group, self.port))
+        self.bytes_sent += len(datagram)
+
+    def _on_datagram(self, datagram: bytes, addr) -> None:
+        try:
+            if datagram[:2] != _UDP_MAGIC:
+                return
+            kind, source_length = struct.unpack_from('!BB', datagram, 2)
+            offset = 4 + source_length
+            source = datagram[4:offset].decode('utf-8')
+            target_length = datagram[offset]
+            target = datagram[offset + 1:offset + 1 + target_length].decode('utf-8')
+            data = datagram[offset + 1 + target_length:]
+        except (struct.error, IndexError, UnicodeDecodeError):
+            return
+        if source == self.peer_id:
+            return
+        self.table.update(source, f"{addr[0]}:{addr[1]}")
+        if kind == _UDP_DATA and target == self.peer_id:
+            handler = self._handlers.get(source)
+            if handler is not None:
+                handler(source, data)
+
+    async def discover(self, timeout: float = 5.0) -> List[str]:
+        await self.start()
+        if not self.table.peers():
+            await asyncio.sleep(min(timeout, self.beacon_interval * 2))
+        return self.table.peers()
+
+    async def connect(self, peer_id: str) -> None:
+        await self.start()
+        if peer_id not in self.table:
+            raise RuntimeError(f"Peer {peer_id} not found")
+
+    async def write(self, peer_id: str, data: bytes, response: bool = True) -> None:
+        await self.connect(peer_id)
+        datagram = self._datagram(_UDP_DATA, peer_id, data)
+        if len(datagram) > _UDP_MAX_DATAGRAM:
+            raise RuntimeError(f"Failed to send packet to {peer_id}: {len(data)} bytes exceed one datagram")
+        self._send(datagram)
+
+    async def subscribe(self, peer_id: str, handler: FrameHandler) -> None:
+        await self.start()
+        self._handlers[peer_id] = handler
+
+    async def unsubscribe(self, peer_id: str) -> None:
+        self._handlers.pop(peer_id, None)
+
+    async def close(self) -> None:
+        if self._beacon_task is not None:
+            self._beacon_task.cancel()
+            self._beacon_task = None
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+        self._handlers.clear()
+
+class _UdpProtocol(asyncio.DatagramProtocol):
+    def __init__(self, owner: UdpMulticastTransport):
+        self.owner = owner
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.owner._on_datagram(data, addr)
@@ -1,11 +1,30 @@
-from pybloom_live import BloomFilter
-from typing import Optional
+import math
+import random
+import struct
+import time
+from array import array
+from collections import deque
+from hashlib import blake2b
+from typing import Callable, Iterable, List, Optional, Union
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; batch calls fall back to pure Python
+    np = None
+
+# Batches smaller than this are cheaper to process in pure Python than to
+# hand over to NumPy.
+_NUMPY_BATCH_THRESHOLD = 64
 
 class OptimizedBloomFilter:
     def __init__(self, expected_items: int, false_positive_rate: float):
         """
         Initialize a Bloom filter with specified capacity and error rate.
 
+        The filter is a ``bytearray`` bitmap addressed with Kirsch-Mitzenmacher
+        double hashing: one 128-bit BLAKE2b digest per key yields the two base
+        hashes from which all ``num_hashes`` bit positions are derived.
+
         Args:
             expected_items (int): Expected number of items to store.
             false_positive_rate (float): Desired false positive probability (0.0 to 1.0).
@@ -17,87 +36,829 @@ class OptimizedBloomFilter:
             raise ValueError("expected_items must be positive")
         if not 0.0 < false_positive_rate < 1.0:
             raise ValueError("false_positive_rate must be between 0.0 and 1.0")
-        self.filter = BloomFilter(expected_items, false_positive_rate)
+        self.capacity = expected_items
+        self.false_positive_rate = false_positive_rate
+        self.num_bits = self._num_bits(expected_items, false_positive_rate)
+        self.num_hashes = max(1, int(round(self.num_bits / expected_items * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    @staticmethod
+    def _num_bits(expected_items: int, false_positive_rate: float) -> int:
+        """
+        Return the bitmap size in bits for a capacity and error rate.
+        """
+        return max(8, int(math.ceil(-expected_items * math.log(false_positive_rate) / (math.log(2) ** 2))))
+
+    def _hashes(self, item: bytes):
+        """
+        Return the two base hashes for an item, reduced modulo ``num_bits``.
+        """
+        digest = blake2b(item, digest_size=16).digest()
+        m = self.num_bits
+        h1 = int.from_bytes(digest[:8], 'little') % m
+        h2 = int.from_bytes(digest[8:], 'little') % m
+        return h1, h2 or 1
 
-    def insert(self, item: str) -> None:
+    def insert(self, item: Union[bytes, str]) -> None:
         """
         Add an item to the Bloom filter.
 
         Args:
-            item (str): Item to add.
-
-        Raises:
-            ValueError: If item is empty or not a string.
+            item (bytes | str): Item to add. Strings are UTF-8 encoded.
         """
-        if not isinstance(item, str) or not item:
-            raise ValueError("Item must be a non-empty string")
-        self.filter.add(item)
+        if item.__class__ is str:
+            item = item.encode('utf-8')
+        pos, step = self._hashes(item)
+        bits = self.bits
+        m = self.num_bits
+        for _ in range(self.num_hashes):
+            bits[pos >> 3] |= 1 << (pos & 7)
+            pos += step
+            if pos >= m:
+                pos -= m
+        self.count += 1
 
-    def contains(self, item: str) -> bool:
+    def contains(self, item: Union[bytes, str]) -> bool:
         """
         Check if an item is likely in the Bloom filter.
 
         Args:
-            item (str): Item to check.
+            item (bytes | str): Item to check. Strings are UTF-8 encoded.
 
         Returns:
             bool: True if the item is likely present, False otherwise.
+        """
+        if item.__class__ is str:
+            item = item.encode('utf-8')
+        pos, step = self._hashes(item)
+        bits = self.bits
+        m = self.num_bits
+        for _ in range(self.num_hashes):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+            pos += step
+            if pos >= m:
+                pos -= m
+        return True
 
-        Raises:
-            ValueError: If item is empty or not a string.
+    def _positions(self, items: List[bytes]):
+        """
+        Compute the bit positions of a batch of items as an (n, k) NumPy array.
         """
-        if not isinstance(item, str) or not item:
-            raise ValueError("Item must be a non-empty string")
-        return item in self.filter
+        digests = b''.join(blake2b(item, digest_size=16).digest() for item in items)
+        hashes = np.frombuffer(digests, dtype='<u8').reshape(-1, 2) % np.uint64(self.num_bits)
+        h1 = hashes[:, 0]
+        h2 = np.where(hashes[:, 1] == 0, np.uint64(1), hashes[:, 1])
+        steps = np.arange(self.num_hashes, dtype=np.uint64)
+        return (h1[:, None] + steps[None, :] * h2[:, None]) % np.uint64(self.num_bits)
+
+    def insert_many(self, items: Iterable[Union[bytes, str]]) -> None:
+        """
+        Add a batch of items to the Bloom filter.
+
+        Uses a vectorized NumPy path for large batches when NumPy is installed.
+
+        Args:
+            items (Iterable[bytes | str]): Items to add.
+        """
+        items = [item.encode('utf-8') if item.__class__ is str else item for item in items]
+        if np is None or len(items) < _NUMPY_BATCH_THRESHOLD:
+            for item in items:
+                self.insert(item)
+            return
+        positions = self._positions(items).ravel()
+        view = np.frombuffer(self.bits, dtype=np.uint8)
+        np.bitwise_or.at(view, positions >> np.uint64(3), np.left_shift(1, positions & np.uint64(7)).astype(np.uint8))
+        self.count += len(items)
+
+    def contains_many(self, items: Iterable[Union[bytes, str]]) -> List[bool]:
+        """
+        Check a batch of items against the Bloom filter.
+
+        Uses a vectorized NumPy path for large batches when NumPy is installed.
+
+        Args:
+            items (Iterable[bytes | str]): Items to check.
+
+        Returns:
+            List[bool]: Membership result for each item, in input order.
+        """
+        items = [item.encode('utf-8') if item.__class__ is str else item for item in items]
+        if np is None or len(items) < _NUMPY_BATCH_THRESHOLD:
+            return [self.contains(item) for item in items]
+        positions = self._positions(items)
+        view = np.frombuffer(self.bits, dtype=np.uint8)
+        hits = view[positions >> np.uint64(3)] & np.left_shift(1, positions & np.uint64(7)).astype(np.uint8)
+        return (hits != 0).all(axis=1).tolist()
 
     def reset(self) -> None:
         """
-        Clear the Bloom filter by recreating it with the same parameters.
+        Clear the Bloom filter, keeping its size and hash count.
+        """
+        self.bits = bytearray(len(self.bits))
+        self.count = 0
+
+    def encode(self) -> bytes:
+        """
+        Encode the Bloom filter into bytes for exchange with a peer.
+
+        Format:
+        - version: uint8 (1 byte)
+        - capacity: uint32 (4 bytes)
+        - false_positive_rate: double (8 bytes)
+        - count: uint32 (4 bytes)
+        - bitmap: remaining bytes
+        """
+        return struct.pack('!B I d I', 1, self.capacity, self.false_positive_rate, self.count) + bytes(self.bits)
+
+    @classmethod
+    def decode(cls, data: bytes) -> Optional['OptimizedBloomFilter']:
+        """
+        Decode bytes produced by ``encode`` into a Bloom filter.
+
+        Returns None if the data is invalid. The header is checked against the
+        bitmap length before anything is allocated, so a peer cannot make the
+        decoder reserve more memory than the data it sent.
         """
         try:
-            self.filter = BloomFilter(self.filter.capacity, self.filter.error_rate())
-        except Exception as e:
-            raise RuntimeError(f"Failed to reset Bloom filter: {str(e)}")
+            if len(data) < 17:
+                return None
+            version, capacity, false_positive_rate, count = struct.unpack('!B I d I', data[:17])
+            if version != 1 or capacity <= 0 or not 0.0 < false_positive_rate < 1.0:
+                return None
+            if (cls._num_bits(capacity, false_positive_rate) + 7) // 8 != len(data) - 17:
+                return None
+            bf = cls(capacity, false_positive_rate)
+            bf.bits[:] = data[17:]
+            bf.count = count
+            return bf
+        except (struct.error, ValueError):
+            return None
 
-    def estimated_false_positive_rate(self) -> float:
+    def is_compatible(self, other: 'OptimizedBloomFilter') -> bool:
+        """
+        Check whether another filter uses the same size and hash count.
+        """
+        return self.num_bits == other.num_bits and self.num_hashes == other.num_hashes
+
+    def merge(self, other: 'OptimizedBloomFilter') -> None:
+        """
+        Add every item of a compatible filter to this one (in-place union).
+
+        Args:
+            other (OptimizedBloomFilter): Filter built with the same parameters.
+
+        Raises:
+            ValueError: If the filters are not compatible.
+        """
+        if not self.is_compatible(other):
+            raise ValueError("Bloom filters must have the same size and hash count")
+        merged = int.from_bytes(self.bits, 'little') | int.from_bytes(other.bits, 'little')
+        self.bits = bytearray(merged.to_bytes(len(self.bits), 'little'))
+        self.count += other.count  # Upper bound: shared items are counted twice
+
+    def union(self, other: 'OptimizedBloomFilter') -> 'OptimizedBloomFilter':
+        """
+        Return a new filter containing the items of both filters.
+
+        Args:
+            other (OptimizedBloomFilter): Filter built with the same parameters.
+
+        Returns:
+            OptimizedBloomFilter: The union of both filters.
+
+        Raises:
+            ValueError: If the filters are not compatible.
+        """
+        result = type(self)(self.capacity, self.false_positive_rate)
+        result.bits[:] = self.bits
+        result.count = self.count
+        result.merge(other)
+        return result
+
+    def missing(self, items: Iterable[Union[bytes, str]]) -> List[Union[bytes, str]]:
         """
-        Estimate the current false positive rate.
+        Return the items that are definitely not in this filter.
+
+        Called on a peer's filter with local ids, this lists what the peer
+        lacks. False positives may hide a few missing ids, never the reverse.
+
+        Args:
+            items (Iterable[bytes | str]): Candidate items.
 
         Returns:
-            float: Configured false positive rate.
+            List[bytes | str]: Items absent from the filter, in input order.
         """
-        return self.filter.error_rate()
+        items = list(items)
+        return [item for item, found in zip(items, self.contains_many(items)) if not found]
 
-    def memory_size_bytes(self) -> int:
+    @property
+    def fill_ratio(self) -> float:
         """
-        Estimate memory usage of the Bloom filter in bytes.
+        Fraction of bits currently set in the bitmap.
+        """
+        return bin(int.from_bytes(self.bits, 'little')).count('1') / self.num_bits
+
+    @property
+    def estimated_false_positive_rate(self) -> float:
+        """
+        Estimate the current false positive rate from the bitmap fill ratio.
 
         Returns:
-            int: Approximate memory usage in bytes.
+            float: Probability that an absent item is reported present.
         """
-        try:
-            # pybloom-live uses a bit array; estimate size based on bit count
-            return self.filter.bit_array.bit_length() // 8
-        except AttributeError:
-            # Fallback if bit_array is not accessible
-            return int(self.filter.capacity * 1.44 / 8)  # Approximate based on Bloom filter theory
+        return self.fill_ratio ** self.num_hashes
+
+    @property
+    def memory_size_bytes(self) -> int:
+        """
+        Size of the filter bitmap in bytes.
+        """
+        return len(self.bits)
 
     @classmethod
-    def adaptive(cls, network_size: int) -> 'OptimizedBloomFilter':
+    def adaptive(cls, network_size: Optional[int] = None, generations: int = 1, rotation_interval: Optional[float] = None
+                 ) -> Union['OptimizedBloomFilter', 'RotatingBloomFilter', 'ScalableBloomFilter']:
         """
         Create a Bloom filter optimized for the given network size.
 
         Args:
-            network_size (int): Estimated number of peers in the network.
+            network_size (int, optional): Estimated number of peers in the network.
+                None returns a ScalableBloomFilter that sizes itself from the
+                observed insertion rate.
+            generations (int): Number of rotating generations. Values above 1
+                return a RotatingBloomFilter for long-running relays.
+            rotation_interval (float, optional): Seconds after which a rotating
+                filter starts a new generation regardless of its fill.
 
         Returns:
-            OptimizedBloomFilter: A new Bloom filter instance.
+            OptimizedBloomFilter | RotatingBloomFilter | ScalableBloomFilter: A new Bloom filter instance.
 
         Raises:
             ValueError: If network_size is negative.
         """
+        false_positive_rate = 0.01  # Fixed rate for balanced performance
+        if network_size is None:
+            return ScalableBloomFilter(100, false_positive_rate)
         if network_size < 0:
             raise ValueError("network_size must be non-negative")
         expected_items = max(100, network_size * 10)  # Heuristic: 10 items per peer
-        false_positive_rate = 0.01  # Fixed rate for balanced performance
-        return cls(expected_items, false_positive_rate)
\ No newline at end of file
+        if generations > 1:
+            return RotatingBloomFilter(expected_items, false_positive_rate, generations, rotation_interval)
+        return cls(expected_items, false_positive_rate)
+
+class RotatingBloomFilter:
+    def __init__(self, expected_items: int, false_positive_rate: float, generations: int = 3,
+                 rotation_interval: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize a sliding-window Bloom filter made of rotating generations.
+
+        New items go into the newest generation. When it has taken its share of
+        ``expected_items`` or ``rotation_interval`` seconds have passed, the
+        oldest generation is cleared and reused as the new one, so history ages
+        out gradually instead of being dropped all at once.
+
+        Args:
+            expected_items (int): Number of recent items the window must remember.
+            false_positive_rate (float): Target false positive probability across all generations.
+            generations (int): Number of live generations (at least 2).
+            rotation_interval (float, optional): Maximum age in seconds of the newest generation.
+            clock (Callable[[], float]): Time source, monotonic seconds.
+
+        Raises:
+            ValueError: If any parameter is out of range.
+        """
+        if expected_items <= 0:
+            raise ValueError("expected_items must be positive")
+        if not 0.0 < false_positive_rate < 1.0:
+            raise ValueError("false_positive_rate must be between 0.0 and 1.0")
+        if generations < 2:
+            raise ValueError("generations must be at least 2")
+        if rotation_interval is not None and rotation_interval <= 0:
+            raise ValueError("rotation_interval must be positive")
+        self.expected_items = expected_items
+        self.false_positive_rate = false_positive_rate
+        self.rotation_interval = rotation_interval
+        self.clock = clock
+        # The oldest generation is discarded on rotation, so the remaining
+        # generations - 1 full ones must cover the whole window.
+        self.generation_capacity = -(-expected_items // (generations - 1))
+        generation_rate = 1.0 - (1.0 - false_positive_rate) ** (1.0 / generations)
+        self.generations = deque(
+            (OptimizedBloomFilter(self.generation_capacity, generation_rate) for _ in range(generations)),
+            maxlen=generations
+        )
+        self.rotations = 0
+        self._rotated_at = clock()
+
+    def _maybe_rotate(self) -> None:
+        """
+        Start a new generation if the current one is full or too old.
+        """
+        current = self.generations[-1]
+        if current.count >= self.generation_capacity or (
+            self.rotation_interval is not None and self.clock() - self._rotated_at >= self.rotation_interval
+        ):
+            self.rotate()
+
+    def rotate(self) -> None:
+        """
+        Drop the oldest generation and start a fresh one in its place.
+        """
+        oldest = self.generations[0]
+        oldest.reset()
+        self.generations.append(oldest)
+        self.rotations += 1
+        self._rotated_at = self.clock()
+
+    def insert(self, item: Union[bytes, str]) -> None:
+        """
+        Add an item to the newest generation.
+
+        Args:
+            item (bytes | str): Item to add.
+        """
+        self._maybe_rotate()
+        self.generations[-1].insert(item)
+
+    def contains(self, item: Union[bytes, str]) -> bool:
+        """
+        Check if an item is likely in any live generation.
+
+        Args:
+            item (bytes | str): Item to check.
+
+        Returns:
+            bool: True if the item is likely present, False otherwise.
+        """
+        self._maybe_rotate()
+        if item.__class__ is str:
+            item = item.encode('utf-8')
+        for generation in reversed(self.generations):
+            if generation.contains(item):
+                return True
+        return False
+
+    def insert_many(self, items: Iterable[Union[bytes, str]]) -> None:
+        """
+        Add a batch of items, rotating generations as they fill.
+
+        Args:
+            items (Iterable[bytes | str]): Items to add.
+        """
+        items = list(items)
+        while items:
+            self._maybe_rotate()
+            current = self.generations[-1]
+            room = max(1, self.generation_capacity - current.count)
+            current.insert_many(items[:room])
+            items = items[room:]
+
+    def contains_many(self, items: Iterable[Union[bytes, str]]) -> List[bool]:
+        """
+        Check a batch of items against all live generations.
+
+        Args:
+            items (Iterable[bytes | str]): Items to check.
+
+        Returns:
+            List[bool]: Membership result for each item, in input order.
+        """
+        self._maybe_rotate()
+        items = list(items)
+        results = [False] * len(items)
+        for generation in self.generations:
+            pending = [i for i, found in enumerate(results) if not found]
+            if not pending:
+                break
+            for i, found in zip(pending, generation.contains_many([items[i] for i in pending])):
+                results[i] = found
+        return results
+
+    def reset(self) -> None:
+        """
+        Clear every generation.
+        """
+        for generation in self.generations:
+            generation.reset()
+        self._rotated_at = self.clock()
+
+    @property
+    def count(self) -> int:
+        """
+        Number of items inserted across the live generations.
+        """
+        return sum(generation.count for generation in self.generations)
+
+    @property
+    def fill_ratio(self) -> float:
+        """
+        Fraction of bits set in the newest generation.
+        """
+        return self.generations[-1].fill_ratio
+
+    @property
+    def estimated_false_positive_rate(self) -> float:
+        """
+        Estimate the false positive rate of a lookup across all generations.
+
+        Returns:
+            float: Probability that an absent item is reported present.
+        """
+        miss = 1.0
+        for generation in self.generations:
+            miss *= 1.0 - generation.estimated_false_positive_rate
+        return 1.0 - miss
+
+    @property
+    def memory_size_bytes(self) -> int:
+        """
+        Total size of all generation bitmaps in bytes.
+        """
+        return sum(generation.memory_size_bytes for generation in self.generations)
+
+class ScalableBloomFilter:
+    def __init__(self, initial_capacity: int, false_positive_rate: float, growth: int = 2,
+                 tightening: float = 0.5, rate_horizon: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize a Bloom filter that grows by adding slices as it fills.
+
+        Slice ``i`` targets ``false_positive_rate * (1 - tightening) * tightening ** i``,
+        so the compound rate stays below ``false_positive_rate`` however many
+        slices are added. A new slice is sized for the larger of ``growth``
+        times the previous slice and ``rate_horizon`` seconds of traffic at the
+        observed insertion rate.
+
+        Args:
+            initial_capacity (int): Capacity of the first slice.
+            false_positive_rate (float): Upper bound on the compound false positive rate.
+            growth (int): Minimum capacity multiplier between consecutive slices.
+            tightening (float): Error-rate ratio between consecutive slices (0.0 to 1.0).
+            rate_horizon (float): Seconds of observed traffic a new slice should hold.
+            clock (Callable[[], float]): Time source, monotonic seconds.
+
+        Raises:
+            ValueError: If any parameter is out of range.
+        """
+        if initial_capacity <= 0:
+            raise ValueError("initial_capacity must be positive")
+        if not 0.0 < false_positive_rate < 1.0:
+            raise ValueError("false_positive_rate must be between 0.0 and 1.0")
+        if growth < 1:
+            raise ValueError("growth must be at least 1")
+        if not 0.0 < tightening < 1.0:
+            raise ValueError("tightening must be between 0.0 and 1.0")
+        self.false_positive_rate = false_positive_rate
+        self.growth = growth
+        self.tightening = tightening
+        self.rate_horizon = rate_horizon
+        self.clock = clock
+        self.slices = [OptimizedBloomFilter(initial_capacity, false_positive_rate * (1.0 - tightening))]
+        self.insert_rate = 0.0  # Exponentially weighted items per second
+        self._rate_count = 0
+        self._rate_started = clock()
+
+    def _record_inserts(self, n: int) -> None:
+        """
+        Fold new inserts into the insertion-rate estimate, once per second.
+        """
+        self._rate_count += n
+        now = self.clock()
+        elapsed = now - self._rate_started
+        if elapsed >= 1.0:
+            rate = self._rate_count / elapsed
+            self.insert_rate = rate if not self.insert_rate else 0.8 * self.insert_rate + 0.2 * rate
+            self._rate_count = 0
+            self._rate_started = now
+
+    def _grow(self) -> None:
+        """
+        Append a slice with a tighter error rate and a larger capacity.
+        """
+        last = self.slices[-1]
+        capacity = max(last.capacity * self.growth, int(self.insert_rate * self.rate_horizon))
+        self.slices.append(OptimizedBloomFilter(capacity, last.false_positive_rate * self.tightening))
+
+    def insert(self, item: Union[bytes, str]) -> None:
+        """
+        Add an item to the newest slice, growing first if it is full.
+
+        Args:
+            item (bytes | str): Item to add.
+        """
+        if self.slices[-1].count >= self.slices[-1].capacity:
+            self._grow()
+        self.slices[-1].insert(item)
+        self._record_inserts(1)
+
+    def contains(self, item: Union[bytes, str]) -> bool:
+        """
+        Check if an item is likely in any slice.
+
+        Args:
+            item (bytes | str): Item to check.
+
+        Returns:
+            bool: True if the item is likely present, False otherwise.
+        """
+        if item.__class__ is str:
+            item = item.encode('utf-8')
+        for bf in reversed(self.slices):
+            if bf.contains(item):
+                return True
+        return False
+
+    def insert_many(self, items: Iterable[Union[bytes, str]]) -> None:
+        """
+        Add a batch of items, growing as slices fill.
+
+        Args:
+            items (Iterable[bytes | str]): Items to add.
+        """
+        items = list(items)
+        self._record_inserts(len(items))
+        while items:
+            current = self.slices[-1]
+            if current.count >= current.capacity:
+                self._grow()
+                current = self.slices[-1]
+            room = current.capacity - current.count
+            current.insert_many(items[:room])
+            items = items[room:]
+
+    def contains_many(self, items: Iterable[Union[bytes, str]]) -> List[bool]:
+        """
+        Check a batch of items against all slices.
+
+        Args:
+            items (Iterable[bytes | str]): Items to check.
+
+        Returns:
+            List[bool]: Membership result for each item, in input order.
+        """
+        items = list(items)
+        results = [False] * len(items)
+        for bf in self.slices:
+            pending = [i for i, found in enumerate(results) if not found]
+            if not pending:
+                break
+            for i, found in zip(pending, bf.contains_many([items[i] for i in pending])):
+                results[i] = found
+        return results
+
+    def reset(self) -> None:
+        """
+        Drop every slice but a cleared first one.
+        """
+        del self.slices[1:]
+        self.slices[0].reset()
+        self.insert_rate = 0.0
+        self._rate_count = 0
+        self._rate_started = self.clock()
+
+    @property
+    def count(self) -> int:
+        """
+        Number of items inserted across all slices.
+        """
+        return sum(bf.count for bf in self.slices)
+
+    @property
+    def capacity(self) -> int:
+        """
+        Total capacity of the slices allocated so far.
+        """
+        return sum(bf.capacity for bf in self.slices)
+
+    @property
+    def fill_ratio(self) -> float:
+        """
+        Fraction of bits set in the newest slice.
+        """
+        return self.slices[-1].fill_ratio
+
+    @property
+    def estimated_false_positive_rate(self) -> float:
+        """
+        Effective false positive rate of a lookup across all slices.
+
+        Returns:
+            float: Probability that an absent item is reported present.
+        """
+        miss = 1.0
+        for bf in self.slices:
+            miss *= 1.0 - bf.estimated_false_positive_rate
+        return 1.0 - miss
+
+    @property
+    def memory_size_bytes(self) -> int:
+        """
+        Total size of all slice bitmaps in bytes.
+        """
+        return sum(bf.memory_size_bytes for bf in self.slices)
+
+class CuckooFilter:
+    def __init__(self, expected_items: int, bucket_size: int = 4, max_kicks: int = 500):
+        """
+        Initialize a cuckoo filter, an approximate set that supports deletion.
+
+        Each item is stored as a 16-bit fingerprint in one of two candidate
+        buckets, so lookups and removals touch at most ``2 * bucket_size``
+        slots. Memory is fixed at construction: two bytes per slot.
+
+        Args:
+            expected_items (int): Expected number of items to store.
+            bucket_size (int): Fingerprint slots per bucket.
+            max_kicks (int): Relocation attempts before the filter reports full.
+
+        Raises:
+            ValueError: If expected_items, bucket_size or max_kicks is non-positive.
+        """
+        if expected_items <= 0:
+            raise ValueError("expected_items must be positive")
+        if bucket_size <= 0:
+            raise ValueError("bucket_size must be positive")
+        if max_kicks <= 0:
+            raise ValueError("max_kicks must be positive")
+        self.capacity = expected_items
+        self.bucket_size = bucket_size
+        self.max_kicks = max_kicks
+        # Power-of-two bucket count keeps the alternate-index XOR inside the
+        # table; ~95% load is reachable with 4-slot buckets.
+        buckets = max(1, int(math.ceil(expected_items / (bucket_size * 0.95))))
+        self.num_buckets = 1 << (buckets - 1).bit_length()
+        self.table = array('H', bytes(2 * self.num_buckets * bucket_size))
+        self.count = 0
+        self._victim = None  # (bucket, fingerprint) left homeless when the table filled up
+        self._random = random.Random()
+
+    def _locate(self, item: bytes):
+        """
+        Return the fingerprint and both candidate buckets for an item.
+        """
+        h = int.from_bytes(blake2b(item, digest_size=8).digest(), 'little')
+        mask = self.num_buckets - 1
+        fingerprint = (h >> 48) or 1
+        i1 = h & mask
+        return fingerprint, i1, self._alternate(i1, fingerprint)
+
+    def _alternate(self, bucket: int, fingerprint: int) -> int:
+        """
+        Return the other candidate bucket for a fingerprint.
+        """
+        return (bucket ^ (fingerprint * 0x5bd1e995)) & (self.num_buckets - 1)
+
+    def _put(self, bucket: int, fingerprint: int) -> bool:
+        """
+        Store a fingerprint in a free slot of a bucket if there is one.
+        """
+        start = bucket * self.bucket_size
+        table = self.table
+        for slot in range(start, start + self.bucket_size):
+            if not table[slot]:
+                table[slot] = fingerprint
+                return True
+        return False
+
+    def insert(self, item: Union[bytes, str]) -> None:
+        """
+        Add an item to the cuckoo filter.
+
+        Args:
+            item (bytes | str): Item to add. Strings are UTF-8 encoded.
+
+        Raises:
+            RuntimeError: If the filter is full.
+        """
+        if self._victim is not None:
+            raise RuntimeError("Cuckoo filter is full")
+        if item.__class__ is str:
+            item = item.encode('utf-8')
+        fingerprint, i1, i2 = self._locate(item)
+        self.count += 1
+        if self._put(i1, fingerprint) or self._put(i2, fingerprint):
+            return
+        # Both buckets full: evict random residents along a cuckoo path.
+        bucket = self._random.choice((i1, i2))
+        for _ in range(self.max_kicks):
+            slot = bucket * self.bucket_size + self._random.randrange(self.bucket_size)
+            fingerprint, self.table[slot] = self.table[slot], fingerprint
+            bucket = self._alternate(bucket, fingerprint)
+            if self._put(bucket, fingerprint):
+                return
+        self._victim = (bucket, fingerprint)
+
+    def contains(self, item: Union[bytes, str]) -> bool:
+        """
+        Check if an item is likely in the cuckoo filter.
+
+        Args:
+            item (bytes | str): Item to check. Strings are UTF-8 encoded.
+
+        Returns:
+            bool: True if the item is likely present, False otherwise.
+        """
+        if item.__class__ is str:
+            item = item.encode('utf-8')
+        fingerprint, i1, i2 = self._locate(item)
+        b = self.bucket_size
+        table = self.table
+        if fingerprint in table[i1 * b:i1 * b + b] or fingerprint in table[i2 * b:i2 * b + b]:
+            return True
+        victim = self._victim
+        return victim is not None and victim[1] == fingerprint and victim[0] in (i1, i2)
+
+    def remove(self, item: Union[bytes, str]) -> bool:
+        """
+        Remove one copy of an item from the cuckoo filter.
+
+        Only remove items that were inserted; removing an absent item that
+        shares a fingerprint with a stored one deletes the stored one.
+
+        Args:
+            item (bytes | str): Item to remove. Strings are UTF-8 encoded.
+
+        Returns:
+            bool: True if a matching fingerprint was removed, False otherwise.
+        """
+        if item.__class__ is str:
+            item = item.encode('utf-8')
+        fingerprint, i1, i2 = self._locate(item)
+        victim = self._victim
+        if victim is not None and victim[1] == fingerprint and victim[0] in (i1, i2):
+            self._victim = None
+            self.count -= 1
+            return True
+        table = self.table
+        for bucket in (i1, i2):
+            start = bucket * self.bucket_size
+            for slot in range(start, start + self.bucket_size):
+                if table[slot] == fingerprint:
+                    table[slot] = 0
+                    self.count -= 1
+                    if victim is not None:
+                        # A slot opened up: give the homeless fingerprint a home.
+                        self._victim = None
+                        if not (self._put(victim[0], victim[1]) or
+                                self._put(self._alternate(victim[0], victim[1]), victim[1])):
+                            self._victim = victim
+                    return True
+        return False
+
+    def insert_many(self, items: Iterable[Union[bytes, str]]) -> None:
+        """
+        Add a batch of items to the cuckoo filter.
+
+        Args:
+            items (Iterable[bytes | str]): Items to add.
+
+        Raises:
+            RuntimeError: If the filter fills up.
+        """
+        for item in items:
+            self.insert(item)
+
+    def contains_many(self, items: Iterable[Union[bytes, str]]) -> List[bool]:
+        """
+        Check a batch of items against the cuckoo filter.
+
+        Args:
+            items (Iterable[bytes | str]): Items to check.
+
+        Returns:
+            List[bool]: Membership result for each item, in input order.
+        """
+        return [self.contains(item) for item in items]
+
+    def reset(self) -> None:
+        """
+        Remove every item from the cuckoo filter.
+        """
+        self.table = array('H', bytes(2 * len(self.table)))
+        self.count = 0
+        self._victim = None
+
+    @property
+    def load_factor(self) -> float:
+        """
+        Fraction of fingerprint slots in use.
+        """
+        return self.count / len(self.table)
+
+    @property
+    def estimated_false_positive_rate(self) -> float:
+        """
+        Estimate the current false positive rate from the load factor.
+
+        Returns:
+            float: Probability that an absent item is reported present.
+        """
+        return 1.0 - (1.0 - 1.0 / 65535) ** (2 * self.bucket_size * self.load_factor)
+
+    @property
+    def memory_size_bytes(self) -> int:
+        """
+        Size of the fingerprint table in bytes.
+        """
+        return len(self.table) * self.table.itemsize
@@ -14,8 +14,10 @@ setup(
     install_requires=[
         "bleak>=0.21.1",
         "cryptography>=42.0.5",
-        "pybloom-live>=4.0.0",
     ],
+    extras_require={
+        "numpy": ["numpy>=1.21"],
+    },
     python_requires=">=3.8",
     license="Unlicense",
     classifiers=[
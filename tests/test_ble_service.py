@@ -1,9 +1,11 @@
+import asyncio
 import pytest
 from unittest.mock import AsyncMock, patch
-from bitchat.ble_service import start_advertising, scan_peers, send_packet, receive_packet, send_message, send_encrypted_channel_message, send_delivery_ack, send_read_receipt
+from bitchat import ble_service
+from bitchat.ble_service import start_advertising, scan_peers, send_packet, receive_packet, send_message, send_encrypted_channel_message, send_delivery_ack, send_read_receipt, broadcast_packet, build_frame, write_frame, WRITE_WINDOW
 from bitchat.message import BitchatPacket, BitchatMessage, DeliveryAck, ReadReceipt
 from bitchat.protocol import encode_packet, encode_message
-from bitchat.encryption import encrypt_content, derive_channel_key
+from bitchat.encryption import encrypt_content, derive_channel_key, generate_signature
 from datetime import datetime
 
 @pytest.mark.asyncio
@@ -247,4 +249,141 @@ async def test_invalid_peer_id():
         with pytest.raises(ValueError, match="Invalid peer ID"):
             await send_packet(packet, "invalid_peer")
         with pytest.raises(ValueError, match="Invalid peer ID"):
-            await send_message(message, recipient="invalid_peer")
\ No newline at end of file
+            await send_message(message, recipient="invalid_peer")
+def make_broadcast_message(message_id="msg789"):
+    return BitchatMessage(
+        id=message_id,
+        sender="alice",
+        content="Hello, mesh!",
+        timestamp=int(datetime.now().timestamp()),
+        is_relay=False,
+        original_sender=None,
+        is_private=False,
+        recipient_nickname=None,
+        sender_peer_id="bitchat_alice",
+        mentions=[],
+        channel=None,
+        encrypted_content=None,
+        is_encrypted=False,
+        delivery_status="PENDING"
+    )
+
+@pytest.mark.asyncio
+async def test_broadcast_fan_out_is_concurrent():
+    """Test broadcast latency tracks the slowest peer, not the sum, and failures stay per-peer."""
+    peers = [f"bitchat_peer{i}" for i in range(6)]
+
+    async def fake_write_frame(frame, peer_id, response=True):
+        await asyncio.sleep(0.05)
+        if peer_id == "bitchat_peer3":
+            raise RuntimeError("unreachable")
+
+    with patch("bitchat.ble_service.write_frame", new=fake_write_frame), \
+         patch("bitchat.ble_service.build_frame", return_value=b"frame"), \
+         patch("bitchat.ble_service.resolve_peers", new=AsyncMock(return_value=peers)):
+        report = await send_message(make_broadcast_message())
+    assert report.elapsed < 0.2, f"Broadcast took {report.elapsed}s, sends should overlap"
+    assert report.failed == {"bitchat_peer3": "unreachable"}, "Only the failing peer should be reported"
+    assert len(report.delivered) == 5
+
+@pytest.mark.asyncio
+async def test_broadcast_concurrency_and_timeout():
+    """Test the semaphore bounds in-flight sends and slow peers time out."""
+    in_flight = []
+    peak = []
+
+    async def fake_write_frame(frame, peer_id, response=True):
+        in_flight.append(peer_id)
+        peak.append(len(in_flight))
+        try:
+            await asyncio.sleep(1.0 if peer_id == "bitchat_slow" else 0.01)
+        finally:
+            in_flight.remove(peer_id)
+
+    peers = ["bitchat_slow"] + [f"bitchat_peer{i}" for i in range(5)]
+    with patch("bitchat.ble_service.write_frame", new=fake_write_frame), \
+         patch("bitchat.ble_service.build_frame", return_value=b"frame"):
+        report = await broadcast_packet(None, peers, concurrency=2, timeout=0.1)
+    assert max(peak) <= 2, "No more than `concurrency` sends should run at once"
+    assert list(report.failed) == ["bitchat_slow"], "Slow peer should time out"
+    assert "Timed out" in report.failed["bitchat_slow"]
+
+@pytest.mark.asyncio
+async def test_broadcast_timeout_includes_queueing():
+    """Test a peer whose frame is stuck behind an earlier write still times out within the broadcast timeout."""
+    async def fake_write_frame(frame, peer_id, response=True):
+        await asyncio.sleep(0.5 if peer_id == "bitchat_busy" else 0.01)
+
+    with patch("bitchat.ble_service.write_frame", new=fake_write_frame), \
+         patch("bitchat.ble_service.build_frame", return_value=b"frame"):
+        blocker = asyncio.ensure_future(ble_service.outbound.send(b"earlier", "bitchat_busy"))
+        await asyncio.sleep(0.01)  # The earlier write now occupies the peer
+        report = await broadcast_packet(None, ["bitchat_busy", "bitchat_peer1"], timeout=0.1)
+        await blocker
+    assert report.elapsed < 0.3, f"Broadcast took {report.elapsed}s, queueing should count against the timeout"
+    assert list(report.failed) == ["bitchat_busy"] and "Timed out" in report.failed["bitchat_busy"]
+
+@pytest.mark.asyncio
+async def test_broadcast_signs_and_encodes_once():
+    """Test a broadcast builds one frame, writes the same bytes to every peer and leaves the packet alone."""
+    from bitchat.keychain import store_key
+    message = make_broadcast_message()
+    packet = BitchatPacket(
+        version=1,
+        type="broadcast_message",
+        sender_id=b"bitchat_alice".ljust(16, b"\x00"),
+        recipient_id=b"\x00" * 16,
+        timestamp=message.timestamp,
+        payload=encode_message(message),
+        signature=b"\x00" * 64,
+        ttl=100
+    )
+    store_key(b"\x01" * 32, f"peer:{packet.sender_id.decode()}")
+    written = []
+
+    async def fake_write_frame(frame, peer_id, response=True):
+        written.append(frame)
+
+    peers = [f"bitchat_peer{i}" for i in range(5)]
+    with patch("bitchat.ble_service.generate_signature", wraps=generate_signature) as sign, \
+         patch("bitchat.ble_service.write_frame", new=fake_write_frame):
+        report = await broadcast_packet(packet, peers)
+    assert sign.call_count == 1, "Packet should be signed once per broadcast"
+    assert len(written) == 5 and len(set(written)) == 1, "Every peer should get the same frame"
+    assert packet.signature == b"\x00" * 64, "build_frame should not mutate the packet"
+    assert written[0] == build_frame(packet)
+    assert report.delivered == peers
+
+class ChunkClient:
+    """Client recording GATT writes, with a configurable unconfirmed write size."""
+
+    def __init__(self, unconfirmed_size=20, properties=("write", "write-without-response")):
+        self.writes = []
+        char = type("Char", (), {"max_write_without_response_size": unconfirmed_size, "properties": list(properties)})()
+        self.services = type("Services", (), {"get_characteristic": lambda _, uuid: char})()
+
+    async def write_gatt_char(self, char_uuid, data, response=None):
+        self.writes.append((bytes(data), response))
+
+@pytest.mark.asyncio
+async def test_write_frame_splits_to_mtu():
+    """Test unconfirmed writes fit the MTU with periodic confirmed writes, and confirmed writes are long writes."""
+    frame = bytes(range(256)) * 4
+    client = ChunkClient(unconfirmed_size=100)
+    with patch("bitchat.ble_service.connection_pool.acquire", new=AsyncMock(return_value=client)):
+        await write_frame(frame, "bitchat_peer", response=False)
+    assert b"".join(data for data, _ in client.writes) == frame, "Chunks should reassemble to the frame"
+    assert all(len(data) <= 100 for data, _ in client.writes), "Unconfirmed chunks must fit the MTU"
+    confirmed = [i for i, (_, response) in enumerate(client.writes) if response]
+    assert confirmed == [WRITE_WINDOW - 1], f"One confirmed write per window expected, got {confirmed}"
+
+    client = ChunkClient(unconfirmed_size=100)
+    with patch("bitchat.ble_service.connection_pool.acquire", new=AsyncMock(return_value=client)):
+        await write_frame(frame, "bitchat_peer")
+    assert [(len(data), response) for data, response in client.writes] == [(512, True), (512, True)], \
+        "Confirmed writes should use long writes up to 512 bytes"
+
+    client = ChunkClient(properties=("write",))
+    with patch("bitchat.ble_service.connection_pool.acquire", new=AsyncMock(return_value=client)):
+        await write_frame(frame[:300], "bitchat_peer", response=False)
+    assert all(response for _, response in client.writes), "Characteristics without unconfirmed writes fall back"
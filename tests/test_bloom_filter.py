@@ -1,5 +1,6 @@
+import struct
 import pytest
-from bitchat.utils import OptimizedBloomFilter
+from bitchat.utils import OptimizedBloomFilter, RotatingBloomFilter, ScalableBloomFilter, CuckooFilter
 
 def test_basic_bloom_filter():
     """Test insertion and lookup in OptimizedBloomFilter."""
@@ -66,4 +67,178 @@ def test_adaptive_bloom_filter():
     assert bf_large.memory_size_bytes > 2048, f"Large filter memory size {bf_large.memory_size_bytes} is not > 2048 bytes"
     for i in range(1000):
         bf_large.insert(f"item{i}")
-    assert all(bf_large.contains(f"item{i}") for i in range(1000))
\ No newline at end of file
+    assert all(bf_large.contains(f"item{i}") for i in range(1000))
+
+def test_bytes_keys():
+    """Test that bytes and str keys are interchangeable for UTF-8 text."""
+    bf = OptimizedBloomFilter(100, 0.01)
+    bf.insert(b"\x00\x01binary-id")
+    bf.insert("message1")
+    assert bf.contains(b"\x00\x01binary-id"), "Binary key should be found"
+    assert bf.contains(b"message1"), "str key should match its UTF-8 bytes"
+    assert bf.count == 2, "count should track insertions"
+
+def test_batch_operations():
+    """Test insert_many/contains_many agree with single-item calls."""
+    bf = OptimizedBloomFilter(2000, 0.01)
+    items = [f"item{i}".encode() for i in range(1000)]
+    bf.insert_many(items)
+    assert all(bf.contains_many(items)), "All batch-inserted items should be found"
+    assert all(bf.contains(item) for item in items), "Single lookups should see batch inserts"
+
+    probes = [f"probe{i}".encode() for i in range(1000)]
+    assert bf.contains_many(probes) == [bf.contains(p) for p in probes], "Batch and single lookups should agree"
+    assert bf.contains_many([]) == [], "Empty batch should return empty list"
+
+def test_numpy_path_matches_python_path():
+    """Test the vectorized NumPy path sets the same bits as the pure-Python path."""
+    pytest.importorskip("numpy")
+    items = [f"item{i}".encode() for i in range(500)]
+    vectorized = OptimizedBloomFilter(1000, 0.01)
+    vectorized.insert_many(items)
+    scalar = OptimizedBloomFilter(1000, 0.01)
+    for item in items:
+        scalar.insert(item)
+    assert vectorized.bits == scalar.bits, "Bitmaps should be identical"
+
+def test_rotating_filter_keeps_recent_history():
+    """Test that rotation ages out old items while keeping the recent window."""
+    bf = RotatingBloomFilter(100, 0.01, generations=3)
+    for i in range(100):
+        bf.insert(f"old{i}")
+    for i in range(100):
+        bf.insert(f"new{i}")
+    assert bf.rotations >= 1, "Filling past a generation should rotate"
+    assert all(bf.contains(f"new{i}") for i in range(100)), "Recent items should survive rotation"
+    for i in range(300):
+        bf.insert(f"newer{i}")
+    still_seen = sum(bf.contains(f"old{i}") for i in range(100))
+    assert still_seen <= 5, f"Old items should age out, {still_seen} still reported"
+    assert bf.estimated_false_positive_rate < 0.01, "Estimated FPR should stay within target"
+    assert bf.memory_size_bytes == sum(g.memory_size_bytes for g in bf.generations)
+
+def test_rotating_filter_time_based_rotation():
+    """Test rotation driven by rotation_interval using an injected clock."""
+    now = [0.0]
+    bf = RotatingBloomFilter(100, 0.01, generations=2, rotation_interval=10.0, clock=lambda: now[0])
+    bf.insert(b"first")
+    now[0] = 11.0
+    assert bf.contains(b"first"), "Item should live in the previous generation after one rotation"
+    now[0] = 22.0
+    assert not bf.contains(b"first"), "Item should expire after two rotations"
+    assert bf.rotations == 2, "Each interval should trigger one rotation"
+
+def test_adaptive_rotating_filter():
+    """Test OptimizedBloomFilter.adaptive builds a rotating filter on request."""
+    bf = OptimizedBloomFilter.adaptive(20, generations=4)
+    assert isinstance(bf, RotatingBloomFilter), "generations > 1 should return a RotatingBloomFilter"
+    items = [f"item{i}".encode() for i in range(500)]
+    bf.insert_many(items)
+    assert all(bf.contains_many(items[-200:])), "The last expected_items inserts should be remembered"
+    with pytest.raises(ValueError, match="generations must be at least 2"):
+        RotatingBloomFilter(100, 0.01, generations=1)
+
+def test_cuckoo_filter_insert_and_remove():
+    """Test CuckooFilter membership and deletion of in-flight ids."""
+    cf = CuckooFilter(1000)
+    items = [f"msg{i}" for i in range(500)]
+    cf.insert_many(items)
+    assert all(cf.contains_many(items)), "All inserted items should be found"
+    assert cf.count == 500, "count should track insertions"
+
+    for item in items[:250]:
+        assert cf.remove(item), f"{item} should be removable"
+    assert not any(cf.contains(item) for item in items[:250]), "Removed items should be gone"
+    assert all(cf.contains(item) for item in items[250:]), "Remaining items should still be found"
+    assert cf.load_factor == 250 / (cf.num_buckets * cf.bucket_size), "load_factor should follow count"
+
+    cf.reset()
+    assert cf.count == 0 and not cf.contains(items[300]), "reset should empty the filter"
+
+def test_cuckoo_filter_false_positive_rate():
+    """Test CuckooFilter false positive rate with 1000 items and 10000 probes."""
+    cf = CuckooFilter(1000)
+    cf.insert_many(f"item{i}".encode() for i in range(1000))
+    false_positives = sum(cf.contains_many(f"absent{i}".encode() for i in range(10000)))
+    assert false_positives / 10000 < 0.005, f"False positive rate {false_positives / 10000} exceeds 0.005"
+    assert cf.memory_size_bytes == cf.num_buckets * cf.bucket_size * 2, "Two bytes per fingerprint slot"
+    assert cf.estimated_false_positive_rate < 0.005
+
+def test_cuckoo_filter_full():
+    """Test CuckooFilter reports when it can no longer accept items."""
+    cf = CuckooFilter(8, bucket_size=2, max_kicks=10)
+    with pytest.raises(RuntimeError, match="Cuckoo filter is full"):
+        for i in range(1000):
+            cf.insert(f"item{i}")
+
+def test_encode_decode_roundtrip():
+    """Test a Bloom filter survives encoding to bytes for a peer."""
+    bf = OptimizedBloomFilter(200, 0.01)
+    ids = [f"msg{i}".encode() for i in range(150)]
+    bf.insert_many(ids)
+    data = bf.encode()
+    assert len(data) < 300, f"Encoded filter {len(data)} bytes should be a few hundred bytes"
+    decoded = OptimizedBloomFilter.decode(data)
+    assert decoded is not None, "Valid data should decode"
+    assert decoded.bits == bf.bits and decoded.count == bf.count, "Decoded filter should match"
+    assert all(decoded.contains_many(ids)), "Decoded filter should contain all ids"
+    assert OptimizedBloomFilter.decode(data[:-1]) is None, "Truncated data should be rejected"
+    assert OptimizedBloomFilter.decode(b"\x02" + data[1:]) is None, "Unknown version should be rejected"
+    assert OptimizedBloomFilter.decode(b"") is None, "Empty data should be rejected"
+
+def test_decode_rejects_hostile_headers():
+    """Test headers promising a bitmap larger than the data are rejected without allocating it."""
+    for capacity, rate in [(0xFFFFFFFF, 1e-300), (0, 0.01), (100, 0.0), (100, 1.0), (100, float("nan"))]:
+        data = struct.pack('!B I d I', 1, capacity, rate, 0)
+        assert OptimizedBloomFilter.decode(data) is None, f"Header ({capacity}, {rate}) should be rejected"
+
+def test_merge_and_missing():
+    """Test merging peer filters and finding ids a peer lacks."""
+    mine = OptimizedBloomFilter(200, 0.01)
+    theirs = OptimizedBloomFilter(200, 0.01)
+    my_ids = [f"msg{i}".encode() for i in range(100)]
+    their_ids = [f"msg{i}".encode() for i in range(50, 150)]
+    mine.insert_many(my_ids)
+    theirs.insert_many(their_ids)
+
+    missing = OptimizedBloomFilter.decode(theirs.encode()).missing(my_ids)
+    assert set(missing) <= set(my_ids[:50]), "Only ids the peer never saw should be reported"
+    assert len(missing) >= 45, f"Most unseen ids should be reported, got {len(missing)}"
+
+    union = mine.union(theirs)
+    assert all(union.contains_many(my_ids + their_ids)), "Union should contain both sets"
+    mine.merge(theirs)
+    assert mine.bits == union.bits, "merge should match union"
+    with pytest.raises(ValueError, match="same size and hash count"):
+        mine.merge(OptimizedBloomFilter(1000, 0.01))
+
+def test_scalable_filter_grows_with_traffic():
+    """Test ScalableBloomFilter adds slices and keeps its FPR bound past the initial guess."""
+    bf = ScalableBloomFilter(100, 0.01)
+    items = [f"item{i}".encode() for i in range(2000)]
+    bf.insert_many(items[:1000])
+    for item in items[1000:]:
+        bf.insert(item)
+    assert len(bf.slices) > 1, "Exceeding the initial capacity should add slices"
+    assert bf.capacity >= 2000, "Allocated capacity should cover all inserts"
+    assert all(bf.contains_many(items)), "All inserted items should be found"
+    assert bf.estimated_false_positive_rate < 0.01, f"Effective FPR {bf.estimated_false_positive_rate} exceeds 0.01"
+    false_positives = sum(bf.contains(f"absent{i}") for i in range(2000))
+    assert false_positives / 2000 < 0.02, f"False positive rate {false_positives / 2000} exceeds 0.02"
+
+def test_scalable_filter_sizes_from_insert_rate():
+    """Test new slices are sized from the observed insertion rate."""
+    now = [0.0]
+    bf = ScalableBloomFilter(100, 0.01, rate_horizon=10.0, clock=lambda: now[0])
+    for second in range(1, 3):
+        bf.insert_many(f"s{second}-{i}".encode() for i in range(50))
+        now[0] = float(second)
+    bf.insert(b"tick")
+    assert bf.insert_rate > 0, "Insert rate should be tracked"
+    bf.insert_many(f"burst{i}".encode() for i in range(100))
+    assert bf.slices[1].capacity >= int(bf.insert_rate * 10.0), "Slice should hold rate_horizon seconds of traffic"
+
+def test_adaptive_without_network_size():
+    """Test adaptive() returns a self-sizing filter when network size is unknown."""
+    bf = OptimizedBloomFilter.adaptive()
+    assert isinstance(bf, ScalableBloomFilter), "Unknown network size should return a ScalableBloomFilter"
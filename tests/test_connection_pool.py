@@ -0,0 +1,144 @@
+import asyncio
+import pytest
+from bitchat.ble_service import ConnectionPool
+
+class FakeClient:
+    """Stand-in for BleakClient that records connects and disconnects."""
+
+    def __init__(self, address):
+        self.address = address
+        self.is_connected = False
+        self.connects = 0
+
+    async def connect(self):
+        await asyncio.sleep(0.01)  # Give concurrent acquires a chance to interleave
+        self.is_connected = True
+        self.connects += 1
+
+    async def disconnect(self):
+        self.is_connected = False
+
+def make_resolver(address, calls):
+    async def resolve():
+        calls.append(address)
+        return address
+    return resolve
+
+@pytest.mark.asyncio
+async def test_pool_reuses_connections():
+    """Test repeated sends to one peer reuse a single connection."""
+    pool = ConnectionPool(client_factory=FakeClient)
+    calls = []
+    first = await pool.acquire("bitchat_peer1", make_resolver("AA:01", calls))
+    await pool.release("bitchat_peer1")
+    for _ in range(2):
+        client = await pool.acquire("bitchat_peer1", make_resolver("AA:01", calls))
+        await pool.release("bitchat_peer1")
+        assert client is first, "Pooled client should be reused"
+    assert calls == ["AA:01"], "Address should be resolved only on the first connect"
+    assert first.connects == 1, "Client should connect once"
+    assert pool.hits == 2 and pool.misses == 1
+    assert pool.hit_rate == pytest.approx(2 / 3)
+    assert len(pool.connect_latencies) == 1
+
+@pytest.mark.asyncio
+async def test_pool_reconnects_lazily():
+    """Test a dropped connection is replaced on the next acquire."""
+    pool = ConnectionPool(client_factory=FakeClient)
+    calls = []
+    first = await pool.acquire("bitchat_peer1", make_resolver("AA:01", calls))
+    first.is_connected = False  # Link lost
+    second = await pool.acquire("bitchat_peer1", make_resolver("AA:01", calls))
+    assert second is not first and second.is_connected, "A fresh client should be connected"
+    assert len(pool) == 1
+
+@pytest.mark.asyncio
+async def test_pool_caps_and_evicts():
+    """Test the connection cap evicts the least recently used peer and idle ones expire."""
+    now = [0.0]
+    pool = ConnectionPool(max_connections=2, idle_timeout=10.0, client_factory=FakeClient, clock=lambda: now[0])
+    calls = []
+    for peer_id in ("bitchat_a", "bitchat_b", "bitchat_a", "bitchat_c"):
+        client = await pool.acquire(peer_id, make_resolver("AA:" + peer_id[-2:], calls))
+        await pool.release(peer_id)
+        if peer_id == "bitchat_a":
+            a = client
+        elif peer_id == "bitchat_b":
+            b = client
+    assert len(pool) == 2, "Pool should respect max_connections"
+    assert not b.is_connected and a.is_connected, "Least recently used connection should be closed"
+
+    now[0] = 20.0
+    await pool.evict_idle()
+    assert len(pool) == 0 and not a.is_connected, "Idle connections should be closed"
+
+    with pytest.raises(ValueError, match="max_connections must be positive"):
+        ConnectionPool(max_connections=0)
+
+@pytest.mark.asyncio
+async def test_pool_closes_idle_connections_without_acquire():
+    """Test the background sweep closes idle connections with no further acquire() calls and stops on close()."""
+    now = [0.0]
+    pool = ConnectionPool(idle_timeout=10.0, client_factory=FakeClient, clock=lambda: now[0], sweep_interval=0.01)
+    client = await pool.acquire("bitchat_a", make_resolver("AA:0A", []))
+    await pool.release("bitchat_a")
+    pool.pin("bitchat_b")
+    pinned = await pool.acquire("bitchat_b", make_resolver("AA:0B", []))
+    await pool.release("bitchat_b")
+    await asyncio.sleep(0.03)
+    assert client.is_connected, "Connections within the idle timeout should stay open"
+    now[0] = 20.0
+    await asyncio.sleep(0.03)
+    assert not client.is_connected and len(pool) == 1, "The idle connection should be closed by the sweep"
+    assert pinned.is_connected, "Pinned connections are never swept"
+    sweeper = pool._sweeper
+    await pool.close()
+    await asyncio.sleep(0)
+    assert sweeper.cancelled() and len(pool) == 0, "close() should stop the sweep"
+    with pytest.raises(ValueError, match="sweep_interval"):
+        ConnectionPool(sweep_interval=0)
+
+@pytest.mark.asyncio
+async def test_pool_cap_holds_under_concurrent_acquires():
+    """Test concurrent acquires for different peers never open more than max_connections."""
+    pool = ConnectionPool(max_connections=2, client_factory=FakeClient)
+    peak = []
+
+    async def send(peer_id):
+        await pool.acquire(peer_id, make_resolver(peer_id, []))
+        peak.append(sum(c.is_connected for c in pool._clients.values()) + pool._connecting)
+        await asyncio.sleep(0.01)  # Write while holding the connection
+        await pool.release(peer_id)
+
+    await asyncio.gather(*(send(f"bitchat_p{i}") for i in range(5)))
+    assert len(pool) == 2 and max(peak) <= 2, f"The cap should hold, saw {max(peak)} connections"
+    assert pool.misses == 5
+    await pool.close()
+
+@pytest.mark.asyncio
+async def test_pool_never_evicts_connections_in_use():
+    """Test a connection being written to is not chosen as the LRU victim, and released ones are."""
+    pool = ConnectionPool(max_connections=1, client_factory=FakeClient)
+    a = await pool.acquire("bitchat_a", make_resolver("AA:0A", []))
+    waiting = asyncio.ensure_future(pool.acquire("bitchat_b", make_resolver("AA:0B", [])))
+    await asyncio.sleep(0.05)
+    assert a.is_connected and not waiting.done(), "The busy connection should stay open while b waits"
+    await pool.release("bitchat_a")
+    b = await asyncio.wait_for(waiting, 1.0)
+    assert not a.is_connected and b.is_connected and len(pool) == 1, "a should be evicted once released"
+    await pool.release("bitchat_b")
+    await pool.close()
+    assert pool._locks == {} and pool._in_use == {}, "Per-peer state should not outlive the connections"
+
+@pytest.mark.asyncio
+async def test_pool_forgets_locks_of_failed_connects():
+    """Test a peer whose connect fails leaves no lock behind."""
+    class BrokenClient(FakeClient):
+        async def connect(self):
+            raise ValueError("unreachable")
+
+    pool = ConnectionPool(client_factory=BrokenClient)
+    for i in range(3):
+        with pytest.raises(ValueError):
+            await pool.acquire(f"bitchat_gone{i}", make_resolver("AA:00", []))
+    assert pool._locks == {} and pool._connecting == 0, "Failed connects should release their lock and slot"
@@ -1,11 +1,17 @@
+import asyncio
+import random
 import pytest
 from uuid import uuid4
-from bitchat.delivery_tracker import DeliveryTracker, DeliveryStatus, DeliveryAck
+from bitchat.delivery_tracker import DeliveryTracker, DeliveryStatus, DeliveryAck, RetryPolicy
+from bitchat import message
+from bitchat.message import CumulativeAck
+from bitchat.scheduler import AckAggregator
+from bitchat.simulator import VirtualTimeEventLoop
 
 @pytest.fixture
 def delivery_tracker():
-    """Create a DeliveryTracker instance for testing."""
-    return DeliveryTracker()
+    """Create a DeliveryTracker instance for testing, keeping full ACK detail."""
+    return DeliveryTracker(ack_detail=True)
 
 def test_track_message(delivery_tracker):
     """Test tracking a message’s status (PENDING, DELIVERED)."""
@@ -99,4 +105,162 @@ def test_process_ack_updates_status(delivery_tracker):
     with pytest.raises(ValueError, match="ack must be a DeliveryAck object"):
         delivery_tracker.process_ack("invalid")
     with pytest.raises(ValueError, match="ack.message_id cannot be empty"):
-        delivery_tracker.process_ack(DeliveryAck(str(uuid4()), "", recipient_id, "alice", 1))
\ No newline at end of file
+        delivery_tracker.process_ack(DeliveryAck(str(uuid4()), "", recipient_id, "alice", 1))
+def run_virtual(coro):
+    loop = VirtualTimeEventLoop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+def test_retry_backoff_then_failure():
+    """Test an unacknowledged message is re-sent with growing waits and then marked FAILED."""
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        sends = []
+        tracker = DeliveryTracker(resend=lambda message_id, attempt: sends.append((attempt, loop.time())),
+                                  policies={"private_message": RetryPolicy(max_attempts=4, base_delay=1.0,
+                                                                           max_delay=3.0, jitter=0.0)},
+                                  rng=random.Random(1))
+        tracker.track_outgoing("m1")
+        await asyncio.sleep(20)
+        return tracker, sends
+
+    tracker, sends = run_virtual(scenario())
+    assert sends == [(2, 1.0), (3, 3.0), (4, 6.0)], "Waits of 1, 2 and then 3 s (capped) between sends"
+    assert tracker.get_status("m1") == DeliveryStatus.FAILED, "The message should fail after its last wait (9 s)"
+    assert tracker.retries.exhausted == 1 and len(tracker.retries) == 0
+
+def test_ack_cancels_retries_at_scale():
+    """Test ACKs stop retries and thousands of outstanding messages are handled without scanning."""
+    async def scenario():
+        resent = []
+
+        async def resend(message_id, attempt):
+            resent.append(message_id)
+
+        tracker = DeliveryTracker(resend=resend, policies={
+            "private_message": RetryPolicy(max_attempts=2, base_delay=5.0),
+            "channel_message": RetryPolicy(max_attempts=1, base_delay=5.0)}, max_messages=20000)
+        ids = [f"m{i}" for i in range(10000)]
+        for message_id in ids:
+            tracker.track_outgoing(message_id)
+        tracker.track_outgoing("c1", "channel_message")
+        for message_id in ids[:9990]:
+            tracker.process_ack(DeliveryAck("a", message_id, "r", "bob", 1))
+        tracker.track_message(ids[9990], DeliveryStatus.DELIVERED)
+        assert len(tracker.retries) == 10 and len(tracker.retries._heap) < 200, "Cancelled entries are compacted"
+        await asyncio.sleep(60)
+        return tracker, resent
+
+    tracker, resent = run_virtual(scenario())
+    assert sorted(resent) == sorted(f"m{i}" for i in range(9991, 10000)), "Only unacknowledged messages are re-sent"
+    assert tracker.get_status("c1") == DeliveryStatus.FAILED, "One-attempt policies fail without re-sending"
+    assert tracker.get_status("m0") == DeliveryStatus.DELIVERED and tracker.get_status("m9999") == DeliveryStatus.FAILED
+
+@pytest.mark.asyncio
+async def test_wait_resolves_on_ack_and_times_out():
+    """Test wait() wakes on the ACK, returns settled statuses at once and cleans up after timeouts."""
+    tracker = DeliveryTracker()
+    tracker.track_message("m1", DeliveryStatus.PENDING)
+    waiter = asyncio.ensure_future(tracker.wait("m1", timeout=5.0))
+    await asyncio.sleep(0)
+    assert not waiter.done()
+    tracker.process_ack(DeliveryAck("a", "m1", "r", "bob", 1))
+    assert await waiter == DeliveryStatus.DELIVERED
+    assert await tracker.wait("m1") == DeliveryStatus.DELIVERED, "Settled messages return at once"
+
+    tracker.track_message("m2", DeliveryStatus.PENDING)
+    assert await tracker.wait("m2", timeout=0.01) == DeliveryStatus.PENDING, "Timeouts return the current status"
+    cancelled = asyncio.ensure_future(tracker.wait("m2"))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    await asyncio.gather(cancelled, return_exceptions=True)
+    assert tracker._waiters == {}, "Timed out and cancelled waiters should be removed"
+    with pytest.raises(ValueError, match="message_id cannot be empty"):
+        await tracker.wait("")
+
+@pytest.mark.asyncio
+async def test_status_change_stream():
+    """Test subscribers see every status transition in order, including retry failures."""
+    tracker = DeliveryTracker(policies={"private_message": RetryPolicy(max_attempts=1, base_delay=0.01)})
+    changes = tracker.changes()
+    first = asyncio.ensure_future(changes.__anext__())
+    await asyncio.sleep(0)
+    tracker.track_outgoing("m1")
+    tracker.track_outgoing("m2")
+    tracker.process_ack(DeliveryAck("a", "m1", "r", "bob", 1))
+    tracker.process_ack(DeliveryAck("b", "m1", "r", "carol", 2))  # Same status: no new change
+    assert await tracker.wait("m2", timeout=1.0) == DeliveryStatus.FAILED
+    seen = [await first] + [await changes.__anext__() for _ in range(3)]
+    assert [(c.message_id, c.status, c.previous) for c in seen] == [
+        ("m1", DeliveryStatus.PENDING, None),
+        ("m2", DeliveryStatus.PENDING, None),
+        ("m1", DeliveryStatus.DELIVERED, DeliveryStatus.PENDING),
+        ("m2", DeliveryStatus.FAILED, DeliveryStatus.PENDING),
+    ]
+    await changes.aclose()
+    assert not tracker._subscribers, "Closing the stream should unsubscribe"
+
+def test_tracker_memory_is_bounded():
+    """Test settled messages are evicted least recently updated first, pending ones are kept, and counts stay exact."""
+    tracker = DeliveryTracker(max_messages=3)
+    tracker.track_message("p1", DeliveryStatus.PENDING)
+    for message_id in ("d1", "d2", "d3"):
+        tracker.process_ack(DeliveryAck("a", message_id, "r", "bob", 2))
+    assert "d1" not in tracker.statuses and tracker.evicted == 1, "The oldest settled message should go first"
+    tracker.process_ack(DeliveryAck("b", "d2", "r", "carol", 1))  # Touch d2
+    tracker.track_message("f1", DeliveryStatus.FAILED)
+    assert set(tracker.statuses) == {"p1", "d2", "f1"}, "Pending messages are never evicted"
+    assert tracker.count(DeliveryStatus.PENDING) == 1 and tracker.count(DeliveryStatus.DELIVERED) == 1
+    assert tracker.count(DeliveryStatus.FAILED) == 1
+    assert tracker.get_ack_summary("d3") is None, "ACK data goes with the evicted message"
+    with pytest.raises(ValueError, match="max_messages"):
+        DeliveryTracker(max_messages=0)
+
+def test_ack_summary_without_detail():
+    """Test ACKs are reduced to a count and the minimum hop count unless detail is requested."""
+    tracker = DeliveryTracker()
+    for hops in (3, 1, 2):
+        tracker.process_ack(DeliveryAck("a", "m1", "r", "bob", hops))
+    summary = tracker.get_ack_summary("m1")
+    assert (summary.count, summary.min_hops) == (3, 1)
+    assert tracker.get_acks("m1") == [] and tracker.acks == {}, "No ACK objects should be kept"
+
+def test_cumulative_ack_settles_every_listed_message():
+    """Test one cumulative ack marks all covered messages delivered, stops their retries and records the hops."""
+    async def scenario():
+        tracker = DeliveryTracker(resend=lambda message_id, attempt: None, ack_detail=True)
+        for message_id in ("m1", "m2", "m3"):
+            tracker.track_outgoing(message_id)
+        ack = CumulativeAck(message_ids=["m1", "m3"], recipient_id="bitchat_alice", nickname="bob", hop_count=2)
+        tracker.process_ack(ack)
+        return tracker, ack
+
+    tracker, ack = run_virtual(scenario())
+    assert tracker.get_status("m1") == DeliveryStatus.DELIVERED and tracker.get_status("m3") == DeliveryStatus.DELIVERED
+    assert tracker.get_status("m2") == DeliveryStatus.PENDING and len(tracker.retries) == 1, "Only m2 keeps retrying"
+    assert tracker.get_ack_summary("m3").min_hops == 2 and tracker.get_acks("m1") == [ack]
+    with pytest.raises(ValueError, match="message_ids"):
+        tracker.process_ack(CumulativeAck(message_ids=[], recipient_id="r", nickname="bob", hop_count=1))
+
+def test_aggregated_acks_reach_the_tracker():
+    """Test single and cumulative acks from the aggregator, decoded from the wire, are accepted by process_ack."""
+    async def scenario():
+        tracker = DeliveryTracker()
+        sent = []
+
+        async def send(ack):
+            sent.append(type(ack).decode(ack.encode()))
+
+        aggregator = AckAggregator(send, window=0.01)
+        await aggregator.send(message.DeliveryAck("m1", "bitchat_alice", "bob", 1))
+        await asyncio.gather(*(aggregator.send(message.DeliveryAck(i, "bitchat_alice", "bob", 2))
+                               for i in ("m2", "m3")))
+        for ack in sent:
+            tracker.process_ack(ack)
+        return tracker, sent
+
+    tracker, sent = run_virtual(scenario())
+    assert [type(a) for a in sent] == [message.DeliveryAck, CumulativeAck], "A lone ack keeps the single format"
+    assert all(tracker.get_status(i) == DeliveryStatus.DELIVERED for i in ("m1", "m2", "m3"))
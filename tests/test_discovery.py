@@ -0,0 +1,79 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from bitchat.discovery import PeerTable, PeerScanner
+
+@pytest.fixture
+def clock():
+    """Return a controllable monotonic clock."""
+    now = [0.0]
+    tick = lambda: now[0]
+    tick.now = now
+    return tick
+
+def test_update_and_lookup(clock):
+    """Test peers are recorded, refreshed and looked up by id."""
+    table = PeerTable(expiry=30.0, clock=clock)
+    table.update("bitchat_a", "AA:0A", rssi=-70)
+    table.update("bitchat_b", "AA:0B", rssi=-40)
+    assert table.get("bitchat_a").address == "AA:0A", "Lookup should return the recorded address"
+    assert table.peers() == ["bitchat_b", "bitchat_a"], "Peers should be ordered by signal strength"
+
+    clock.now[0] = 10.0
+    table.update("bitchat_a", "AA:0A", rssi=-50)
+    assert table.get("bitchat_a").last_seen == 10.0, "Sighting should refresh last_seen"
+    assert "bitchat_c" not in table
+
+def test_expiry(clock):
+    """Test stale peers are hidden from lookups and removed by expire()."""
+    table = PeerTable(expiry=30.0, clock=clock)
+    table.update("bitchat_a", "AA:0A")
+    clock.now[0] = 20.0
+    table.update("bitchat_b", "AA:0B")
+    clock.now[0] = 40.0
+    assert table.get("bitchat_a") is None, "Expired peer should not resolve"
+    assert table.peers() == ["bitchat_b"]
+    assert table.expire() == ["bitchat_a"], "expire() should report removed peers"
+    assert len(table) == 1
+
+@pytest.mark.asyncio
+async def test_change_feed(clock):
+    """Test subscribers see added, updated and removed events."""
+    table = PeerTable(expiry=30.0, clock=clock)
+    feed = table.changes()
+    next_event = asyncio.ensure_future(feed.__anext__())
+    await asyncio.sleep(0)  # Let the subscriber register
+
+    table.update("bitchat_a", "AA:0A", rssi=-60)
+    event = await asyncio.wait_for(next_event, 1.0)
+    assert (event.kind, event.peer.peer_id) == ("added", "bitchat_a")
+
+    table.update("bitchat_a", "AA:0A", rssi=-55)  # RSSI only: no event
+    table.update("bitchat_a", "AA:FF")
+    event = await asyncio.wait_for(feed.__anext__(), 1.0)
+    assert (event.kind, event.peer.address) == ("updated", "AA:FF")
+
+    table.remove("bitchat_a")
+    event = await asyncio.wait_for(feed.__anext__(), 1.0)
+    assert event.kind == "removed"
+
+    table.update("bitchat_b", "AA:0B")
+    await asyncio.wait_for(feed.__anext__(), 1.0)
+    clock.now[0] = 40.0  # Expired, but not yet swept by expire()
+    table.update("bitchat_b", "AA:0B")
+    event = await asyncio.wait_for(feed.__anext__(), 1.0)
+    assert (event.kind, event.peer.peer_id) == ("added", "bitchat_b"), "A peer back after expiry is added again"
+    await feed.aclose()
+
+def test_scanner_records_bitchat_peers(clock):
+    """Test the detection callback records only bitchat advertisements."""
+    table = PeerTable(clock=clock)
+    scanner = PeerScanner(table, ["0000183f-0000-1000-8000-00805f9b34fb"])
+    device = SimpleNamespace(name=None, address="AA:0A")
+    scanner._on_detection(device, SimpleNamespace(local_name="bitchat_a", rssi=-42, service_uuids=["183f"]))
+    scanner._on_detection(SimpleNamespace(name="headphones", address="AA:0B"),
+                          SimpleNamespace(local_name=None, rssi=-30, service_uuids=[]))
+    assert table.peers() == ["bitchat_a"], "Only bitchat peers should be recorded"
+    assert table.get("bitchat_a").rssi == -42
+    assert table.get("bitchat_a").services == ["183f"]
+    assert not scanner.running
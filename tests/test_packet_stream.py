@@ -0,0 +1,130 @@
+import asyncio
+import time
+import pytest
+from bitchat.ble_service import ConnectionPool, PacketStream, build_frame
+from bitchat.discovery import PeerTable
+from bitchat.keychain import store_key
+from bitchat.message import BitchatPacket
+
+class FakeClient:
+    """Stand-in for BleakClient whose notifications are triggered by the test."""
+
+    def __init__(self, address):
+        self.address = address
+        self.is_connected = False
+        self.callback = None
+        self.stops = 0
+
+    async def connect(self):
+        self.is_connected = True
+
+    async def disconnect(self):
+        self.is_connected = False
+
+    async def start_notify(self, char_uuid, callback):
+        self.callback = callback
+
+    async def stop_notify(self, char_uuid):
+        self.callback = None
+        self.stops += 1
+
+    def notify(self, data):
+        self.callback(None, bytearray(data))
+
+def make_frame(n):
+    sender_id = b"bitchat_stream".ljust(16, b"\x00")
+    store_key(b"\x02" * 32, f"peer:{sender_id.decode()}")
+    return build_frame(BitchatPacket(
+        version=1,
+        type="broadcast_message",
+        sender_id=sender_id,
+        recipient_id=b"\x00" * 16,
+        timestamp=time.time() + n,
+        payload=f"payload {n}".encode(),
+        signature=b"\x00" * 64,
+        ttl=100
+    ))
+
+async def open_stream(maxsize=8, peers=("bitchat_a", "bitchat_b")):
+    table = PeerTable()
+    for i, peer_id in enumerate(peers):
+        table.update(peer_id, f"AA:0{i}")
+    pool = ConnectionPool(client_factory=FakeClient)
+    stream = PacketStream(maxsize, pool=pool, table=table)
+    await stream.start()
+    return stream, pool
+
+@pytest.mark.asyncio
+async def test_stream_merges_all_peers():
+    """Test packets from every subscribed peer arrive on one stream, duplicates dropped."""
+    stream, pool = await open_stream()
+    a, b = pool._clients["bitchat_a"], pool._clients["bitchat_b"]
+    assert pool.pinned == {"bitchat_a", "bitchat_b"}, "Subscribed connections should be pinned"
+    first, second = make_frame(1), make_frame(2)
+    a.notify(first)
+    b.notify(second)
+    b.notify(first)  # Same packet relayed by another neighbour
+    a.notify(make_frame(3))
+    received = [await asyncio.wait_for(stream.__anext__(), 1.0) for _ in range(3)]
+    assert [p.payload for p in received] == [b"payload 1", b"payload 2", b"payload 3"], "Duplicate should be skipped"
+    await stream.close()
+    assert not pool.pinned and a.callback is None, "close() should unsubscribe and unpin"
+
+@pytest.mark.asyncio
+async def test_stream_follows_peer_table():
+    """Test peers appearing in the table are subscribed automatically."""
+    stream, pool = await open_stream(peers=())
+    await asyncio.sleep(0)  # Let the watcher subscribe to table changes
+    stream.table.update("bitchat_late", "AA:10")
+    for _ in range(5):
+        await asyncio.sleep(0)
+    assert "bitchat_late" in pool._clients and pool._clients["bitchat_late"].callback is not None
+    await stream.close()
+
+@pytest.mark.asyncio
+async def test_stream_backpressure():
+    """Test a full queue pauses notifications until the consumer drains it."""
+    stream, pool = await open_stream(maxsize=4, peers=("bitchat_a",))
+    client = pool._clients["bitchat_a"]
+    callback = client.callback
+    for n in range(6):
+        callback(None, bytearray(make_frame(10 + n)))
+    await asyncio.sleep(0)
+    assert stream.paused and stream.dropped == 2, "Overflow should pause and count dropped frames"
+    assert client.stops == 1 and client.callback is None, "Notifications should be stopped"
+
+    for _ in range(2):
+        await asyncio.wait_for(stream.__anext__(), 1.0)
+    await asyncio.sleep(0)
+    assert not stream.paused and client.callback is not None, "Draining to half should resume notifications"
+    await stream.close()
+
+@pytest.mark.asyncio
+async def test_stream_feeds_pipeline():
+    """Test feed() hands raw frames with their source peer to a receive pipeline."""
+    from bitchat.pipeline import Pipeline, Stage
+    stream, pool = await open_stream(peers=("bitchat_a",))
+    received = []
+    pipeline = Pipeline([Stage("collect", received.append)])
+    await pipeline.start()
+    feeder = asyncio.ensure_future(stream.feed(pipeline))
+    frame = make_frame(30)
+    pool._clients["bitchat_a"].notify(frame)
+    await asyncio.sleep(0.01)
+    await pipeline.join()
+    feeder.cancel()
+    await pipeline.close()
+    await stream.close()
+    assert [(f.peer_id, f.data) for f in received] == [("bitchat_a", frame)], "Raw frame and source should be fed"
+
+@pytest.mark.asyncio
+async def test_stream_unbundles_frames():
+    """Test a bundle notification yields each packet inside it."""
+    from bitchat.message import pad, unpad
+    from bitchat.protocol import encode_bundle
+    stream, pool = await open_stream(peers=("bitchat_a",))
+    bundle = encode_bundle([unpad(make_frame(40 + n)) for n in range(3)])
+    pool._clients["bitchat_a"].notify(pad(bundle, 1024))
+    received = [await asyncio.wait_for(stream.__anext__(), 1.0) for _ in range(3)]
+    assert [p.payload for p in received] == [b"payload 40", b"payload 41", b"payload 42"]
+    await stream.close()
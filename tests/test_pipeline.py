@@ -0,0 +1,150 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import pytest
+from bitchat.ble_service import build_frame
+from bitchat.keychain import store_key
+from bitchat.message import BitchatPacket, BitchatMessage
+from bitchat.pipeline import Pipeline, Stage, ReceivedFrame, receive_pipeline
+from bitchat.protocol import encode_message
+from bitchat.utils import OptimizedBloomFilter
+
+def make_frame(n):
+    sender_id = b"bitchat_pipe".ljust(16, b"\x00")
+    store_key(b"\x03" * 32, f"peer:{sender_id.decode()}")
+    message = BitchatMessage(
+        id=f"msg{n}",
+        sender="alice",
+        content=f"Hello {n}",
+        timestamp=int(datetime.now().timestamp()),
+        is_relay=False,
+        original_sender=None,
+        is_private=False,
+        recipient_nickname=None,
+        sender_peer_id="bitchat_alice",
+        mentions=[],
+        channel=None,
+        encrypted_content=None,
+        is_encrypted=False,
+        delivery_status="PENDING"
+    )
+    return build_frame(BitchatPacket(
+        version=1,
+        type="broadcast_message",
+        sender_id=sender_id,
+        recipient_id=b"\x00" * 16,
+        timestamp=time.time() + n,
+        payload=encode_message(message),
+        signature=b"\x00" * 64,
+        ttl=100
+    ))
+
+@pytest.mark.asyncio
+async def test_stage_validation():
+    """Test stage and pipeline arguments are validated."""
+    with pytest.raises(ValueError, match="workers must be positive"):
+        Stage("a", lambda x: x, workers=0)
+    with pytest.raises(ValueError, match="maxsize must be positive"):
+        Stage("a", lambda x: x, maxsize=0)
+    with pytest.raises(ValueError, match="at least one stage"):
+        Pipeline([])
+    with pytest.raises(ValueError, match="unique"):
+        Pipeline([Stage("a", lambda x: x), Stage("a", lambda x: x)])
+
+@pytest.mark.asyncio
+async def test_pipeline_chains_sync_async_and_executor_stages():
+    """Test items flow through mixed stages in order and None drops an item."""
+    out = []
+
+    async def collect(x):
+        out.append(x)
+
+    with ThreadPoolExecutor(2) as executor:
+        pipeline = Pipeline([
+            Stage("double", lambda x: x * 2, executor=executor),
+            Stage("odd_only", lambda x: x if x % 4 else None),
+            Stage("collect", collect),
+        ])
+        await pipeline.start()
+        for i in range(10):
+            await pipeline.submit(i)
+        await pipeline.join()
+        await pipeline.close()
+
+    assert out == [2, 6, 10, 14, 18], "Items should keep order through single-worker stages"
+    stats = pipeline.stats()
+    assert stats["double"]["processed"] == 10, "Every item should pass the first stage"
+    assert stats["odd_only"]["dropped"] == 5, "Filtered items should be counted as dropped"
+    assert stats["collect"]["processed"] == 5, "Only surviving items should reach the last stage"
+    assert stats["collect"]["dropped"] == 0, "The last stage consumes items instead of dropping them"
+    assert stats["collect"]["queue_depth"] == 0, "Queues should be empty after join"
+
+@pytest.mark.asyncio
+async def test_pipeline_workers_run_concurrently_with_backpressure():
+    """Test multiple workers overlap a slow stage and bounded queues apply backpressure."""
+    async def slow(x):
+        await asyncio.sleep(0.05)
+        return x
+
+    pipeline = Pipeline([Stage("slow", slow, workers=4, maxsize=2)])
+    await pipeline.start()
+    started = time.perf_counter()
+    for i in range(8):
+        await pipeline.submit(i)
+        assert pipeline["slow"].queue_depth <= 2, "Queue depth should never exceed maxsize"
+    await pipeline.join()
+    elapsed = time.perf_counter() - started
+    await pipeline.close()
+
+    assert elapsed < 0.3, f"Four workers should overlap sleeps, took {elapsed:.2f}s"
+    assert pipeline["slow"].average_latency >= 0.04, "Latency should reflect time in the stage"
+    assert pipeline["slow"].throughput > 0, "Throughput should be positive after processing"
+
+@pytest.mark.asyncio
+async def test_pipeline_counts_stage_errors():
+    """Test an exception in a stage drops the item without stopping the worker."""
+    out = []
+
+    def fragile(x):
+        if x == 1:
+            raise ValueError("boom")
+        return x
+
+    pipeline = Pipeline([Stage("fragile", fragile), Stage("collect", out.append)])
+    await pipeline.start()
+    for i in range(3):
+        await pipeline.submit(i)
+    await pipeline.join()
+    await pipeline.close()
+
+    assert out == [0, 2], "Items after a failure should still be processed"
+    assert pipeline["fragile"].errors == 1, "The failure should be counted"
+
+@pytest.mark.asyncio
+async def test_receive_pipeline_verifies_dedups_and_decodes():
+    """Test the receive pipeline dispatches each valid frame once with its decoded message."""
+    received = []
+    seen = OptimizedBloomFilter(1000, 0.01)
+    frames = [make_frame(n) for n in range(5)]
+    bad = bytearray(make_frame(99))
+    bad[60] ^= 0xFF  # Corrupt the payload so the signature no longer matches
+
+    with ThreadPoolExecutor(2) as executor:
+        pipeline = receive_pipeline(received.append, seen=seen, executor=executor)
+        await pipeline.start()
+        for frame in frames + frames + [bytes(bad), b"garbage"]:
+            await pipeline.submit(ReceivedFrame("bitchat_neighbour", frame))
+        await pipeline.join()
+        await pipeline.close()
+
+    assert len(received) == 5, f"Each packet should be dispatched once, got {len(received)}"
+    assert {frame.message.id for frame in received} == {f"msg{n}" for n in range(5)}, \
+        "Dispatched frames should carry the decoded message"
+    assert all(frame.peer_id == "bitchat_neighbour" for frame in received), "Source neighbour should be kept"
+    stats = pipeline.stats()
+    assert stats["unpad"]["processed"] == 12, "Every submitted frame should be unpadded"
+    assert stats["verify"]["dropped"] >= 1, "The corrupted frame should fail verification"
+    assert stats["dispatch"]["processed"] == 5, "Only verified, unique frames should be dispatched"
+    assert stats["dispatch"]["dropped"] == 0, "Dispatched frames are consumed, not dropped"
+    assert stats["decode_message"]["dropped"] == 0, "Clean frames should not be dropped anywhere after dedup"
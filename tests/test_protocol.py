@@ -1,6 +1,10 @@
 import pytest
-from bitchat.protocol import encode_packet, decode_packet
-from bitchat.message import BitchatPacket
+from bitchat.protocol import encode_packet, decode_packet, packet_fingerprint, split_frames, encode_bundle, decode_bundle, FINGERPRINT_SIZE
+from bitchat.protocol import FrameAssembler, framed_length, frame_fingerprint, decrement_ttl
+from bitchat.message import unpad
+from bitchat.message import optimal_block_size
+from bitchat.message import BitchatPacket, CumulativeAck, pad
+from uuid import uuid4
 import time
 
 def test_packet_encoding_decoding():
@@ -117,4 +121,144 @@ def test_invalid_packet_handling():
         ttl=100
     )
     encoded_invalid = encode_packet(invalid_packet)
-    assert decode_packet(encoded_invalid) is None
\ No newline at end of file
+    assert decode_packet(encoded_invalid) is None
+
+def test_packet_fingerprint():
+    """Test the packet fingerprint is cached on decode and stable across TTL changes."""
+    packet = BitchatPacket(
+        version=1,
+        type="message",
+        sender_id=b"peer1" + b"\x00" * 11,
+        recipient_id=b"peer2" + b"\x00" * 11,
+        timestamp=time.time(),
+        payload=b"Fingerprinted",
+        signature=b"\xAB" * 64,
+        ttl=100
+    )
+    decoded = decode_packet(encode_packet(packet))
+    assert decoded.fingerprint is not None, "decode_packet should cache the fingerprint"
+    assert len(decoded.fingerprint) == FINGERPRINT_SIZE
+    assert packet_fingerprint(packet) == decoded.fingerprint, "Local and decoded fingerprints should match"
+    assert decoded == packet, "Fingerprint should not affect packet equality"
+
+    # A relay only decrements the TTL, which must not change the identity
+    packet.ttl = 99
+    relayed = decode_packet(encode_packet(packet))
+    assert relayed.fingerprint == decoded.fingerprint, "TTL should not change the fingerprint"
+
+    other = BitchatPacket(
+        version=1,
+        type="message",
+        sender_id=packet.sender_id,
+        recipient_id=packet.recipient_id,
+        timestamp=packet.timestamp,
+        payload=b"Fingerprinted",
+        signature=b"\xCD" * 64,
+        ttl=100
+    )
+    assert packet_fingerprint(other) != decoded.fingerprint, "Different signatures should give different fingerprints"
+
+def test_split_frames():
+    """Test concatenated padded and unpadded frames split apart, and other data is returned whole."""
+    frames = []
+    for n, block in enumerate([256, 0, 512]):
+        encoded = encode_packet(BitchatPacket(
+            version=1,
+            type="delivery_ack",
+            sender_id=b"peer1" + b"\x00" * 11,
+            recipient_id=b"peer2" + b"\x00" * 11,
+            timestamp=time.time() + n,
+            payload=b"ack" * (n + 1),
+            signature=b"\x00" * 64,
+            ttl=10
+        ))
+        frames.append(pad(encoded, block) if block else encoded)
+    assert split_frames(b"".join(frames)) == frames, "Each frame should be recovered with its padding"
+    assert split_frames(frames[0]) == [frames[0]], "A single frame should come back unchanged"
+    assert split_frames(b"garbage") == [b"garbage"], "Short data should be returned whole"
+    assert split_frames(frames[0] + b"\x00" * 60) == [frames[0] + b"\x00" * 60], "Trailing junk should not be split off"
+
+def test_bundle_roundtrip():
+    """Test packets survive bundling and non-bundles are left alone."""
+    packets = [encode_packet(BitchatPacket(
+        version=1,
+        type="read_receipt",
+        sender_id=b"peer1" + b"\x00" * 11,
+        recipient_id=b"peer2" + b"\x00" * 11,
+        timestamp=time.time() + n,
+        payload=b"r" * n,
+        signature=b"\x01" * 64,
+        ttl=10
+    )) for n in range(3)]
+    bundle = encode_bundle(packets)
+    assert decode_bundle(bundle) == packets, "Bundled packets should decode unchanged"
+    assert decode_packet(bundle).ttl == 0, "Bundles are never relayed"
+    assert decode_bundle(packets[0]) is None, "An ordinary packet is not a bundle"
+    assert decode_bundle(bundle[:-70]) is None, "A truncated bundle should be rejected"
+    assert split_frames(pad(bundle, 1024)) == [pad(p, 256) for p in packets], "split_frames should open bundles"
+
+def make_padded(n, payload_size):
+    encoded = encode_packet(BitchatPacket(
+        version=1,
+        type="message",
+        sender_id=b"peer1" + b"\x00" * 11,
+        recipient_id=b"peer2" + b"\x00" * 11,
+        timestamp=1000.0 + n,
+        payload=b"p" * payload_size,
+        signature=b"\x02" * 64,
+        ttl=5
+    ))
+    return pad(encoded, optimal_block_size(len(encoded)))
+
+def test_frame_assembler():
+    """Test frames split across arbitrary chunks are rebuilt, and garbage is passed on rather than stalling."""
+    frames = [make_padded(n, size) for n, size in enumerate([10, 300, 1500, 3000])]
+    assert all(len(f) == framed_length(51 + 7 + size + 64) for f, size in zip(frames, [10, 300, 1500, 3000])), \
+        "framed_length should predict the padded size"
+    stream = b"".join(frames)
+    assembler = FrameAssembler()
+    out = []
+    for offset in range(0, len(stream), 61):
+        out.extend(assembler.feed(stream[offset:offset + 61]))
+    assert out == frames and assembler.pending == 0, "Every frame should come back whole and in order"
+
+    assert assembler.feed(b"garbage") == [b"garbage"], "Bytes that cannot start a frame are returned"
+    assert assembler.feed(frames[0]) == [frames[0]], "Garbage should not corrupt the next frame"
+
+    now = [0.0]
+    assembler = FrameAssembler(timeout=1.0, clock=lambda: now[0])
+    assert assembler.feed(frames[1][:100]) == []
+    now[0] = 5.0
+    assert assembler.feed(frames[0]) == [frames[0]], "A stale partial frame should be discarded"
+
+def test_relay_fast_path_helpers():
+    """Test header-only fingerprints and in-place TTL patching on padded frames."""
+    frame = make_padded(1, 40)
+    packet = decode_packet(unpad(frame))
+    assert frame_fingerprint(frame) == packet_fingerprint(packet), "Header fingerprint should match the decoded one"
+    assert frame_fingerprint(frame[:60]) is None, "Truncated frames have no fingerprint"
+
+    relayed = bytearray(frame)
+    assert decrement_ttl(relayed) == 4
+    assert len(relayed) == len(frame) and relayed[:43] == frame[:43] and relayed[47:] == frame[47:], \
+        "Only the TTL field should change"
+    assert decode_packet(unpad(bytes(relayed))).ttl == 4
+    assert frame_fingerprint(bytes(relayed)) == frame_fingerprint(frame), "The fingerprint should survive relaying"
+    for _ in range(4):
+        decrement_ttl(relayed)
+    with pytest.raises(ValueError, match="TTL"):
+        decrement_ttl(relayed)
+
+def test_cumulative_ack_roundtrip():
+    """Test a cumulative ack survives encoding, packing canonical UUIDs into 16 bytes."""
+    ids = [str(uuid4()) for _ in range(20)] + ["msg-7", str(uuid4()).upper()]
+    ack = CumulativeAck(message_ids=ids, recipient_id="bitchat_alice", nickname="bob", hop_count=3)
+    data = ack.encode()
+    assert CumulativeAck.decode(data) == ack, "Decoding should restore every id exactly"
+    assert len(data) == 2 + len("bitchat_alice") + len("bob") + 6 + 20 * 17 + 6 + 37, \
+        "Canonical UUIDs should take 17 bytes, other ids a length byte plus the string"
+    assert sum(CumulativeAck.id_size(i) for i in ids) == 20 * 17 + 6 + 37
+    assert CumulativeAck.decode(data[:-1]) is None, "Truncated data should be rejected"
+    assert CumulativeAck.decode(data + b"\x00") is None, "Trailing data should be rejected"
+    with pytest.raises(ValueError, match="message_ids cannot be empty"):
+        CumulativeAck([], "bitchat_alice", "bob", 1).encode()
@@ -0,0 +1,152 @@
+import asyncio
+import random
+import time
+import pytest
+from bitchat.ble_service import build_frame
+from bitchat.keychain import store_key
+from bitchat.message import BitchatPacket, unpad
+from bitchat.protocol import decode_packet
+from bitchat.relay import RelayEngine
+from bitchat.routing import RoutingTable, DEFAULT_TTL
+from bitchat.transport import LoopbackHub
+
+SENDER = "bitchat_origin"
+
+def make_frame(n, ttl=5, recipient=b"\x00" * 16, packet_type="broadcast_message", sender=SENDER):
+    store_key(b"\x06" * 32, f"peer:{sender.ljust(16)}")
+    return build_frame(BitchatPacket(
+        version=1,
+        type=packet_type,
+        sender_id=sender.encode().ljust(16),
+        recipient_id=recipient,
+        timestamp=time.time() + n,
+        payload=f"relay {n}".encode(),
+        signature=b"\x00" * 64,
+        ttl=ttl
+    ))
+
+async def build_mesh(edges, routing=False, **options):
+    """Link nodes and start a relay engine on every node except the origin."""
+    hub = LoopbackHub()
+    for a, b in edges:
+        hub.link(a, b)
+    delivered = {peer_id: [] for peer_id in hub.nodes}
+    engines = {}
+    for i, peer_id in enumerate(sorted(hub.nodes)):
+        if peer_id == SENDER:
+            continue
+        engine = RelayEngine(hub.transport(peer_id), local_id=peer_id,
+                             deliver=lambda packet, source, peer_id=peer_id: delivered[peer_id].append(packet),
+                             jitter=(0.0, 0.01), rng=random.Random(i),
+                             routes=RoutingTable() if routing else None, **options)
+        await engine.start()
+        engines[peer_id] = engine
+    return hub, engines, delivered
+
+async def originate(hub, frame):
+    origin = hub.transport(SENDER)
+    for peer_id in await origin.discover():
+        await origin.write(peer_id, frame)
+    await asyncio.sleep(0.15)
+
+@pytest.mark.asyncio
+async def test_relay_validation():
+    """Test relay options are validated."""
+    hub = LoopbackHub()
+    with pytest.raises(ValueError, match="suppression"):
+        RelayEngine(hub.transport("bitchat_a"), suppression="sometimes")
+    with pytest.raises(ValueError, match="jitter"):
+        RelayEngine(hub.transport("bitchat_a"), jitter=(0.2, 0.1))
+    with pytest.raises(ValueError, match="forward_probability"):
+        RelayEngine(hub.transport("bitchat_a"), forward_probability=1.5)
+
+@pytest.mark.asyncio
+async def test_relay_carries_packets_along_a_line():
+    """Test a packet crosses a line of relays, losing one TTL per hop and never going back."""
+    line = [SENDER, "bitchat_n1", "bitchat_n2", "bitchat_n3", "bitchat_n4"]
+    hub, engines, delivered = await build_mesh(zip(line, line[1:]), suppression=None)
+    await originate(hub, make_frame(1, ttl=3))
+    assert [len(delivered[p]) for p in line[1:]] == [1, 1, 1, 0], "TTL 3 should reach three hops"
+    assert [delivered[p][0].ttl for p in line[1:4]] == [3, 2, 1], "Each hop should decrement the TTL"
+    assert engines["bitchat_n3"].stats.expired == 1, "The last hop should stop on TTL"
+    assert engines["bitchat_n1"].stats.frames_sent == 1, "The source neighbour should be excluded"
+    assert all(e.stats.duplicates == 0 for e in engines.values()), "A line has no duplicate paths"
+    for engine in engines.values():
+        await engine.close()
+
+@pytest.mark.asyncio
+async def test_counter_suppression_limits_flooding():
+    """Test counter-based suppression sends fewer frames than plain flooding while still reaching every node."""
+    nodes = [SENDER] + [f"bitchat_m{i}" for i in range(6)]
+    edges = [(a, b) for i, a in enumerate(nodes) for b in nodes[i + 1:]]  # Full mesh
+    sent = {}
+    for mode in (None, "counter"):
+        hub, engines, delivered = await build_mesh(edges, suppression=mode, suppress_after=2)
+        await originate(hub, make_frame(10 if mode else 11))
+        assert all(len(delivered[p]) == 1 for p in nodes[1:]), f"Every node should get the packet once ({mode})"
+        sent[mode] = sum(e.stats.frames_sent for e in engines.values())
+        if mode == "counter":
+            assert sum(e.stats.suppressed for e in engines.values()) > 0, "Some forwards should be suppressed"
+        for engine in engines.values():
+            await engine.close()
+    assert sent["counter"] < sent[None], f"Suppression should cut forwarded frames: {sent}"
+
+@pytest.mark.asyncio
+async def test_probabilistic_suppression_and_invalid_frames():
+    """Test gossip mode skips some forwards and bad frames are counted, not forwarded."""
+    hub = LoopbackHub()
+    hub.link(SENDER, "bitchat_g")
+    hub.link("bitchat_g", "bitchat_h")
+    engine = RelayEngine(hub.transport("bitchat_g"), suppression="probabilistic", forward_probability=0.0)
+    assert engine.receive(SENDER, make_frame(20)) is not None, "New packets are still delivered locally"
+    assert engine.stats.suppressed == 1 and engine.pending == 0, "Probability 0 should never forward"
+    bad = bytearray(make_frame(21))
+    bad[60] ^= 0xFF
+    assert engine.receive(SENDER, bytes(bad)) is None and engine.stats.invalid == 1
+    assert engine.receive(SENDER, b"junk") is None and engine.stats.invalid == 2
+    await engine.close()
+
+@pytest.mark.asyncio
+async def test_private_packets_stop_at_recipient():
+    """Test a private packet is not re-broadcast by its recipient."""
+    hub = LoopbackHub()
+    hub.link(SENDER, "bitchat_r")
+    hub.link("bitchat_r", "bitchat_s")
+    engine = RelayEngine(hub.transport("bitchat_r"), local_id="bitchat_r", jitter=(0.0, 0.0))
+    forwarded = []
+    await hub.transport("bitchat_s").subscribe("bitchat_r", lambda peer_id, data: forwarded.append(data))
+    packet = engine.receive(SENDER, make_frame(30, recipient=b"bitchat_r".ljust(16), packet_type="private_message"))
+    assert packet is not None and engine.pending == 0, "Recipient should not forward its own private packet"
+    original = make_frame(31)
+    engine.receive(SENDER, original)
+    assert engine.pending == 1, "Broadcasts should still be forwarded"
+    await asyncio.sleep(0.05)
+    assert engine.stats.forwarded == 1 and len(forwarded) == 1, "Only the broadcast should be forwarded"
+    assert decode_packet(unpad(forwarded[0])).ttl == 4, "The forwarded copy should carry TTL - 1"
+    assert forwarded[0][:43] == original[:43] and forwarded[0][47:] == original[47:], \
+        "Relays should forward the received bytes with only the TTL patched"
+    await engine.close()
+
+@pytest.mark.asyncio
+async def test_unicast_follows_learned_reverse_path():
+    """Test a private message takes the learned path to its recipient instead of flooding every branch."""
+    # origin - a - c - d, with a side branch a - b
+    edges = [(SENDER, "bitchat_a"), ("bitchat_a", "bitchat_b"), ("bitchat_a", "bitchat_c"), ("bitchat_c", "bitchat_d")]
+    hub, engines, delivered = await build_mesh(edges, routing=True, suppression=None)
+    d = hub.transport("bitchat_d")
+    frame = make_frame(40, ttl=DEFAULT_TTL, sender="bitchat_d")
+    for peer_id in await d.discover():
+        await d.write(peer_id, frame)
+    await asyncio.sleep(0.1)
+    assert engines["bitchat_a"].routes.route("bitchat_d").next_hop == "bitchat_c"
+    assert engines["bitchat_a"].routes.route("bitchat_d").hops == 1, "d's broadcast reached a after one relay"
+    assert len(delivered["bitchat_b"]) == 1, "Broadcasts still flood"
+
+    await originate(hub, make_frame(41, ttl=DEFAULT_TTL, recipient=b"bitchat_d".ljust(16),
+                                    packet_type="private_message"))
+    assert [p.type for p in delivered["bitchat_d"]] == ["private_message"]
+    assert len(delivered["bitchat_b"]) == 1, "The side branch should not see the private message"
+    assert engines["bitchat_a"].stats.routed == 1 and engines["bitchat_c"].stats.routed == 1
+    assert engines["bitchat_d"].stats.forwarded == 0, "The recipient should not forward"
+    for engine in engines.values():
+        await engine.close()
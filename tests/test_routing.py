@@ -0,0 +1,71 @@
+import pytest
+from bitchat.message import BitchatPacket, CumulativeAck, DeliveryAck
+from bitchat.routing import RoutingTable, unicast_destination, DEFAULT_TTL
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def make_packet(packet_type, sender=b"bitchat_far", recipient=b"\x00" * 16, ttl=DEFAULT_TTL - 3, payload=b"hi"):
+    return BitchatPacket(
+        version=1,
+        type=packet_type,
+        sender_id=sender.ljust(16, b"\x00"),
+        recipient_id=recipient.ljust(16, b"\x00"),
+        timestamp=1000.0,
+        payload=payload,
+        signature=b"\x00" * 64,
+        ttl=ttl
+    )
+
+def test_routing_table_learns_shortest_fresh_route():
+    """Test routes prefer fewer hops, refresh through the same neighbour and age out."""
+    clock = FakeClock()
+    table = RoutingTable(max_age=10.0, clock=clock)
+    assert table.observe(make_packet("broadcast_message"), "bitchat_n1"), "First sighting should add a route"
+    assert table.route("bitchat_far").hops == 3
+    assert not table.observe(make_packet("broadcast_message", ttl=DEFAULT_TTL - 5), "bitchat_n2"), \
+        "A longer path should not replace the route"
+    assert table.observe(make_packet("broadcast_message", ttl=DEFAULT_TTL - 1), "bitchat_n2"), \
+        "A shorter path should replace the route"
+    assert table.next_hop("bitchat_far") == "bitchat_n2"
+
+    clock.now = 8.0
+    table.learn("bitchat_far", "bitchat_n2", 4)  # Same neighbour: refresh even if longer
+    clock.now = 15.0
+    assert table.next_hop("bitchat_far") == "bitchat_n2", "Refreshed routes should stay valid"
+    clock.now = 30.0
+    assert table.next_hop("bitchat_far") is None and "bitchat_far" not in table, "Stale routes should age out"
+    assert table.hits == 2 and table.misses == 1
+
+def test_routing_table_neighbours_and_limits():
+    """Test next hops respect the current neighbours, lost links and the size limit."""
+    clock = FakeClock()
+    table = RoutingTable(max_routes=2, clock=clock)
+    table.learn("bitchat_a", "bitchat_n1", 2)
+    clock.now = 1.0
+    table.learn("bitchat_b", "bitchat_n2", 2)
+    assert table.next_hop("bitchat_n3", ["bitchat_n3"]) == "bitchat_n3", "A neighbour is its own next hop"
+    assert table.next_hop("bitchat_a", ["bitchat_n2"]) is None, "Routes through absent neighbours are unusable"
+    assert table.forget_neighbour("bitchat_n2") == 1 and "bitchat_b" not in table
+    clock.now = 2.0
+    table.learn("bitchat_b", "bitchat_n2", 2)
+    table.learn("bitchat_c", "bitchat_n1", 1)
+    assert len(table) == 2 and "bitchat_a" not in table, "The stalest route should be evicted when full"
+    with pytest.raises(ValueError, match="max_age"):
+        RoutingTable(max_age=0)
+
+def test_unicast_destination():
+    """Test destinations of private messages, acks and broadcasts."""
+    assert unicast_destination(make_packet("private_message", recipient=b"bitchat_bob")) == "bitchat_bob"
+    assert unicast_destination(make_packet("broadcast_message")) is None
+    ack = DeliveryAck(message_id="m1", recipient_id="bitchat_alice", nickname="bob", hop_count=1)
+    packet = make_packet("delivery_ack", sender=b"bitchat_alice", recipient=b"m1", payload=ack.encode())
+    assert unicast_destination(packet) == "bitchat_alice", "Acks are addressed by their payload"
+    assert not RoutingTable().observe(packet, "bitchat_n1"), "Acks do not name their origin, so teach no route"
+    batch = CumulativeAck(message_ids=["m1", "m2"], recipient_id="bitchat_alice", nickname="bob", hop_count=1)
+    packet = make_packet("cumulative_ack", sender=b"bitchat_alice", recipient=b"m1", payload=batch.encode())
+    assert unicast_destination(packet) == "bitchat_alice", "Cumulative acks are addressed by their payload too"
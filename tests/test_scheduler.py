@@ -0,0 +1,232 @@
+import asyncio
+import time
+import pytest
+from bitchat.ble_service import build_frame
+from bitchat.keychain import store_key
+from uuid import uuid4
+from bitchat.message import BitchatPacket, CumulativeAck, DeliveryAck, unpad
+from bitchat.protocol import split_frames, decode_packet
+from bitchat.scheduler import OutboundScheduler, FrameBundler, AckAggregator, Priority, Histogram
+
+class GatedWriter:
+    """Records writes; the first write blocks until the test opens the gate."""
+
+    def __init__(self):
+        self.writes = []
+        self.gate = asyncio.Event()
+
+    async def __call__(self, data, peer_id, priority):
+        if not self.writes:
+            self.writes.append((peer_id, data))
+            await self.gate.wait()
+        else:
+            self.writes.append((peer_id, data))
+
+def make_frame(n):
+    sender_id = b"bitchat_sched".ljust(16, b"\x00")
+    store_key(b"\x04" * 32, f"peer:{sender_id.decode()}")
+    return build_frame(BitchatPacket(
+        version=1,
+        type="delivery_ack",
+        sender_id=sender_id,
+        recipient_id=b"\x00" * 16,
+        timestamp=time.time() + n,
+        payload=f"ack {n}".encode(),
+        signature=b"\x00" * 64,
+        ttl=10
+    ))
+
+def test_histogram():
+    """Test histogram buckets, mean and percentiles."""
+    h = Histogram([1, 2, 4])
+    for value in [0.5, 1, 1.5, 3, 10]:
+        h.observe(value)
+    assert h.counts == [2, 1, 1, 1], "Values should land in the first bucket whose bound they do not exceed"
+    assert h.mean == pytest.approx(3.2)
+    assert h.percentile(50) == 2, "Median should fall in the (1, 2] bucket"
+    assert h.percentile(100) == float("inf"), "Overflow bucket has no upper bound"
+
+@pytest.mark.asyncio
+async def test_scheduler_validation():
+    """Test scheduler arguments are validated."""
+    with pytest.raises(ValueError, match="concurrency must be positive"):
+        OutboundScheduler(GatedWriter(), concurrency=0)
+    with pytest.raises(ValueError, match="quantum and max_write must be positive"):
+        OutboundScheduler(GatedWriter(), quantum=0)
+
+@pytest.mark.asyncio
+async def test_acks_jump_ahead_of_bulk():
+    """Test higher priority classes are written before queued lower priority frames."""
+    writer = GatedWriter()
+    scheduler = OutboundScheduler(writer, concurrency=1, quantum=10, max_write=10)
+    first = scheduler.enqueue(b"B" * 10, "bitchat_a", Priority.BULK)
+    await asyncio.sleep(0)  # First bulk write is now in flight
+    bulk = [scheduler.enqueue(b"B" * 10, "bitchat_a", Priority.BULK) for _ in range(3)]
+    chat = scheduler.enqueue(b"C" * 10, "bitchat_a", Priority.CHAT)
+    ack = scheduler.enqueue(b"A" * 10, "bitchat_a", Priority.ACK)
+    assert scheduler.depths() == {"control": 0, "ack": 1, "chat": 1, "bulk": 3}
+    writer.gate.set()
+    await asyncio.gather(first, ack, chat, *bulk)
+    assert [data[:1] for _, data in writer.writes] == [b"B", b"A", b"C", b"B", b"B", b"B"], \
+        "Ack then chat should overtake queued bulk frames"
+    assert scheduler.wait_times[Priority.ACK].count == 1, "Ack wait time should be recorded"
+    assert scheduler.queue_depths.count == 6, "Depth should be sampled on every enqueue"
+    await scheduler.close()
+
+@pytest.mark.asyncio
+async def test_deficit_round_robin_across_peers():
+    """Test a peer with a long queue cannot starve other peers in the same class."""
+    writer = GatedWriter()
+    scheduler = OutboundScheduler(writer, concurrency=1, quantum=100, max_write=100)
+    blocker = scheduler.enqueue(b"x" * 100, "bitchat_z")
+    await asyncio.sleep(0)
+    futures = [scheduler.enqueue(b"a" * 100, "bitchat_a") for _ in range(4)]
+    futures += [scheduler.enqueue(b"b" * 100, "bitchat_b") for _ in range(2)]
+    # A large frame needs several rounds of allowance but must still go out
+    futures.append(scheduler.enqueue(b"c" * 250, "bitchat_c"))
+    writer.gate.set()
+    await asyncio.gather(blocker, *futures)
+    order = [peer_id for peer_id, _ in writer.writes[1:]]
+    assert order[:4] == ["bitchat_a", "bitchat_b", "bitchat_a", "bitchat_b"], \
+        f"Peers should alternate, got {order}"
+    assert order.index("bitchat_c") < len(order) - 1, "Large frame should not wait for the whole long queue"
+    await scheduler.close()
+
+@pytest.mark.asyncio
+async def test_small_frames_are_coalesced_and_split_on_receive():
+    """Test queued small frames for one peer share a write that the receiver splits back."""
+    writer = GatedWriter()
+    scheduler = OutboundScheduler(writer, concurrency=1, quantum=1024, max_write=1024)
+    blocker = scheduler.enqueue(b"x", "bitchat_z")
+    await asyncio.sleep(0)
+    frames = [make_frame(n) for n in range(6)]
+    futures = [scheduler.enqueue(frame, "bitchat_a", Priority.ACK) for frame in frames]
+    writer.gate.set()
+    await asyncio.gather(blocker, *futures)
+    writes = [data for peer_id, data in writer.writes if peer_id == "bitchat_a"]
+    assert len(writes) == 2, f"Six 256-byte frames should need two 1 KiB writes, got {len(writes)}"
+    split = [frame for data in writes for frame in split_frames(data)]
+    assert split == frames, "Receiver should recover every frame in order"
+    assert [decode_packet(unpad(f)).payload for f in split] == [f"ack {n}".encode() for n in range(6)]
+    assert scheduler.writes == 3 and scheduler.frames_written == 7
+    await scheduler.close()
+
+@pytest.mark.asyncio
+async def test_write_errors_and_timeouts_reach_senders():
+    """Test a failed or slow write fails only the frames it carried."""
+    async def write(data, peer_id, priority):
+        if peer_id == "bitchat_bad":
+            raise RuntimeError("unreachable")
+        if peer_id == "bitchat_slow":
+            await asyncio.sleep(1.0)
+
+    scheduler = OutboundScheduler(write, concurrency=2)
+    with pytest.raises(RuntimeError, match="unreachable"):
+        await scheduler.send(b"frame", "bitchat_bad")
+    with pytest.raises(asyncio.TimeoutError):
+        await scheduler.send(b"frame", "bitchat_slow", timeout=0.05)
+    await scheduler.send(b"frame", "bitchat_good")
+    assert scheduler.frames_written == 1
+    await scheduler.close()
+
+@pytest.mark.asyncio
+async def test_close_fails_queued_frames():
+    """Test closing the scheduler fails frames that were never written."""
+    writer = GatedWriter()
+    scheduler = OutboundScheduler(writer, concurrency=1)
+    scheduler.enqueue(b"x", "bitchat_a")
+    await asyncio.sleep(0)
+    queued = scheduler.enqueue(b"y", "bitchat_a")
+    await scheduler.close()
+    with pytest.raises(RuntimeError, match="closed"):
+        await queued
+
+@pytest.mark.asyncio
+async def test_bundler_packs_acks_into_one_block():
+    """Test acks sent close together become one padded bundle that splits back into the original frames."""
+    sent = []
+
+    async def send(frame, peer_id, priority):
+        sent.append((peer_id, frame))
+
+    bundler = FrameBundler(send, max_delay=0.01, max_size=1024)
+    frames = [make_frame(100 + n) for n in range(10)]
+    started = time.perf_counter()
+    await asyncio.gather(*(bundler.send(frame, "bitchat_a") for frame in frames))
+    assert time.perf_counter() - started < 0.1, "Flush deadline should bound the added latency"
+    assert len(sent) == 2, f"Ten acks should fit in two 1 KiB bundles, got {len(sent)} sends"
+    assert all(len(frame) <= 1024 for _, frame in sent), "Each bundle should be one block at most"
+    assert sum(len(frame) for _, frame in sent) < sum(len(f) for f in frames), "Bundling should save airtime"
+    assert [f for _, frame in sent for f in split_frames(frame)] == frames, "Receiver should unbundle transparently"
+    assert bundler.bundles_sent == 2 and bundler.frames_bundled == 10
+
+@pytest.mark.asyncio
+async def test_bundler_passes_lone_and_large_frames_through():
+    """Test a lone frame is sent unchanged and oversized frames skip the bundle."""
+    sent = []
+
+    async def send(frame, peer_id, priority):
+        sent.append((peer_id, priority, frame))
+
+    bundler = FrameBundler(send, max_delay=0.0, max_size=512)
+    frame = make_frame(200)
+    big = b"\x00" * 600
+    await asyncio.gather(bundler.send(frame, "bitchat_a"), bundler.send(b"x" * 10, "bitchat_b", Priority.CONTROL),
+                         bundler.send(big, "bitchat_a"))
+    assert ("bitchat_a", Priority.ACK, frame) in sent, "A lone frame should go out as it is"
+    assert ("bitchat_a", Priority.ACK, big) in sent, "An oversized frame should bypass bundling"
+    assert bundler.bundles_sent == 0
+    with pytest.raises(ValueError, match="max_size"):
+        FrameBundler(send, max_size=100)
+
+@pytest.mark.asyncio
+async def test_bundler_propagates_send_errors():
+    """Test every frame in a failed bundle sees the error."""
+    async def send(frame, peer_id, priority):
+        raise RuntimeError("unreachable")
+
+    bundler = FrameBundler(send, max_delay=0.0)
+    results = await asyncio.gather(*(bundler.send(make_frame(300 + n), "bitchat_a") for n in range(3)),
+                                   return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results), "All senders should get the failure"
+
+@pytest.mark.asyncio
+async def test_ack_aggregator_sends_one_ack_per_window():
+    """Test acks for one peer within the flush window become cumulative acks, each within max_size."""
+    sent = []
+
+    async def send(ack):
+        sent.append(ack)
+
+    aggregator = AckAggregator(send, window=0.01, max_size=1024)
+    packets = {}
+    for count in (10, 100):
+        sent.clear()
+        ids = [str(uuid4()) for _ in range(count)]
+        await asyncio.gather(*(aggregator.send(DeliveryAck(i, "bitchat_alice", "bob", 1 + n % 3))
+                               for n, i in enumerate(ids)),
+                             aggregator.send(DeliveryAck(str(uuid4()), "bitchat_carol", "bob", 2)))
+        cumulative = [a for a in sent if isinstance(a, CumulativeAck)]
+        assert [i for a in cumulative for i in a.message_ids] == ids, "Every id should be covered once, in order"
+        assert all(a.hop_count == 1 for a in cumulative), "A batch carries the smallest hop count"
+        assert all(51 + 14 + 64 + len(a.encode()) <= 1024 for a in cumulative), "Each ack packet should fit max_size"
+        assert [type(a) for a in sent if a.recipient_id == "bitchat_carol"] == [DeliveryAck], \
+            "A lone ack should go out in the single-ack format"
+        packets[count] = len(cumulative)
+    assert packets == {10: 1, 100: 2}, f"Ten times the acks should not need ten times the packets: {packets}"
+    assert aggregator.acks_aggregated == 110 and aggregator.acks_sent == 5
+
+@pytest.mark.asyncio
+async def test_ack_aggregator_propagates_send_errors():
+    """Test every ack in a failed batch sees the error and options are validated."""
+    async def send(ack):
+        raise RuntimeError("unreachable")
+
+    aggregator = AckAggregator(send, window=0.0)
+    results = await asyncio.gather(*(aggregator.send(DeliveryAck(f"m{n}", "bitchat_a", "bob", 1)) for n in range(3)),
+                                   return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results), "All senders should get the failure"
+    with pytest.raises(ValueError, match="window"):
+        AckAggregator(send, window=-1)
+    with pytest.raises(ValueError, match="max_size"):
+        AckAggregator(send, max_size=100)
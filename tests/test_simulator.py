@@ -0,0 +1,54 @@
+import asyncio
+import random
+import time
+from bitchat.simulator import (VirtualTimeEventLoop, MeshSimulator, LinkModel, ChurnModel,
+                               line, grid, random_geometric, node_ids)
+
+def test_virtual_time_loop_skips_waiting():
+    """Test sleeps on the virtual loop advance its clock without taking real time."""
+    loop = VirtualTimeEventLoop()
+
+    async def nap():
+        await asyncio.sleep(3600)
+        return asyncio.get_running_loop().time()
+
+    started = time.perf_counter()
+    try:
+        assert loop.run_until_complete(nap()) >= 3600
+    finally:
+        loop.close()
+    assert time.perf_counter() - started < 1.0, "An hour of virtual sleep should be instant"
+
+def test_topologies():
+    """Test the topology builders produce the expected links."""
+    assert line(4) == [("bitchat_n0000", "bitchat_n0001"), ("bitchat_n0001", "bitchat_n0002"),
+                       ("bitchat_n0002", "bitchat_n0003")]
+    assert len(grid(3, 4)) == 3 * 3 + 2 * 4, "A grid has rows*(cols-1) + (rows-1)*cols links"
+    edges = random_geometric(20, 2.0, random.Random(1))
+    assert len(edges) == 20 * 19 // 2, "A radius covering the unit square links every pair"
+    assert all(len(peer_id) <= 16 for peer_id in node_ids(1000)), "IDs must fit the 16-byte field"
+
+def test_line_delivery_and_latency():
+    """Test a line delivers every message, with latency growing with hop count and no duplicates."""
+    report = MeshSimulator(line(5), link=LinkModel(latency=0.01, bandwidth=None), jitter=(0.0, 0.0)).run(
+        messages=10, ttl=10, settle=2.0)
+    assert report.delivery_ratio == 1.0 and report.deliveries == 40
+    assert report.duplicates == 0, "A line has a single path"
+    assert 0.01 - 1e-9 <= report.latency(0) and report.latency(100) <= 0.04 + 1e-9, "One to four hops of 10 ms"
+    assert report.bytes_per_delivery > 0 and report.simulated_time >= 3.0
+
+def test_loss_and_ttl_reduce_delivery():
+    """Test link loss and a short TTL show up in the delivery ratio, and runs are repeatable."""
+    edges = grid(4, 4)
+    lossy = MeshSimulator(edges, link=LinkModel(loss=0.3), seed=3).run(messages=10, ttl=10)
+    assert lossy.delivery_ratio < 1.0 and lossy.frames_lost > 0
+    again = MeshSimulator(edges, link=LinkModel(loss=0.3), seed=3).run(messages=10, ttl=10)
+    assert (again.deliveries, again.frames_lost) == (lossy.deliveries, lossy.frames_lost), "Same seed, same run"
+    short = MeshSimulator(line(6)).run(messages=5, ttl=2)
+    assert short.deliveries < 5 * 5, "TTL 2 should not cover a 6-node line"
+
+def test_churn_runs():
+    """Test a simulation with links going down and up completes and reports."""
+    report = MeshSimulator(grid(3, 3), churn=ChurnModel(interval=0.2, downtime=0.5), seed=1).run(messages=10)
+    assert 0 < report.delivery_ratio <= 1.0
+    assert "delivery=" in report.summary()
@@ -0,0 +1,131 @@
+import asyncio
+import time
+import pytest
+from bitchat import ble_service
+from bitchat.ble_service import PacketStream, send_packet, set_transport, get_transport
+from bitchat.discovery import PeerTable
+from bitchat.keychain import store_key
+from bitchat.message import BitchatPacket
+from bitchat.scheduler import Priority
+from bitchat.store_forward import StoreAndForwardCache
+from bitchat.transport import LoopbackHub
+from bitchat.utils import OptimizedBloomFilter
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_cache_orders_and_bounds_held_frames():
+    """Test frames come out most important first and the least important are given up when full."""
+    clock = FakeClock()
+    cache = StoreAndForwardCache(max_packets=3, max_per_peer=3, clock=clock)
+    assert cache.hold("bitchat_bob", b"chat1")
+    assert cache.hold("bitchat_bob", b"ack1", Priority.ACK)
+    assert cache.hold("bitchat_bob", b"chat2")
+    assert not cache.hold("bitchat_bob", b"bulk", Priority.BULK), "A lower class should not push out chat"
+    assert cache.hold("bitchat_bob", b"ack2", Priority.ACK)
+    assert cache.evicted == 2 and cache.pending("bitchat_bob") == 3
+    assert [f for f, _, _ in cache.take("bitchat_bob")] == [b"ack1", b"ack2", b"chat2"], \
+        "Acks first, then chat; the oldest chat frame was given up"
+    assert cache.pending() == 0
+
+def test_cache_expires_frames():
+    """Test held frames are dropped after their TTL."""
+    clock = FakeClock()
+    cache = StoreAndForwardCache(ttl=10.0, clock=clock)
+    cache.hold("bitchat_bob", b"old")
+    clock.now = 5.0
+    cache.hold("bitchat_bob", b"new")
+    cache.hold("bitchat_carol", b"short", ttl=1.0)
+    clock.now = 12.0
+    assert cache.take("bitchat_bob") == [(b"new", Priority.CHAT, 3.0)]
+    assert cache.expired == 2 and len(cache) == 0
+    with pytest.raises(ValueError, match="ttl"):
+        StoreAndForwardCache(ttl=0)
+
+def test_cache_spills_to_disk(tmp_path):
+    """Test frames that do not fit in memory go to disk and come back intact."""
+    cache = StoreAndForwardCache(max_packets=2, spill_dir=str(tmp_path), max_spilled=2)
+    for i in range(5):
+        cache.hold("bitchat_bob", f"frame{i}".encode(), Priority.ACK if i == 4 else Priority.CHAT)
+    assert cache.spilled == 3 and cache.evicted == 1, "Two in memory, two on disk, the oldest given up"
+    assert len(list(tmp_path.iterdir())) == 2
+    assert [f for f, _, _ in cache.take("bitchat_bob")] == [b"frame4", b"frame1", b"frame2", b"frame3"]
+    assert list(tmp_path.iterdir()) == [], "Spill files should be removed once taken"
+
+@pytest.mark.asyncio
+async def test_deliver_rehold_failures():
+    """Test a delivery burst sends everything and keeps what failed."""
+    cache = StoreAndForwardCache()
+    for i in range(3):
+        cache.hold("bitchat_bob", f"frame{i}".encode())
+    sent = []
+
+    async def send(frame, peer_id, priority):
+        if frame == b"frame1":
+            raise RuntimeError("Link dropped")
+        sent.append(frame)
+
+    assert await cache.deliver("bitchat_bob", send) == 2
+    assert sent == [b"frame0", b"frame2"] and cache.pending("bitchat_bob") == 1
+    assert cache.delivered == 2 and cache.held == 3
+
+@pytest.mark.asyncio
+async def test_watch_delivers_to_peer_back_before_sweep():
+    """Test frames are delivered when a peer returns after its entry expired but before expire() ran."""
+    clock = FakeClock()
+    table = PeerTable(expiry=30.0, clock=clock)
+    table.update("bitchat_bob", "AA:0B")
+    cache = StoreAndForwardCache()
+    sent = []
+
+    async def send(frame, peer_id, priority):
+        sent.append(frame)
+
+    watcher = asyncio.ensure_future(cache.watch(table, send))
+    await asyncio.sleep(0)
+    cache.hold("bitchat_bob", b"frame0")
+    clock.now = 60.0
+    table.update("bitchat_bob", "AA:0B")
+    await asyncio.sleep(0.01)
+    watcher.cancel()
+    assert sent == [b"frame0"], "The returning peer should get its held frame"
+
+def make_private(n, recipient):
+    store_key(b"\x07" * 32, f"peer:{'bitchat_alice'.ljust(16)}")
+    return BitchatPacket(
+        version=1,
+        type="private_message",
+        sender_id=b"bitchat_alice".ljust(16),
+        recipient_id=recipient.encode().ljust(16),
+        timestamp=time.time() + n,
+        payload=f"later {n}".encode(),
+        signature=b"\x00" * 64,
+        ttl=100
+    )
+
+@pytest.mark.asyncio
+async def test_private_message_held_until_recipient_appears(monkeypatch):
+    """Test a private packet for an absent peer is held and delivered once the peer comes into range."""
+    monkeypatch.setattr(ble_service, "held_packets", StoreAndForwardCache())
+    hub = LoopbackHub()
+    bob = PacketStream(transport=hub.transport("bitchat_bob"), seen=OptimizedBloomFilter(100, 0.01))
+    await bob.start()
+    previous = get_transport()
+    set_transport(hub.transport("bitchat_alice"))
+    try:
+        ble_service.start_store_and_forward()
+        assert await send_packet(make_private(1, "bitchat_bob"), "bitchat_bob") is False, "Should be held"
+        assert await send_packet(make_private(2, "bitchat_bob"), "bitchat_bob") is False
+        assert ble_service.held_packets.pending("bitchat_bob") == 2
+        hub.link("bitchat_alice", "bitchat_bob")
+        received = [await asyncio.wait_for(bob.__anext__(), 1.0) for _ in range(2)]
+        assert [p.payload for p in received] == [b"later 1", b"later 2"]
+        assert ble_service.held_packets.delivered == 2 and len(ble_service.held_packets) == 0
+    finally:
+        await ble_service.stop_store_and_forward()
+        set_transport(previous)
+        await bob.close()
@@ -0,0 +1,112 @@
+import asyncio
+import time
+import pytest
+from bitchat import ble_service
+from bitchat.ble_service import PacketStream, send_message, get_transport, set_transport
+from bitchat.keychain import store_key
+from bitchat.message import BitchatMessage
+from bitchat.transport import LoopbackHub, Transport, UdpMulticastTransport
+from bitchat.utils import OptimizedBloomFilter
+
+def make_message(content):
+    return BitchatMessage(
+        id=f"msg-{content}",
+        sender="alice",
+        content=content,
+        timestamp=int(time.time()),
+        is_relay=False,
+        original_sender=None,
+        is_private=False,
+        recipient_nickname=None,
+        sender_peer_id="bitchat_alice",
+        mentions=[],
+        channel=None,
+        encrypted_content=None,
+        is_encrypted=False,
+        delivery_status="PENDING"
+    )
+
+def test_incomplete_transport_cannot_be_created():
+    """Test a transport missing part of the interface fails on instantiation, not mid-send."""
+    class WriteOnly(Transport):
+        async def write(self, peer_id, data, response=True):
+            pass
+
+    with pytest.raises(TypeError):
+        WriteOnly()
+
+@pytest.mark.asyncio
+async def test_loopback_delivers_between_linked_nodes():
+    """Test loopback writes reach the subscribed handler and fail for unlinked nodes."""
+    hub = LoopbackHub()
+    hub.link("bitchat_a", "bitchat_b")
+    a, b, c = hub.transport("bitchat_a"), hub.transport("bitchat_b"), hub.transport("bitchat_c")
+    received = []
+    await b.subscribe("bitchat_a", lambda peer_id, data: received.append((peer_id, data)))
+    assert await a.discover() == ["bitchat_b"], "Linked nodes should see each other"
+    await a.write("bitchat_b", b"hello")
+    assert received == [], "Delivery should happen on a later loop iteration"
+    await asyncio.sleep(0)
+    assert received == [("bitchat_a", b"hello")]
+    assert a.bytes_sent == 5 and a.writes == 1
+
+    with pytest.raises(RuntimeError, match="not reachable"):
+        await a.write("bitchat_c", b"hello")
+    hub.unlink("bitchat_a", "bitchat_b")
+    assert "bitchat_b" not in a.table, "Unlinking should update the neighbour tables"
+    with pytest.raises(RuntimeError, match="not reachable"):
+        await c.subscribe("bitchat_a", print)
+
+@pytest.mark.asyncio
+async def test_protocol_stack_runs_over_loopback():
+    """Test a broadcast sent with send_message arrives signed and verified at every neighbour's PacketStream."""
+    store_key(b"\x05" * 32, f"peer:{'bitchat_alice'.ljust(16)}")
+    hub = LoopbackHub()
+    for peer_id in ("bitchat_bob", "bitchat_carol"):
+        hub.link("bitchat_alice", peer_id)
+    streams = [PacketStream(transport=hub.transport(peer_id), seen=OptimizedBloomFilter(100, 0.01))
+               for peer_id in ("bitchat_bob", "bitchat_carol")]
+    for stream in streams:
+        await stream.start()
+    previous = get_transport()
+    set_transport(hub.transport("bitchat_alice"))
+    try:
+        report = await send_message(make_message("over loopback"))
+    finally:
+        set_transport(previous)
+    assert sorted(report.delivered) == ["bitchat_bob", "bitchat_carol"], "Broadcast should reach both neighbours"
+    for stream in streams:
+        packet = await asyncio.wait_for(stream.__anext__(), 1.0)
+        assert packet.type == "broadcast_message"
+        await stream.close()
+    assert ble_service.transport is previous, "set_transport should be reversible"
+
+@pytest.mark.asyncio
+async def test_udp_multicast_transport():
+    """Test two UDP multicast nodes on localhost find each other, exchange writes and notice departures."""
+    port = 47000 + int(time.time()) % 1000
+    a = UdpMulticastTransport("bitchat_udp_a", port=port, beacon_interval=0.05, expiry=0.3)
+    b = UdpMulticastTransport("bitchat_udp_b", port=port, beacon_interval=0.05)
+    try:
+        await a.start()
+        await b.start()
+    except RuntimeError as e:
+        await a.close()
+        pytest.skip(f"Multicast unavailable: {e}")
+    try:
+        received = asyncio.get_running_loop().create_future()
+        await b.subscribe("bitchat_udp_a", lambda peer_id, data: received.done() or received.set_result((peer_id, data)))
+        peers = await a.discover(timeout=1.0)
+        if not peers:
+            pytest.skip("Multicast datagrams are not looped back on this host")
+        assert peers == ["bitchat_udp_b"], "Each node should see the other but not itself"
+        await a.write("bitchat_udp_b", b"frame bytes")
+        assert await asyncio.wait_for(received, 1.0) == ("bitchat_udp_a", b"frame bytes")
+        with pytest.raises(RuntimeError, match="not found"):
+            await a.write("bitchat_nobody", b"x")
+        await b.close()
+        await asyncio.sleep(0.5)
+        assert len(a.table) == 0, "A silent neighbour should be swept from the table"
+    finally:
+        await a.close()
+        await b.close()